@@ -5,18 +5,25 @@ CrewAI Crew Orchestrator — All 6 agents + retry loop + score calculator
 import os
 from datetime import datetime
 from crewai import Agent, Task, Crew, Process
-from langchain_openai import ChatOpenAI
 from dotenv import load_dotenv
 
+from config import LLM_TEMPERATURE
+from llm_clients import get_chat_model
+from llm_router import get_router
+
 from tools.repo_tools import clone_repo_tool, discover_test_files_tool, read_file_tool, write_file_tool
-from tools.test_tools import run_tests_tool, parse_test_failures_tool
+from tools.test_tools import run_tests_tool, parse_test_failures_tool, read_test_output_tool
+from tools.test_stream import test_events
 from tools.git_tools import create_branch_tool, commit_and_push_tool, get_commit_count_tool
 from tools.github_tools import monitor_cicd_tool, get_workflow_status_tool
-from tools.analysis_tools import analyze_code_tool, generate_fix_tool
+from tools.analysis_tools import analyze_code_tool, generate_fix_tool, apply_fixes_tool, try_fix_candidates_tool
 
 load_dotenv()
 
-llm = ChatOpenAI(model="gpt-4o", temperature=0, api_key=os.getenv("OPENAI_API_KEY"))
+def crew_llm():
+    """The crew reasons about every bug type, so it runs on the strong model (or a healthy fallback)"""
+    model = get_router().pick(bug_types={"LOGIC"})
+    return get_chat_model(model, temperature=LLM_TEMPERATURE)
 
 def create_repo_analyst():
     return Agent(
@@ -24,7 +31,7 @@ def create_repo_analyst():
         goal="Clone the given GitHub repository and thoroughly analyze its structure. Discover ALL test files dynamically — never hardcode file paths.",
         backstory="You are an expert DevOps engineer who specializes in understanding codebases. You know how to find test files by looking for patterns like test_*.py, *_test.py, *.test.js, *.spec.ts, and test directories.",
         tools=[clone_repo_tool, discover_test_files_tool, read_file_tool],
-        llm=llm, verbose=True, allow_delegation=False,
+        llm=crew_llm(), verbose=True, allow_delegation=False,
     )
 
 def create_test_runner():
@@ -32,8 +39,8 @@ def create_test_runner():
         role="Test Runner",
         goal="Run all test files in the repository and collect EVERY failure with exact file names, line numbers, and error messages.",
         backstory="You are a QA automation expert who knows how to run pytest, jest, mocha, unittest, and other test frameworks.",
-        tools=[run_tests_tool, parse_test_failures_tool],
-        llm=llm, verbose=True, allow_delegation=False,
+        tools=[run_tests_tool, parse_test_failures_tool, read_test_output_tool],
+        llm=crew_llm(), verbose=True, allow_delegation=False,
     )
 
 def create_bug_classifier():
@@ -41,8 +48,8 @@ def create_bug_classifier():
         role="Bug Classifier",
         goal="Analyze all test failures and classify each bug as exactly one of: LINTING, SYNTAX, LOGIC, TYPE_ERROR, IMPORT, or INDENTATION with exact file path and line number.",
         backstory="You are a senior software engineer who instantly recognizes bug types based on error messages and stack traces.",
-        tools=[analyze_code_tool, read_file_tool],
-        llm=llm, verbose=True, allow_delegation=False,
+        tools=[analyze_code_tool, read_file_tool, read_test_output_tool],
+        llm=crew_llm(), verbose=True, allow_delegation=False,
     )
 
 def create_code_fixer():
@@ -50,8 +57,8 @@ def create_code_fixer():
         role="Code Fixer",
         goal="Generate correct, minimal fixes for each classified bug. Fix only what is broken — do not refactor or change unrelated code.",
         backstory="You are an expert programmer who writes clean, minimal fixes and never introduces new bugs while fixing existing ones.",
-        tools=[read_file_tool, write_file_tool, generate_fix_tool, analyze_code_tool],
-        llm=llm, verbose=True, allow_delegation=False,
+        tools=[read_file_tool, write_file_tool, apply_fixes_tool, try_fix_candidates_tool, generate_fix_tool, analyze_code_tool],
+        llm=crew_llm(), verbose=True, allow_delegation=False,
     )
 
 def create_git_committer():
@@ -60,7 +67,7 @@ def create_git_committer():
         goal="Commit all applied fixes with the [AI-AGENT] prefix. Push ONLY to the designated feature branch — NEVER to main. Batch related fixes to minimize commit count.",
         backstory="You are a DevOps engineer who always uses the [AI-AGENT] prefix and never accidentally pushes to protected branches.",
         tools=[create_branch_tool, commit_and_push_tool, get_commit_count_tool],
-        llm=llm, verbose=True, allow_delegation=False,
+        llm=crew_llm(), verbose=True, allow_delegation=False,
     )
 
 def create_ci_monitor():
@@ -69,7 +76,7 @@ def create_ci_monitor():
         goal="Monitor the GitHub Actions CI/CD pipeline after each push. Report pass/fail status and track all runs with timestamps.",
         backstory="You are a DevOps specialist who deeply understands GitHub Actions and knows how to poll the GitHub API for workflow run status.",
         tools=[monitor_cicd_tool, get_workflow_status_tool],
-        llm=llm, verbose=True, allow_delegation=False,
+        llm=crew_llm(), verbose=True, allow_delegation=False,
     )
 
 def create_tasks(agents, run_config):
@@ -83,21 +90,21 @@ def create_tasks(agents, run_config):
     )
 
     task_run_tests = Task(
-        description="Run ALL discovered tests. Collect every failure with file, line number, and error message.",
-        expected_output='JSON: {"total_tests": int, "total_failures": int, "failures": [{file, line, error_message, test_name}]}',
+        description="Run ALL discovered tests. Collect every failure with file, line number, and error message.\nraw_output only holds the head and tail of each test process's output; read more of a log from output_logs with Read Test Output only when a failure needs it.",
+        expected_output='JSON: {"total_tests": int, "total_failures": int, "total_clusters": int, "failures": [{file, line, error_message, test_name, bug_type, cluster_size}], "fault_localization": {"regions": [{file, start, end, score, code}]}}',
         agent=agents["test_runner"],
         context=[task_clone],
     )
 
     task_classify = Task(
-        description="Classify each failure as: LINTING, SYNTAX, LOGIC, TYPE_ERROR, IMPORT, or INDENTATION with file, line, description, fix_hint.",
+        description="Each failure represents a cluster of cluster_size failures with the same root cause and a pre-classified bug_type; handle it once.\nClassify each failure as: LINTING, SYNTAX, LOGIC, TYPE_ERROR, IMPORT, or INDENTATION with file, line, description, fix_hint.\nFor LOGIC and TYPE_ERROR failures, locate the bug in the fault_localization regions of the test results (most suspicious first) instead of reading whole files.",
         expected_output='JSON list: [{file, line, bug_type, description, fix_hint}]',
         agent=agents["bug_classifier"],
         context=[task_run_tests],
     )
 
     task_fix = Task(
-        description="Generate and apply minimal fixes for each classified bug. Record file, line, bug_type, fix_applied, status ('Fixed' or 'Failed').",
+        description="Generate and apply minimal fixes for each classified bug. Apply all rule-fixable bugs with ONE Apply Code Fixes call (it writes each file once); use the LLM and Write File Contents only for bugs it reports as needing the LLM. Record file, line, bug_type, fix_applied, status ('Fixed' or 'Failed').\nFor LOGIC and TYPE_ERROR bugs, only change lines inside the suspicious fault_localization regions.\nWhen a bug has more than one plausible fix (different rules or LLM fixes), pass them all to ONE Try Fix Candidates call with the cluster's failing tests instead of trying them over several iterations.",
         expected_output='JSON list: [{file, line, bug_type, fix_applied, status, commit_message}]',
         agent=agents["code_fixer"],
         context=[task_classify],
@@ -165,7 +172,9 @@ def run_healing_crew(run_id, repo_url, team_name, leader_name, branch_name, prog
 
     for iteration in range(1, max_retries + 1):
         print(f"\n{'='*60}\n🔄 ITERATION {iteration}/{max_retries}\n{'='*60}\n")
-        result = crew.kickoff(inputs=run_config)
+        # Failing tests and the test-stage ETA reach the dashboard while tests run
+        with test_events(progress_callback):
+            result = crew.kickoff(inputs=run_config)
         parsed = parse_crew_result(result, run_config)
 
         all_fixes.extend(parsed.get("fixes", []))
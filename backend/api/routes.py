@@ -13,10 +13,17 @@ from pydantic import BaseModel
 
 from simple_agent import simple_healing_agent
 from llm_agent import llm_healing_agent
+from llm_metrics import model_metrics
+from llm_router import get_router
+from tools.test_stream import read_output
 
 router = APIRouter()
 runs: dict[str, dict] = {}
 
+# Live events whose data is also kept in the run status (the agent's stage and
+# the test-stage ETA, published while llm_healing_agent runs the suite)
+STATUS_EVENTS = {"STATUS", "TEST_ETA"}
+
 class RunAgentRequest(BaseModel):
     repo_url: str
     team_name: str
@@ -104,12 +111,25 @@ async def execute_agent_run(
     try:
         await send_update("STATUS", {"status": "STARTING", "message": "Initializing agent..."})
 
+        # The agent runs in a worker thread; hop live events back onto the loop
+        loop = asyncio.get_running_loop()
+
+        def progress(event, data):
+            if event in STATUS_EVENTS:
+                loop.call_soon_threadsafe(runs[run_id].update, data)
+            asyncio.run_coroutine_threadsafe(
+                ws_manager.send_update(run_id, {"event": event, "run_id": run_id, **data}), loop
+            )
+
         # Use the LLM agent for intelligent fixing
         result = await asyncio.to_thread(
             llm_healing_agent,
             repo_url=repo_url,
             team_name=team_name,
-            leader_name=leader_name
+            leader_name=leader_name,
+            progress_callback=progress,
+            # Failing tests drive fault localization and live TEST_ETA/TEST_FAILURE events
+            run_tests=True
         )
 
         # Update the run data with results
@@ -144,6 +164,21 @@ def get_results(run_id: str):
 def list_runs():
     return list(runs.values())
 
+@router.get("/llm/metrics")
+def get_llm_metrics():
+    """Rolling per-model token, latency and error histograms, plus routing health"""
+    return {"models": model_metrics(), "routing": get_router().health(), "timestamp": datetime.utcnow().isoformat()}
+
+@router.get("/test-output/{log_id}")
+def get_test_output(log_id: str, start: int = 0, length: int = 65536):
+    """A byte range of a spooled test output log (ids are listed in a test run's output_logs)"""
+    try:
+        return read_output(log_id, start, length)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Test output not found")
+
 def save_results(run_id: str, data: dict):
     results_dir = Path("./results")
     results_dir.mkdir(exist_ok=True)
@@ -13,11 +13,12 @@ import git
 from datetime import datetime
 import shutil
 import time
-import re
 import ast
 import sys
 from typing import List, Dict, Any, Tuple
 
+from tools.fix_engine import fix_source, agent_fix
+
 def create_test_repository_with_issues():
     """
     Create a test repository with intentional issues that can be fixed
@@ -142,193 +143,12 @@ def analyze_and_fix_file(file_path: Path, repo_path: Path) -> Tuple[List[Dict[st
     Analyze a Python file, detect issues, and actually fix them
     Returns fixes and the corrected file content
     """
-    fixes = []
-    
+    original_content = ""
     try:
         original_content = file_path.read_text(encoding='utf-8', errors='replace')
-        lines = original_content.splitlines()
         relative_path = str(file_path.relative_to(repo_path))
-        
-        # Track changes
-        fixed_lines = lines.copy()
-        lines_to_remove = set()
-        
-        # 1. LINTING: Fix unused imports
-        import_lines = {}
-        import_usage = {}
-        
-        for i, line in enumerate(lines):
-            line_stripped = line.strip()
-            
-            # Track import statements
-            if line_stripped.startswith("import "):
-                import_match = re.match(r'import\s+([a-zA-Z_][a-zA-Z0-9_]*)', line_stripped)
-                if import_match:
-                    module_name = import_match.group(1)
-                    import_lines[module_name] = i
-                    import_usage[module_name] = False
-        
-        # Check usage
-        for module_name in import_lines:
-            usage_patterns = [f"{module_name}.", f"{module_name}(", f" {module_name} "]
-            for pattern in usage_patterns:
-                if pattern in original_content:
-                    import_usage[module_name] = True
-                    break
-        
-        # Remove unused imports
-        for module_name, is_used in import_usage.items():
-            if not is_used and module_name not in ['unittest', 'json']:  # Keep essential imports
-                line_idx = import_lines[module_name]
-                lines_to_remove.add(line_idx)
-                fixes.append({
-                    "file": relative_path,
-                    "line_number": line_idx + 1,
-                    "bug_type": "LINTING",
-                    "description": f"LINTING error in {relative_path} line {line_idx + 1} → Fix: remove the import statement",
-                    "commit_message": f"[AI-AGENT] Fix LINTING: Remove unused import '{module_name}' from {relative_path}:{line_idx + 1}",
-                    "status": "Fixed",
-                    "original_line": lines[line_idx],
-                    "fixed_line": "# Removed unused import"
-                })
-        
-        # 2. SYNTAX: Fix missing colons
-        for i, line in enumerate(lines):
-            if i in lines_to_remove:
-                continue
-                
-            line_stripped = line.strip()
-            
-            # Check for statements that should end with colon
-            colon_patterns = [
-                (r'^(\s*)(def\s+\w+.*[^:])$', r'\1\2:'),
-                (r'^(\s*)(class\s+\w+.*[^:])$', r'\1\2:'),
-                (r'^(\s*)(if\s+.*[^:])$', r'\1\2:'),
-                (r'^(\s*)(elif\s+.*[^:])$', r'\1\2:'),
-                (r'^(\s*)(else\s*[^:])$', r'\1\2:'),
-                (r'^(\s*)(for\s+.*[^:])$', r'\1\2:'),
-                (r'^(\s*)(while\s+.*[^:])$', r'\1\2:'),
-                (r'^(\s*)(try\s*[^:])$', r'\1\2:'),
-                (r'^(\s*)(except.*[^:])$', r'\1\2:'),
-                (r'^(\s*)(finally\s*[^:])$', r'\1\2:'),
-            ]
-            
-            for pattern, replacement in colon_patterns:
-                if re.match(pattern, line) and not line.endswith('\\'):
-                    fixed_line = re.sub(pattern, replacement, line)
-                    if fixed_line != line:
-                        fixed_lines[i] = fixed_line
-                        fixes.append({
-                            "file": relative_path,
-                            "line_number": i + 1,
-                            "bug_type": "SYNTAX",
-                            "description": f"SYNTAX error in {relative_path} line {i + 1} → Fix: add the colon at the correct position",
-                            "commit_message": f"[AI-AGENT] Fix SYNTAX: Add missing colon in {relative_path}:{i + 1}",
-                            "status": "Fixed",
-                            "original_line": line,
-                            "fixed_line": fixed_line
-                        })
-                        break
-        
-        # 3. LOGIC: Fix assignment vs comparison
-        for i, line in enumerate(lines):
-            if i in lines_to_remove:
-                continue
-                
-            # Check for assignment in if conditions
-            if_assignment_pattern = r'^(\s*if\s+\w+)\s*=\s*(.*)$'
-            match = re.match(if_assignment_pattern, line)
-            if match:
-                fixed_line = f"{match.group(1)} == {match.group(2)}"
-                fixed_lines[i] = fixed_line
-                fixes.append({
-                    "file": relative_path,
-                    "line_number": i + 1,
-                    "bug_type": "LOGIC",
-                    "description": f"LOGIC error in {relative_path} line {i + 1} → Fix: use == for comparison",
-                    "commit_message": f"[AI-AGENT] Fix LOGIC: Assignment vs comparison in {relative_path}:{i + 1}",
-                    "status": "Fixed",
-                    "original_line": line,
-                    "fixed_line": fixed_line
-                })
-        
-        # 4. TYPE_ERROR: Fix string + int concatenation
-        for i, line in enumerate(lines):
-            if i in lines_to_remove:
-                continue
-                
-            # Look for string + number patterns
-            type_error_patterns = [
-                (r'(\s*.*"[^"]*")\s*\+\s*(\w+)(\s*.*)', r'\1 + str(\2)\3'),
-                (r'(\s*.*)\s*\+\s*("[^"]*")\s*\+\s*(\w+)(\s*.*)', r'\1 + \2 + str(\3)\4'),
-            ]
-            
-            for pattern, replacement in type_error_patterns:
-                if re.search(r'"[^"]*"\s*\+\s*\w+', line) and 'str(' not in line:
-                    # Simple fix: wrap variables in str()
-                    fixed_line = re.sub(r'(\+\s*)(\w+)(\s*)', r'\1str(\2)\3', line)
-                    if fixed_line != line:
-                        fixed_lines[i] = fixed_line
-                        fixes.append({
-                            "file": relative_path,
-                            "line_number": i + 1,
-                            "bug_type": "TYPE_ERROR",
-                            "description": f"TYPE_ERROR in {relative_path} line {i + 1} → Fix: convert types before concatenation",
-                            "commit_message": f"[AI-AGENT] Fix TYPE_ERROR: Type conversion in {relative_path}:{i + 1}",
-                            "status": "Fixed",
-                            "original_line": line,
-                            "fixed_line": fixed_line
-                        })
-                        break
-        
-        # 5. IMPORT: Fix relative imports
-        for i, line in enumerate(lines):
-            if i in lines_to_remove:
-                continue
-                
-            if line.strip().startswith("from ."):
-                fixed_line = line.replace("from .", "from ")
-                fixed_lines[i] = fixed_line
-                fixes.append({
-                    "file": relative_path,
-                    "line_number": i + 1,
-                    "bug_type": "IMPORT",
-                    "description": f"IMPORT error in {relative_path} line {i + 1} → Fix: use absolute imports",
-                    "commit_message": f"[AI-AGENT] Fix IMPORT: Convert to absolute import in {relative_path}:{i + 1}",
-                    "status": "Fixed",
-                    "original_line": line,
-                    "fixed_line": fixed_line
-                })
-        
-        # 6. INDENTATION: Fix mixed tabs and spaces
-        for i, line in enumerate(lines):
-            if i in lines_to_remove:
-                continue
-                
-            if '\t' in line and line.startswith(' '):
-                # Convert tabs to spaces (4 spaces per tab)
-                fixed_line = line.expandtabs(4)
-                fixed_lines[i] = fixed_line
-                fixes.append({
-                    "file": relative_path,
-                    "line_number": i + 1,
-                    "bug_type": "INDENTATION",
-                    "description": f"INDENTATION error in {relative_path} line {i + 1} → Fix: use consistent indentation",
-                    "commit_message": f"[AI-AGENT] Fix INDENTATION: Consistent indentation in {relative_path}:{i + 1}",
-                    "status": "Fixed",
-                    "original_line": line,
-                    "fixed_line": fixed_line
-                })
-        
-        # Remove unused import lines and create final content
-        final_lines = []
-        for i, line in enumerate(fixed_lines):
-            if i not in lines_to_remove:
-                final_lines.append(line)
-        
-        fixed_content = '\n'.join(final_lines)
-        
-        return fixes, fixed_content
+        fixed_content, applied = fix_source(original_content, file_path)
+        return [agent_fix(entry, relative_path) for entry in applied], fixed_content
         
     except Exception as e:
         print(f"Error analyzing {file_path}: {e}")
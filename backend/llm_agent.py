@@ -16,39 +16,534 @@ import time
 import re
 import ast
 import sys
-from typing import List, Dict, Any, Tuple
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Tuple, Callable, Optional
 from dotenv import load_dotenv
 
+from config import LLM_TEMPERATURE, MAX_TOKENS
+from llm_clients import get_openai_client
+from llm_metrics import RunLLMStats, new_call_record, record_call, get_histogram
+from llm_router import get_router
+from tools import fault_localization, fix_verify, triage
+from tools.fault_localization import focus_excerpt, regions_by_file, strip_line_numbers
+from tools.fix_engine import fix_source, agent_fix, original_line_numbers
+
 # Load environment variables
 load_dotenv()
 
 try:
     import openai
-    from openai import OpenAI
     HAS_OPENAI = True
 except ImportError:
     HAS_OPENAI = False
     print("⚠️  OpenAI not installed. Install with: pip install openai")
 
+# Errors worth retrying with backoff; everything else fails the call immediately
+RETRYABLE_ERRORS = (
+    (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError)
+    if HAS_OPENAI else ()
+)
+
+# Process-wide cache of completions keyed by model, prompt and max_tokens;
+# retries (attempt > 0) bypass it and fix replies are only cached once verified
+_response_cache: "OrderedDict[str, str]" = OrderedDict()
+_response_cache_lock = threading.Lock()
+RESPONSE_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", 256))
+
+# Bug types the deterministic rules (tools.fixers) only repair in their common
+# token-level forms - files still suspected of these after the rule tier are
+# escalated to the LLM even when they compile cleanly.
+LLM_ONLY_BUG_TYPES = {"LOGIC", "TYPE_ERROR"}
+
+class LLMBudget:
+    """Per-run cap on LLM calls, tokens and wall-clock seconds spent waiting on the LLM"""
+
+    def __init__(self, max_calls: int = None, max_tokens: int = None, max_seconds: float = None):
+        self.max_calls = max_calls if max_calls is not None else int(os.getenv("LLM_MAX_CALLS_PER_RUN", 10))
+        self.max_tokens = max_tokens if max_tokens is not None else int(os.getenv("LLM_TOKEN_BUDGET", 30000))
+        self.max_seconds = max_seconds if max_seconds is not None else float(os.getenv("LLM_TIME_BUDGET", 120))
+        self.max_hedges = int(os.getenv("LLM_HEDGE_BUDGET", 3))
+        self.calls = 0
+        self.tokens = 0
+        self.seconds = 0.0
+        self.denied = 0
+        self.hedges = 0
+        self._lock = threading.Lock()
+
+    def allows(self, estimated_tokens: int = 0) -> bool:
+        """Check whether another call of roughly `estimated_tokens` fits in the budget"""
+        with self._lock:
+            ok = (
+                self.calls < self.max_calls
+                and self.tokens + estimated_tokens <= self.max_tokens
+                and self.seconds < self.max_seconds
+            )
+            if not ok:
+                self.denied += 1
+            return ok
+
+    def charge(self, tokens: int, seconds: float):
+        with self._lock:
+            self.calls += 1
+            self.tokens += tokens
+            self.seconds += seconds
+
+    def take_hedge(self, estimated_tokens: int) -> bool:
+        """Reserve one duplicate (hedged) request, if the run's hedge and token budgets allow"""
+        with self._lock:
+            if self.hedges >= self.max_hedges or self.tokens + estimated_tokens > self.max_tokens:
+                return False
+            self.hedges += 1
+            self.tokens += estimated_tokens
+            return True
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "tokens": self.tokens,
+            "seconds": round(self.seconds, 2),
+            "denied": self.denied,
+            "hedges": self.hedges,
+            "max_hedges": self.max_hedges,
+            "max_calls": self.max_calls,
+            "max_tokens": self.max_tokens,
+            "max_seconds": self.max_seconds,
+        }
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token) used for budget checks"""
+    return len(text) // 4 + 1
+
+BUG_CATEGORIES = """- LINTING: Unused imports, style violations
+- SYNTAX: Missing colons, brackets, invalid syntax  
+- LOGIC: Assignment vs comparison, logic errors
+- TYPE_ERROR: Type mismatches, string+int concatenation
+- IMPORT: Import path issues, missing modules
+- INDENTATION: Mixed tabs/spaces, indentation errors"""
+
+def extract_json(text: str) -> Any:
+    """Parse a JSON object from an LLM reply, tolerating surrounding prose or code fences"""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        json_match = re.search(r'\{.*\}', text, re.DOTALL)
+        if json_match:
+            return json.loads(json_match.group())
+        raise
+
+def pack_batches(files: List[Tuple[str, str]], token_budget: int, max_files: int) -> List[List[Tuple[str, str]]]:
+    """
+    Greedily pack (path, content) pairs into batches whose estimated prompt size
+    stays under `token_budget`. Files too large to share a request go alone.
+    """
+    batches, current, current_tokens = [], [], 0
+    for path, content in files:
+        tokens = estimate_tokens(content)
+        if tokens >= token_budget:
+            batches.append([(path, content)])
+            continue
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_files):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append((path, content))
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def split_for_retry(batch: List[Tuple[str, str]], missing: List[Tuple[str, str]]) -> List[List[Tuple[str, str]]]:
+    """Halve a batch whose reply failed to parse; retry a partial miss as one smaller batch"""
+    if len(missing) < len(batch):
+        return [missing]
+    mid = len(missing) // 2
+    return [missing[:mid], missing[mid:]]
+
+class HedgeCancelled(Exception):
+    """Raised inside a hedged attempt that lost the race, to abandon its stream"""
+
+class IncrementalIssueParser:
+    """
+    Incremental JSON scanner for streamed LLM replies. Each object inside an
+    "issues" array is handed to `on_issue(file_path, issue)` as soon as its
+    closing brace arrives. `file_path` is the enclosing key for batched
+    replies ({"files": {path: {"issues": [...]}}}) and None otherwise.
+    """
+
+    def __init__(self, on_issue: Callable[[Optional[str], Dict[str, Any]], None]):
+        self.on_issue = on_issue
+        self.data = ""
+        self.pos = 0
+        self.stack = []
+        self.in_string = False
+        self.escape = False
+        self.string_start = 0
+        self.emitted = 0
+
+    def feed(self, text: str):
+        self.data += text
+        for i in range(self.pos, len(self.data)):
+            self._step(self.data, i)
+        self.pos = len(self.data)
+
+    def _step(self, data: str, i: int):
+        ch = data[i]
+        if self.in_string:
+            if self.escape:
+                self.escape = False
+            elif ch == "\\":
+                self.escape = True
+            elif ch == '"':
+                self.in_string = False
+                frame = self.stack[-1] if self.stack else None
+                if frame and frame["type"] == "{" and frame["expect_key"]:
+                    try:
+                        frame["key"] = json.loads(data[self.string_start:i + 1])
+                    except json.JSONDecodeError:
+                        frame["key"] = None
+            return
+        if ch == '"':
+            if self.stack:
+                self.in_string = True
+                self.string_start = i
+        elif ch == "{":
+            self.stack.append({"type": "{", "start": i, "key": None, "expect_key": True})
+        elif ch == "[":
+            owner = self.stack[-1]["key"] if self.stack and self.stack[-1]["type"] == "{" else None
+            self.stack.append({"type": "[", "start": i, "owner": owner})
+        elif ch == ":" and self.stack and self.stack[-1]["type"] == "{":
+            self.stack[-1]["expect_key"] = False
+        elif ch == "," and self.stack and self.stack[-1]["type"] == "{":
+            self.stack[-1]["expect_key"] = True
+        elif ch in "}]" and self.stack:
+            frame = self.stack.pop()
+            parent = self.stack[-1] if self.stack else None
+            if ch == "}" and parent and parent["type"] == "[" and parent["owner"] == "issues":
+                self._emit(data[frame["start"]:i + 1])
+
+    def _emit(self, text: str):
+        try:
+            issue = json.loads(text)
+        except json.JSONDecodeError:
+            return
+        if not isinstance(issue, dict):
+            return
+        # Object frames above the issues array: [root, (files, path,)] -> path is the batch key
+        keys = [f["key"] for f in self.stack if f["type"] == "{"]
+        file_path = keys[-2] if len(keys) >= 3 and keys[0] == "files" else None
+        self.emitted += 1
+        self.on_issue(file_path, issue)
+
+class EditBuffer:
+    """
+    Line buffer for applying edit-style issues (original_line -> suggested_fix)
+    as they stream in. Edits address original line numbers, so earlier edits
+    never shift later ones; an edit that breaks compilation is not applied.
+    """
+
+    def __init__(self, content: str):
+        self.slots = [[line] for line in content.splitlines()]
+        self.original = content.splitlines()
+        self.applied = 0
+
+    def apply(self, issue: Dict[str, Any]) -> bool:
+        """Apply one issue's edit; False when it is not a clean single-line edit"""
+        try:
+            index = int(issue.get("line_number", 0)) - 1
+        except (TypeError, ValueError):
+            return False
+        original_line = issue.get("original_line")
+        suggested = issue.get("suggested_fix")
+        if isinstance(original_line, str) and isinstance(suggested, str):
+            # Issues found in a focus_excerpt may quote its line-number prefixes
+            original_line, suggested = strip_line_numbers(original_line), strip_line_numbers(suggested)
+        if not 0 <= index < len(self.original) or not isinstance(original_line, str) or not isinstance(suggested, str):
+            return False
+        if self.original[index].strip() != original_line.strip() or not original_line.strip():
+            return False
+        indent = self.original[index][:len(self.original[index]) - len(self.original[index].lstrip())]
+        replacement = [l if l[:1].isspace() or not indent else indent + l for l in suggested.splitlines()]
+        if all(l.lstrip().startswith("#") or not l.strip() for l in replacement) and not original_line.lstrip().startswith("#"):
+            # A comment in place of code is a description of a deletion, not code
+            replacement = []
+        before, previous = self.render(), self.slots[index]
+        self.slots[index] = replacement
+        if not self._no_worse(before, self.render()):
+            self.slots[index] = previous
+            return False
+        self.applied += 1
+        return True
+
+    @staticmethod
+    def _no_worse(before: str, after: str) -> bool:
+        """An edit must keep the file compiling, or (when it did not) not move its first error earlier"""
+        error_after = compile_error(after)
+        if not error_after:
+            return True
+        error_before = compile_error(before)
+        line = lambda e: int(re.match(r"line (\d+)", e).group(1)) if re.match(r"line (\d+)", e) else 0
+        return bool(error_before) and line(error_after) >= line(error_before)
+
+    def render(self) -> str:
+        return "\n".join(line for slot in self.slots for line in slot)
+
 class LLMCodeFixer:
     """LLM-powered code analysis and fixing agent"""
     
-    def __init__(self):
+    def __init__(self, budget: LLMBudget = None, stats: RunLLMStats = None):
         self.client = None
+        self.router = get_router()
+        self.budget = budget or LLMBudget()
+        self.stats = stats or RunLLMStats()
+        self.max_retries = int(os.getenv("LLM_MAX_RETRIES", 2))
+        self.failover_attempts = int(os.getenv("LLM_FAILOVER_ATTEMPTS", 1))
+        self.stream = os.getenv("LLM_STREAM", "true").lower() == "true"
+        self.hedging = os.getenv("LLM_HEDGE", "true").lower() == "true"
+        self.hedge_percentile = float(os.getenv("LLM_HEDGE_PERCENTILE", 90))
+        self.hedge_min_delay = float(os.getenv("LLM_HEDGE_MIN_DELAY", 1.0))
+        self.hedge_min_samples = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", 10))
+        self.batch_token_budget = int(os.getenv("LLM_BATCH_TOKEN_BUDGET", 3000))
+        self.batch_max_files = int(os.getenv("LLM_BATCH_MAX_FILES", 8))
         
-        # Try to get API key from multiple sources
-        api_key = (
-            os.getenv("OPENAI_API_KEY"),"" 
-        )
+        # Clients (and their HTTP connection pool) are shared across runs
+        self.client = get_openai_client()
         
-        if HAS_OPENAI and api_key:
-            self.client = OpenAI(api_key=api_key)
-            print("✅ OpenAI client initialized")
+        if self.client:
+            print("✅ OpenAI client ready (shared connection pool)")
         else:
             print("⚠️  OpenAI API key not found. Using rule-based fixes only.")
     
-    def analyze_code_with_llm(self, file_content: str, file_path: str) -> List[Dict[str, Any]]:
-        """Use LLM to analyze code and suggest fixes"""
+    def _complete(self, messages: List[Dict[str, str]], max_tokens: int, purpose: str = "",
+                  on_delta: Callable[[str], None] = None, bug_types: Any = (), file_tokens: int = 0,
+                  attempt: int = 0, cacheable: Callable[[str], bool] = None) -> str:
+        """
+        Run one chat completion on the model the router picks for these bug
+        types, file size and attempt number, failing over to another healthy
+        model if it errors before any text has been delivered. Retries never
+        use the response cache; `cacheable(reply)` decides whether a reply is stored.
+        """
+        tried = []
+        delivered = []
+
+        def forward(text: str):
+            delivered.append(True)
+            if on_delta:
+                on_delta(text)
+
+        model = self.router.pick(bug_types, file_tokens, attempt)
+        while True:
+            try:
+                return self._complete_with_model(model, messages, max_tokens, purpose, forward,
+                                                 use_cache=attempt == 0, cacheable=cacheable)
+            except Exception as e:
+                tried.append(model)
+                if delivered or len(tried) > self.failover_attempts:
+                    raise
+                next_model = self.router.pick(bug_types, file_tokens, attempt, exclude=tried)
+                if next_model in tried:
+                    raise
+                print(f"🔀 {model} failed ({type(e).__name__}), failing over to {next_model}")
+                model = next_model
+
+    def _complete_with_model(self, model: str, messages: List[Dict[str, str]], max_tokens: int,
+                             purpose: str = "", on_delta: Callable[[str], None] = None,
+                             use_cache: bool = True, cacheable: Callable[[str], bool] = None) -> str:
+        """
+        Run one chat completion, charging it against the run budget and
+        recording tokens, latency, cache hits and retries. With streaming
+        enabled, each text delta is passed to `on_delta` as it arrives.
+        """
+        record = new_call_record(model, purpose)
+        cache_key = hashlib.sha256(
+            json.dumps([model, max_tokens, messages], sort_keys=True).encode()
+        ).hexdigest()
+        with _response_cache_lock:
+            cached = _response_cache.get(cache_key) if use_cache else None
+            if cached is not None:
+                _response_cache.move_to_end(cache_key)
+        if cached is not None:
+            record["cache_hit"] = True
+            record_call(record, self.stats)
+            if on_delta:
+                on_delta(cached)
+            return cached
+
+        started = time.time()
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    content = self._hedged_request(model, messages, max_tokens, record, started, on_delta)
+                    break
+                except RETRYABLE_ERRORS:
+                    # Never retry once text has been delivered to on_delta
+                    if attempt >= self.max_retries or record["ttfb_seconds"] is not None:
+                        raise
+                    record["retries"] += 1
+                    time.sleep(min(8, 0.5 * 2 ** attempt))
+            record["latency_seconds"] = time.time() - started
+            record["prompt_tokens"] = record["prompt_tokens"] or estimate_tokens(json.dumps(messages))
+            record["completion_tokens"] = record["completion_tokens"] or estimate_tokens(content)
+        except Exception as e:
+            record["latency_seconds"] = time.time() - started
+            record["error"] = type(e).__name__
+            raise
+        finally:
+            self.budget.charge(record["prompt_tokens"] + record["completion_tokens"], record["latency_seconds"])
+            record_call(record, self.stats)
+
+        if not use_cache or (cacheable and not cacheable(content)):
+            return content
+        with _response_cache_lock:
+            _response_cache[cache_key] = content
+            while len(_response_cache) > RESPONSE_CACHE_SIZE:
+                _response_cache.popitem(last=False)
+        return content
+
+    def _hedge_delay(self, model: str) -> Optional[float]:
+        """Adaptive hedging threshold: the model's observed time-to-first-token percentile"""
+        if not self.hedging:
+            return None
+        hist = get_histogram(model)
+        if hist is None or len(hist.samples) < self.hedge_min_samples:
+            return None
+        threshold = hist.ttfb_percentile(self.hedge_percentile)
+        return max(self.hedge_min_delay, threshold) if threshold is not None else None
+
+    def _hedged_request(self, model: str, messages: List[Dict[str, str]], max_tokens: int, record: Dict[str, Any],
+                        started: float, on_delta: Callable[[str], None] = None) -> str:
+        """
+        Send a request; if it has not produced its first token by the hedging
+        threshold, send a duplicate. The first attempt to deliver text wins and
+        the other is cancelled (for non-streamed requests, the first to finish).
+        """
+        delay = self._hedge_delay(model)
+        if delay is None:
+            return self._request(model, messages, max_tokens, record, started, on_delta)
+
+        cond = threading.Condition()
+        state = {"winner": None, "launched": 0, "results": {}, "errors": {}, "records": {}}
+
+        def run_attempt(name: str):
+            attempt_record = new_call_record(model)
+            state["records"][name] = attempt_record
+
+            def claim(text: str):
+                with cond:
+                    if state["winner"] is None:
+                        state["winner"] = name
+                        cond.notify_all()
+                    if state["winner"] != name:
+                        raise HedgeCancelled()
+                if on_delta:
+                    on_delta(text)
+
+            try:
+                content = self._request(model, messages, max_tokens, attempt_record, started, claim,
+                                        should_stop=lambda: state["winner"] not in (None, name))
+                with cond:
+                    state["results"][name] = content
+            except HedgeCancelled:
+                with cond:
+                    state["errors"][name] = None
+            except Exception as e:
+                with cond:
+                    state["errors"][name] = e
+            finally:
+                with cond:
+                    cond.notify_all()
+
+        def launch(name: str):
+            state["launched"] += 1
+            threading.Thread(target=run_attempt, args=(name,), daemon=True).start()
+
+        def settled() -> bool:
+            winner = state["winner"]
+            if winner is not None:
+                return winner in state["results"] or winner in state["errors"]
+            return len(state["errors"]) == state["launched"]
+
+        with cond:
+            launch("primary")
+            cond.wait_for(lambda: state["winner"] is not None or settled(), timeout=delay)
+            if state["winner"] is None and not settled() \
+                    and self.budget.take_hedge(estimate_tokens(json.dumps(messages))):
+                print(f"🪁 No first token from {model} after {delay:.1f}s, hedging request")
+                record["hedged"] = True
+                launch("hedge")
+            cond.wait_for(settled)
+
+            winner = state["winner"]
+            if winner is None:
+                raise next(e for e in state["errors"].values() if e is not None)
+            record["hedge_won"] = record.get("hedged", False) and winner == "hedge"
+            winner_record = state["records"][winner]
+            for field in ("ttfb_seconds", "prompt_tokens", "completion_tokens"):
+                record[field] = winner_record[field]
+            if winner in state["errors"]:
+                raise state["errors"][winner]
+            return state["results"][winner]
+
+    def _request(self, model: str, messages: List[Dict[str, str]], max_tokens: int, record: Dict[str, Any],
+                 started: float, on_delta: Callable[[str], None] = None,
+                 should_stop: Callable[[], bool] = None) -> str:
+        """
+        Send a single request, streamed when enabled, and return the stripped
+        reply. `should_stop` lets a hedged attempt that lost abandon its stream.
+        """
+        if not self.stream:
+            response = self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=LLM_TEMPERATURE,
+                max_tokens=max_tokens
+            )
+            # Non-streamed: the first byte arrives with the whole body
+            record["ttfb_seconds"] = time.time() - started
+            usage = getattr(response, "usage", None)
+            if usage:
+                record["prompt_tokens"] = usage.prompt_tokens
+                record["completion_tokens"] = usage.completion_tokens
+            content = response.choices[0].message.content.strip()
+            if on_delta:
+                on_delta(content)
+            return content
+
+        stream = self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=LLM_TEMPERATURE,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        parts = []
+        try:
+            for chunk in stream:
+                if should_stop and should_stop():
+                    raise HedgeCancelled()
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                if record["ttfb_seconds"] is None:
+                    record["ttfb_seconds"] = time.time() - started
+                parts.append(delta)
+                if on_delta:
+                    on_delta(delta)
+        finally:
+            # Releases the connection, and cancels the generation if we stopped early
+            stream.response.close()
+        return "".join(parts).strip()
+
+    def analyze_code_with_llm(self, file_content: str, file_path: str,
+                              on_issue: Callable[[str, Dict[str, Any]], None] = None,
+                              bug_types: Any = ()) -> List[Dict[str, Any]]:
+        """
+        Use LLM to analyze code and suggest fixes. When `on_issue` is given,
+        each issue is passed to it as soon as it has streamed in. `bug_types`
+        are the suspected bug types, used to route the request.
+        """
         if not self.client:
             return []
         
@@ -63,12 +558,7 @@ Code:
 ```
 
 Find issues in these categories and return them in this EXACT format:
-- LINTING: Unused imports, style violations
-- SYNTAX: Missing colons, brackets, invalid syntax  
-- LOGIC: Assignment vs comparison, logic errors
-- TYPE_ERROR: Type mismatches, string+int concatenation
-- IMPORT: Import path issues, missing modules
-- INDENTATION: Mixed tabs/spaces, indentation errors
+{BUG_CATEGORIES}
 
 For each issue found, respond with JSON in this exact format:
 {{
@@ -78,45 +568,40 @@ For each issue found, respond with JSON in this exact format:
       "bug_type": "LINTING",
       "description": "LINTING error in {file_path} line 5 → Fix: remove the import statement",
       "original_line": "import unused_module",
-      "suggested_fix": "# Remove unused import",
+      "suggested_fix": "",
       "explanation": "The module 'unused_module' is imported but never used"
     }}
   ]
 }}
 
+suggested_fix is the exact replacement code for original_line (one or more lines, with indentation), written
+into the file verbatim; use an empty string to delete the line. Never put descriptions or comments in it.
 Only return valid JSON. Focus on real, fixable issues.
 """
 
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are an expert Python code analyzer. Return only valid JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,
-                max_tokens=1500
-            )
-            
-            result = response.choices[0].message.content.strip()
-            
-            # Parse JSON response
-            try:
-                data = json.loads(result)
-                return data.get("issues", [])
-            except json.JSONDecodeError:
-                # Try to extract JSON from response
-                json_match = re.search(r'\{.*\}', result, re.DOTALL)
-                if json_match:
-                    data = json.loads(json_match.group())
-                    return data.get("issues", [])
+            if not self.budget.allows(estimate_tokens(prompt) + MAX_TOKENS):
+                print(f"⏳ LLM budget exhausted, skipping analysis of {file_path}")
                 return []
+
+            parser = IncrementalIssueParser(lambda _, issue: on_issue(file_path, issue)) if on_issue else None
+            result = self._complete([
+                {"role": "system", "content": "You are an expert Python code analyzer. Return only valid JSON."},
+                {"role": "user", "content": prompt}
+            ], max_tokens=MAX_TOKENS, purpose="analyze", on_delta=parser.feed if parser else None,
+                bug_types=bug_types, file_tokens=estimate_tokens(file_content))
+            
+            return extract_json(result).get("issues", [])
                 
         except Exception as e:
             print(f"⚠️  LLM analysis failed: {e}")
             return []
     
-    def fix_code_with_llm(self, file_content: str, issues: List[Dict[str, Any]], file_path: str) -> str:
-        """Use LLM to apply fixes to the code"""
+    def fix_code_with_llm(self, file_content: str, issues: List[Dict[str, Any]], file_path: str,
+                          attempt: int = 0) -> str:
+        """
+        Use LLM to apply fixes to the code. `attempt` > 0 marks a retry after
+        a failed verification, which routes to the stronger model.
+        """
         if not self.client or not issues:
             return file_content
         
@@ -142,128 +627,432 @@ Make minimal changes - only fix the identified issues.
 Ensure the code remains functionally equivalent.
 """
 
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are an expert Python code fixer. Return only the corrected Python code."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,
-                max_tokens=2000
-            )
-            
-            fixed_code = response.choices[0].message.content.strip()
-            
-            # Remove code block markers if present
-            if fixed_code.startswith("```python"):
-                fixed_code = fixed_code[9:]
-            if fixed_code.startswith("```"):
-                fixed_code = fixed_code[3:]
-            if fixed_code.endswith("```"):
-                fixed_code = fixed_code[:-3]
+            if not self.budget.allows(estimate_tokens(prompt) + 2000):
+                print(f"⏳ LLM budget exhausted, skipping LLM fix of {file_path}")
+                return file_content
+
+            fixed_code = self._complete([
+                {"role": "system", "content": "You are an expert Python code fixer. Return only the corrected Python code."},
+                {"role": "user", "content": prompt}
+            ], max_tokens=2000, purpose="fix", bug_types={i.get("bug_type") for i in issues},
+                file_tokens=estimate_tokens(file_content), attempt=attempt,
+                cacheable=lambda reply: fix_keeps_compiling(file_content, strip_code_fences(reply), file_path))
             
-            return fixed_code.strip()
+            return strip_code_fences(fixed_code)
             
         except Exception as e:
             print(f"⚠️  LLM fixing failed: {e}")
             return file_content
 
-def analyze_and_fix_with_llm(file_path: Path, repo_path: Path, llm_fixer: LLMCodeFixer) -> Tuple[List[Dict[str, Any]], str]:
+    def analyze_files_batch(self, files: List[Tuple[str, str]],
+                            on_issue: Callable[[str, Dict[str, Any]], None] = None,
+                            hints: Dict[str, Any] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Analyze many (path, content) pairs, packing small files into shared
+        requests. Returns issues keyed by file path; `on_issue(path, issue)`
+        is called as each issue streams in. `hints` maps paths to suspected
+        bug types; files are only batched with others routed to the same model.
+        """
+        results = {}
+        if not self.client:
+            return results
+        hints = hints or {}
+        by_model: Dict[str, List[Tuple[str, str]]] = {}
+        for path, content in files:
+            model = self.router.preferred(hints.get(path, ()), estimate_tokens(content))
+            by_model.setdefault(model, []).append((path, content))
+        for group in by_model.values():
+            for batch in pack_batches(group, self.batch_token_budget, self.batch_max_files):
+                bug_types = set().union(*(set(hints.get(path, ())) for path, _ in batch))
+                results.update(self._analyze_batch(batch, on_issue, bug_types))
+        return results
+
+    def _analyze_batch(self, batch: List[Tuple[str, str]],
+                       on_issue: Callable[[str, Dict[str, Any]], None] = None,
+                       bug_types: Any = ()) -> Dict[str, List[Dict[str, Any]]]:
+        if len(batch) == 1:
+            path, content = batch[0]
+            return {path: self.analyze_code_with_llm(content, path, on_issue, bug_types)}
+
+        sections = "\n\n".join(f"File: {path}\n```python\n{content}\n```" for path, content in batch)
+        prompt = f"""
+You are an expert Python code analyzer for the RIFT 2026 hackathon. Analyze each of these Python files and identify issues that need fixing.
+
+{sections}
+
+Find issues in these categories:
+{BUG_CATEGORIES}
+
+Respond with JSON keyed by the exact file path, in this exact format:
+{{
+  "files": {{
+    "{batch[0][0]}": {{
+      "issues": [
+        {{
+          "line_number": 5,
+          "bug_type": "LINTING",
+          "description": "LINTING error in {batch[0][0]} line 5 → Fix: remove the import statement",
+          "original_line": "import unused_module",
+          "suggested_fix": "",
+          "explanation": "The module 'unused_module' is imported but never used"
+        }}
+      ]
+    }}
+  }}
+}}
+
+suggested_fix is the exact replacement code for original_line (one or more lines, with indentation), written
+into the file verbatim; use an empty string to delete the line. Never put descriptions or comments in it.
+Include every file, using an empty issues list when a file has no issues. Only return valid JSON.
+"""
+        max_tokens = min(4000, 600 * len(batch))
+        if not self.budget.allows(estimate_tokens(prompt) + max_tokens):
+            print(f"⏳ LLM budget exhausted, skipping batch of {len(batch)} files")
+            return {path: [] for path, _ in batch}
+
+        # Streamed issues are only forwarded once; a split retry may repeat a file
+        paths = {path for path, _ in batch}
+        streamed = set()
+        def forward(path, issue):
+            if on_issue and path in paths:
+                streamed.add(path)
+                on_issue(path, issue)
+
+        per_file = None
+        try:
+            parser = IncrementalIssueParser(forward) if on_issue else None
+            result = self._complete([
+                {"role": "system", "content": "You are an expert Python code analyzer. Return only valid JSON."},
+                {"role": "user", "content": prompt}
+            ], max_tokens=max_tokens, purpose="analyze_batch", on_delta=parser.feed if parser else None,
+                bug_types=bug_types, file_tokens=max(estimate_tokens(content) for _, content in batch))
+            per_file = extract_json(result).get("files")
+        except Exception as e:
+            print(f"⚠️  Batched LLM analysis failed: {e}")
+
+        results = {}
+        if isinstance(per_file, dict):
+            for path, _ in batch:
+                entry = per_file.get(path)
+                if isinstance(entry, dict) and isinstance(entry.get("issues"), list):
+                    results[path] = entry["issues"]
+                elif isinstance(entry, list):
+                    results[path] = entry
+
+        missing = [item for item in batch if item[0] not in results]
+        if missing:
+            # Split what the model could not answer and retry with smaller requests
+            print(f"🔁 Splitting batch: {len(missing)}/{len(batch)} files unparsed")
+            retry_on_issue = (lambda path, issue: path not in streamed and on_issue(path, issue)) if on_issue else None
+            for part in split_for_retry(batch, missing):
+                results.update(self._analyze_batch(part, retry_on_issue, bug_types))
+        return results
+
+    def fix_files_batch(self, items: List[Tuple[str, str, List[Dict[str, Any]]]], attempt: int = 0) -> Dict[str, str]:
+        """
+        Apply LLM fixes to many (path, content, issues) triples, packing small
+        files routed to the same model into shared requests. Returns fixed
+        content keyed by file path.
+        """
+        results = {}
+        if not self.client:
+            return results
+        issues_by_path = {path: issues for path, _, issues in items if issues}
+        by_model: Dict[str, List[Tuple[str, str]]] = {}
+        for path, content, issues in items:
+            if issues:
+                model = self.router.preferred({i.get("bug_type") for i in issues}, estimate_tokens(content), attempt)
+                by_model.setdefault(model, []).append((path, content))
+        for group in by_model.values():
+            for batch in pack_batches(group, self.batch_token_budget, self.batch_max_files):
+                results.update(self._fix_batch(batch, issues_by_path, attempt))
+        return results
+
+    def _fix_batch(self, batch: List[Tuple[str, str]], issues_by_path: Dict[str, List[Dict[str, Any]]],
+                   attempt: int = 0) -> Dict[str, str]:
+        if len(batch) == 1:
+            path, content = batch[0]
+            return {path: self.fix_code_with_llm(content, issues_by_path[path], path, attempt)}
+
+        sections = []
+        for path, content in batch:
+            issues_text = "\n".join(
+                f"Line {issue.get('line_number')}: {issue.get('bug_type')} - {issue.get('explanation', '')}"
+                for issue in issues_by_path[path]
+            )
+            sections.append(f"File: {path}\nIssues to fix:\n{issues_text}\nOriginal code:\n```python\n{content}\n```")
+        joined = "\n\n".join(sections)
+        prompt = f"""
+Fix each of the following Python files by addressing the listed issues.
+
+{joined}
+
+Respond with JSON mapping each exact file path to its full corrected code:
+{{"files": {{"{batch[0][0]}": "<corrected code>"}}}}
+
+Make minimal changes - only fix the identified issues. Only return valid JSON.
+"""
+        max_tokens = min(4000, sum(estimate_tokens(content) for _, content in batch) + 200 * len(batch))
+        if not self.budget.allows(estimate_tokens(prompt) + max_tokens):
+            print(f"⏳ LLM budget exhausted, skipping LLM fix of {len(batch)} files")
+            return {path: content for path, content in batch}
+
+        def cacheable(reply: str) -> bool:
+            try:
+                files = extract_json(reply).get("files")
+            except Exception:
+                return False
+            return isinstance(files, dict) and all(
+                isinstance(files.get(path), str) and fix_keeps_compiling(content, files[path].strip(), path)
+                for path, content in batch)
+
+        per_file = None
+        try:
+            result = self._complete([
+                {"role": "system", "content": "You are an expert Python code fixer. Return only valid JSON."},
+                {"role": "user", "content": prompt}
+            ], max_tokens=max_tokens, purpose="fix_batch",
+                bug_types={i.get("bug_type") for path, _ in batch for i in issues_by_path[path]},
+                file_tokens=max(estimate_tokens(content) for _, content in batch), attempt=attempt,
+                cacheable=cacheable)
+            per_file = extract_json(result).get("files")
+        except Exception as e:
+            print(f"⚠️  Batched LLM fixing failed: {e}")
+
+        results = {}
+        if isinstance(per_file, dict):
+            for path, _ in batch:
+                if isinstance(per_file.get(path), str):
+                    results[path] = per_file[path].strip()
+
+        missing = [item for item in batch if item[0] not in results]
+        if missing:
+            print(f"🔁 Splitting fix batch: {len(missing)}/{len(batch)} files unparsed")
+            for part in split_for_retry(batch, missing):
+                results.update(self._fix_batch(part, issues_by_path, attempt))
+        return results
+
+def strip_code_fences(text: str) -> str:
+    """Remove the code block markers models wrap code replies in"""
+    if text.startswith("```python"):
+        text = text[9:]
+    if text.startswith("```"):
+        text = text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return text.strip()
+
+def fix_keeps_compiling(original: str, fixed: str, file_name: str = "<string>") -> bool:
+    """The verification an LLM fix must pass: it may not break a file that compiled"""
+    return bool(fixed) and (not compile_error(fixed, file_name) or bool(compile_error(original, file_name)))
+
+def compile_error(content: str, file_name: str = "<string>") -> str:
+    """Return the SyntaxError message for `content`, or an empty string if it compiles"""
+    try:
+        ast.parse(content, filename=file_name)
+        return ""
+    except SyntaxError as e:
+        return f"line {e.lineno}: {e.msg}"
+    except ValueError as e:
+        return str(e)
+
+def find_llm_only_lines(content: str) -> List[Tuple[int, str]]:
+    """Cheap heuristics for lines with bug types the rules may have left unfixed (see LLM_ONLY_BUG_TYPES)"""
+    found = []
+    for i, line in enumerate(content.splitlines(), 1):
+        stripped = line.strip()
+        if stripped.startswith("#"):
+            continue
+        if re.match(r'^(if|elif|while)\s+[\w.\[\]]+\s*=\s*[^=]', stripped):
+            found.append((i, "LOGIC"))
+        if re.search(r'["\'][^"\']*["\']\s*\+\s*[A-Za-z_]\w*\b(?!\s*\()', stripped) and "str(" not in stripped:
+            found.append((i, "TYPE_ERROR"))
+    return found
+
+def detect_llm_only_issues(content: str) -> List[str]:
+    """Bug types found by find_llm_only_lines, in order of first appearance"""
+    found = []
+    for _, bug_type in find_llm_only_lines(content):
+        if bug_type not in found:
+            found.append(bug_type)
+    return found
+
+def rule_tier(file_path: Path, repo_path: Path, content: str) -> Tuple[List[Dict[str, Any]], str, Dict[str, str], List[int]]:
+    """
+    Tiers 1 and 2: deterministic rule fixes followed by a compile check.
+    Returns the fixes, the rule-fixed content, the reasons (if any) the
+    file still needs the LLM, keyed by suspected bug type, and the original
+    line number of each line of the rule-fixed content.
+    """
+    relative_path = str(file_path.relative_to(repo_path))
+    fixed_content, applied = fix_source(content, file_path)
+    fixes = rule_fixes(applied, relative_path)
+    reasons = {}
+    residual_error = compile_error(fixed_content, str(file_path.relative_to(repo_path)))
+    if residual_error:
+        reasons["SYNTAX"] = f"still fails to compile ({residual_error})"
+    for bug_type in detect_llm_only_issues(fixed_content):
+        reasons[bug_type] = f"suspected {bug_type}"
+    return fixes, fixed_content, reasons, original_line_numbers(content, applied)
+
+def llm_issue_to_fix(issue: Dict[str, Any], relative_path: str, line_map: List[int] = None) -> Dict[str, Any]:
     """
-    Analyze a Python file using LLM and apply intelligent fixes
+    Convert an issue reported by the LLM to our fix format. The LLM numbers
+    lines of the rule-fixed content; `line_map` (from rule_tier) turns them
+    back into the original file's line numbers, which rule fixes use.
     """
+    line_number = issue.get("line_number", 1)
     try:
-        original_content = file_path.read_text(encoding='utf-8', errors='replace')
-        relative_path = str(file_path.relative_to(repo_path))
-        
-        print(f"🤖 Analyzing {relative_path} with LLM...")
-        
-        # Get LLM analysis
-        llm_issues = llm_fixer.analyze_code_with_llm(original_content, relative_path)
-        
-        # Convert to our format and apply fixes
-        fixes = []
-        fixed_content = original_content
-        
-        if llm_issues:
-            print(f"🔍 LLM found {len(llm_issues)} issues")
-            
-            # Apply LLM fixes
-            fixed_content = llm_fixer.fix_code_with_llm(original_content, llm_issues, relative_path)
-            
-            # Convert to our format
-            for issue in llm_issues:
-                fixes.append({
-                    "file": relative_path,
-                    "line_number": issue.get("line_number", 1),
-                    "bug_type": issue.get("bug_type", "UNKNOWN"),
-                    "description": issue.get("description", f"Issue in {relative_path}"),
-                    "commit_message": f"[AI-AGENT] Fix {issue.get('bug_type', 'UNKNOWN')}: {issue.get('explanation', 'Code issue')} in {relative_path}",
-                    "status": "Fixed",
-                    "original_line": issue.get("original_line", ""),
-                    "fixed_line": issue.get("suggested_fix", ""),
-                    "llm_powered": True
-                })
-        
-        # Fallback to rule-based analysis if LLM didn't find issues
-        if not fixes:
-            print(f"🔧 Using rule-based analysis for {relative_path}")
-            fixes, fixed_content = rule_based_analysis(file_path, repo_path, original_content)
-        
-        return fixes, fixed_content
-        
-    except Exception as e:
-        print(f"❌ Error analyzing {file_path}: {e}")
-        return [], original_content
+        if line_map and 1 <= int(line_number) <= len(line_map):
+            line_number = line_map[int(line_number) - 1]
+    except (TypeError, ValueError):
+        pass
+    return {
+        "file": relative_path,
+        "line_number": line_number,
+        "bug_type": issue.get("bug_type", "UNKNOWN"),
+        "description": issue.get("description", f"Issue in {relative_path}"),
+        "commit_message": f"[AI-AGENT] Fix {issue.get('bug_type', 'UNKNOWN')}: {issue.get('explanation', 'Code issue')} in {relative_path}",
+        "status": "Fixed",
+        "original_line": issue.get("original_line", ""),
+        "fixed_line": issue.get("suggested_fix", ""),
+        "llm_powered": True
+    }
 
-def rule_based_analysis(file_path: Path, repo_path: Path, content: str) -> Tuple[List[Dict[str, Any]], str]:
-    """Fallback rule-based analysis when LLM is not available"""
-    fixes = []
-    lines = content.splitlines()
-    relative_path = str(file_path.relative_to(repo_path))
-    fixed_lines = lines.copy()
+def analyze_and_fix_files(files: List[Path], repo_path: Path, llm_fixer: LLMCodeFixer,
+                          progress_callback: Callable[[str, Dict[str, Any]], None] = None,
+                          suspicious: Dict[str, List[Dict[str, Any]]] = None) -> Tuple[List[Dict[str, Any]], Dict[Path, str]]:
+    """
+    Tiered analysis of a set of Python files. Every file goes through the rule
+    tier; only files with residual issues are escalated to the LLM, batched so
+    small files share requests.
+
+    `suspicious` maps relative paths to fault localization regions. Those files
+    are escalated as suspected LOGIC bugs, and when only LOGIC/TYPE_ERROR remain
+    the LLM sees an excerpt of the regions instead of the whole file.
+
+    LLM issues are streamed: each one is reported through `progress_callback`
+    and, when it is a clean line edit, applied as soon as it arrives. A second
+    LLM fix request is only made for files with issues that could not be
+    applied as edits.
+    """
+    all_fixes = []
+    contents = {}
+    escalated = {}
+    hints = {}
+    line_maps = {}
+    
+    for file_path in files:
+        try:
+            original_content = file_path.read_text(encoding='utf-8', errors='replace')
+            fixes, fixed_content, reasons, line_map = rule_tier(file_path, repo_path, original_content)
+            all_fixes.extend(fixes)
+            contents[file_path] = fixed_content
+            relative_path = str(file_path.relative_to(repo_path))
+            line_maps[relative_path] = line_map
+            if suspicious and relative_path in suspicious:
+                reasons.setdefault("LOGIC", "executed by failing tests")
+            if reasons and llm_fixer.client:
+                print(f"🤖 Escalating {relative_path} to LLM: {', '.join(reasons.values())}")
+                escalated[relative_path] = file_path
+                hints[relative_path] = set(reasons)
+        except Exception as e:
+            print(f"❌ Error analyzing {file_path}: {e}")
+    
+    if not escalated:
+        return all_fixes, contents
+    
+    # Tier 3: LLM on the rule-fixed content of escalated files only
+    editors = {rel: EditBuffer(contents[fp]) for rel, fp in escalated.items()}
+    
+    def on_issue(rel: str, issue: Dict[str, Any]):
+        editor = editors.get(rel)
+        applied = editor.apply(issue) if editor else False
+        if progress_callback:
+            progress_callback("LLM_ISSUE", {"fix": {**llm_issue_to_fix(issue, rel, line_maps.get(rel)), "applied": applied}})
+    
+    def llm_view(rel: str, file_path: Path) -> str:
+        if suspicious and rel in suspicious and hints[rel] <= LLM_ONLY_BUG_TYPES:
+            return focus_excerpt(rel, contents[file_path], suspicious[rel])
+        return contents[file_path]
+    
+    issues_by_path = llm_fixer.analyze_files_batch([(rel, llm_view(rel, fp)) for rel, fp in escalated.items()], on_issue, hints)
+    found = {rel: issues for rel, issues in issues_by_path.items() if issues}
+    if not found:
+        return all_fixes, contents
     
-    # Simple rule-based fixes
-    for i, line in enumerate(lines):
-        line_stripped = line.strip()
-        
-        # Check for unused imports (simple heuristic)
-        if line_stripped.startswith("import ") and "os" in line and "os." not in content:
-            fixes.append({
-                "file": relative_path,
-                "line_number": i + 1,
-                "bug_type": "LINTING",
-                "description": f"LINTING error in {relative_path} line {i + 1} → Fix: remove the import statement",
-                "commit_message": f"[AI-AGENT] Fix LINTING: Remove unused import in {relative_path}:{i + 1}",
-                "status": "Fixed",
-                "original_line": line,
-                "fixed_line": "# Removed unused import",
-                "llm_powered": False
-            })
-            fixed_lines[i] = "# Removed unused import"
-        
-        # Check for missing colons
-        if re.match(r'^\s*(def|class|if|for|while|try|except|else|elif)\s+.*[^:]$', line_stripped):
-            fixed_line = line + ":"
-            fixes.append({
-                "file": relative_path,
-                "line_number": i + 1,
-                "bug_type": "SYNTAX",
-                "description": f"SYNTAX error in {relative_path} line {i + 1} → Fix: add the colon at the correct position",
-                "commit_message": f"[AI-AGENT] Fix SYNTAX: Add missing colon in {relative_path}:{i + 1}",
-                "status": "Fixed",
-                "original_line": line,
-                "fixed_line": fixed_line,
-                "llm_powered": False
-            })
-            fixed_lines[i] = fixed_line
+    print(f"🔍 LLM found {sum(len(i) for i in found.values())} issues in {len(found)} files")
+    pending = {}
+    for rel, issues in found.items():
+        all_fixes.extend(llm_issue_to_fix(issue, rel, line_maps.get(rel)) for issue in issues)
+        # Re-applying is idempotent and covers issues that arrived unstreamed
+        unapplied = [issue for issue in issues if not editors[rel].apply(issue)]
+        contents[escalated[rel]] = editors[rel].render()
+        if unapplied:
+            pending[rel] = unapplied
     
-    return fixes, '\n'.join(fixed_lines)
+    if pending:
+        fixed_by_path = llm_fixer.fix_files_batch([(rel, contents[escalated[rel]], issues) for rel, issues in pending.items()])
+        retry = {}
+        for rel, fixed_content in fixed_by_path.items():
+            if not fixed_content:
+                continue
+            if not fix_keeps_compiling(contents[escalated[rel]], fixed_content, rel):
+                # The fix broke a file that compiled: retry on the stronger model
+                retry[rel] = pending[rel]
+                continue
+            contents[escalated[rel]] = fixed_content
+        if retry:
+            print(f"🔁 Retrying {len(retry)} LLM fixes that failed verification")
+            fixed_by_path = llm_fixer.fix_files_batch([(rel, contents[escalated[rel]], issues) for rel, issues in retry.items()], attempt=1)
+            for rel, fixed_content in fixed_by_path.items():
+                if fixed_content and not compile_error(fixed_content, rel):
+                    contents[escalated[rel]] = fixed_content
+    
+    return all_fixes, contents
+
+def analyze_and_fix_with_llm(file_path: Path, repo_path: Path, llm_fixer: LLMCodeFixer) -> Tuple[List[Dict[str, Any]], str]:
+    """
+    Tiered analysis of a single Python file (see analyze_and_fix_files)
+    """
+    fixes, contents = analyze_and_fix_files([file_path], repo_path, llm_fixer)
+    return fixes, contents.get(file_path, "")
+
+def rule_based_analysis(file_path: Path, repo_path: Path, content: str) -> Tuple[List[Dict[str, Any]], str]:
+    """Deterministic rule-based analysis, the first tier of the pipeline"""
+    relative_path = str(file_path.relative_to(repo_path))
+    fixed_content, applied = fix_source(content, file_path)
+    return rule_fixes(applied, relative_path), fixed_content
+
+def rule_fixes(applied: List[Dict[str, Any]], relative_path: str) -> List[Dict[str, Any]]:
+    """fix_source's applied entries in our fix format"""
+    return [{**agent_fix(entry, relative_path), "llm_powered": False} for entry in applied]
+
+def baseline_tests(repo_path: str, progress_callback: Callable[[str, Dict[str, Any]], None] = None) -> Optional[Dict[str, Any]]:
+    """
+    One run of the repo's pytest suite through the test stage, with its live
+    events (TEST_FAILURE, TEST_ETA) passed to `progress_callback`. Returns
+    {failures, total, passed}, or None when the test stage is unavailable.
+    """
+    try:
+        from tools.test_tools import run_pytest
+        from tools.test_stream import test_events
+        with test_events(progress_callback):
+            result = run_pytest(repo_path)
+    except Exception as e:
+        print(f"⚠️ Test stage unavailable: {e}")
+        return None
+    return {"failures": result["failures"], "total": result["total"], "passed": result["passed"]}
 
-def llm_healing_agent(repo_url: str, team_name: str, leader_name: str):
+def llm_healing_agent(repo_url: str, team_name: str, leader_name: str,
+                      progress_callback: Callable[[str, Dict[str, Any]], None] = None,
+                      failures: List[Dict[str, Any]] = None, run_tests: bool = False):
     """
     RIFT 2026 LLM-Powered Autonomous CI/CD Healing Agent
-    Uses OpenAI GPT models for intelligent code analysis and fixing
+    Uses OpenAI GPT models for intelligent code analysis and fixing.
+    `progress_callback(event, data)` receives live events such as streamed LLM issues.
+    `failures` are known test failures ({file, test_name, error_message}) of the repo;
+    without them, `run_tests` runs the repo's pytest suite once to find them.
     """
     start_time = time.time()
     
@@ -342,34 +1131,72 @@ def llm_healing_agent(repo_url: str, team_name: str, leader_name: str):
             results["completed_at"] = datetime.utcnow().isoformat()
             return results
         
-        # Step 3: LLM-powered analysis and fixing
-        print("🤖 Running LLM-powered code analysis...")
+        if failures is None and run_tests and any(fault_localization.TEST_FILE.search(str(f.relative_to(repo_path))) for f in python_files):
+            print("🧪 Running the test suite...")
+            results["status"] = "TESTING"
+            if progress_callback:
+                # The dashboard shows the test stage with its TEST_ETA prediction
+                progress_callback("STATUS", {"status": "TESTING", "message": "Running the test suite..."})
+            baseline = baseline_tests(str(repo_path), progress_callback)
+            if baseline is not None:
+                failures = baseline["failures"]
+                results["baseline_tests"] = {"total": baseline["total"], "passed": baseline["passed"], "failed": len(failures)}
+                print(f"🧪 {baseline['passed']}/{baseline['total']} tests passed")
+        
+        # Fault localization: rank the lines executed by known LOGIC/TYPE_ERROR
+        # failures, so bugs the rules cannot see are escalated with only their
+        # regions. Only a cached environment is used, within the run's time budget
+        suspicious = {}
+        failed = fault_localization.failed_tests(triage.cluster_failures(failures)) if failures else []
+        timeout = min(int(os.getenv("SANDBOX_TIMEOUT", 60)), float(os.getenv("RUN_TIME_BUDGET", 600)) - (time.time() - start_time))
+        if fault_localization.enabled() and failed and timeout > 0:
+            print(f"🎯 Localizing {len(failed)} failing tests...")
+            try:
+                localized = fault_localization.localize(str(repo_path), failed=failed, timeout=timeout, build=False)
+                results["fault_localization"] = localized
+                suspicious = regions_by_file(localized["regions"])
+                print(f"🎯 {len(localized['regions'])} suspicious regions in {len(suspicious)} files")
+            except Exception as e:
+                print(f"⚠️ Fault localization failed: {e}")
+        
+        # Step 3: Tiered analysis - rules first, LLM only for residual issues
+        print("🤖 Running tiered code analysis...")
         results["status"] = "FIXING"
         
-        all_fixes = []
+        # Rules are cheap, so analyze more files; LLM usage is capped by the run budget
+        max_files = int(os.getenv("MAX_FILES_ANALYZED", 50))
+        # Files with suspicious regions are analyzed first so the file cap never drops them
+        python_files.sort(key=lambda f: str(f.relative_to(repo_path)) not in suspicious)
+        all_fixes, fixed_contents = analyze_and_fix_files(python_files[:max_files], repo_path, llm_fixer, progress_callback, suspicious)
+        
+        # Verify before anything reaches git: fixes that break compilation or
+        # the import graph are reverted individually
+        if fix_verify.enabled():
+            rel_contents = {str(f.relative_to(repo_path)): c for f, c in fixed_contents.items()}
+            originals = {str(f.relative_to(repo_path)): f.read_text(encoding='utf-8', errors='replace') for f in fixed_contents}
+            verification = fix_verify.verify_fixes(str(repo_path), originals, rel_contents)
+            fixed_contents = {f: verification["contents"][str(f.relative_to(repo_path))] for f in fixed_contents}
+            reverted = fix_verify.mark_reverted(all_fixes, verification["reverted"])
+            results["verification"] = {k: verification[k] for k in ("reverted", "errors", "seconds")}
+            print(f"🧪 Verified fixes in {verification['seconds']}s: {len(verification['reverted'])} hunks reverted ({reverted} fixes)")
         
-        # Limit analysis to prevent timeout (max 10 files for LLM analysis)
-        for py_file in python_files[:10]:
+        fixed_files = {fix["file"] for fix in all_fixes if fix.get("status") == "Fixed"}
+        for py_file, fixed_content in fixed_contents.items():
             try:
-                file_fixes, fixed_content = analyze_and_fix_with_llm(py_file, repo_path, llm_fixer)
-                all_fixes.extend(file_fixes)
-                
                 # Write fixed content to demonstrate the fix
-                if file_fixes and fixed_content != py_file.read_text(encoding='utf-8', errors='replace'):
+                if str(py_file.relative_to(repo_path)) in fixed_files and fixed_content != py_file.read_text(encoding='utf-8', errors='replace'):
                     fixed_file = repo_path / f"fixed_{py_file.name}"
                     fixed_file.write_text(fixed_content)
                     print(f"💾 Saved fixed version: {fixed_file.name}")
-                
-                if len(all_fixes) >= 50:  # Limit total fixes
-                    break
-                    
             except Exception as e:
-                print(f"⚠️ Error analyzing {py_file.name}: {e}")
+                print(f"⚠️ Error saving fixes for {py_file.name}: {e}")
         
         results["fixes"] = all_fixes
-        results["total_fixes"] = len(all_fixes)
+        results["total_fixes"] = sum(1 for fix in all_fixes if fix.get("status") == "Fixed")
+        results["llm_budget"] = llm_fixer.budget.summary()
+        results["llm_stats"] = llm_fixer.stats.summary()
         
-        print(f"🔍 Found {len(all_fixes)} issues using {'LLM + rule-based' if results['llm_powered'] else 'rule-based'} analysis")
+        print(f"🔍 Found {len(all_fixes)} issues using {'LLM + rule-based' if results['llm_powered'] else 'rule-based'} analysis ({llm_fixer.budget.calls} LLM calls)")
         
         # Step 4: Simulate CI/CD iterations
         print("🔄 Simulating CI/CD iterations...")
@@ -385,7 +1212,7 @@ def llm_healing_agent(repo_url: str, team_name: str, leader_name: str):
                 "iteration": iteration,
                 "status": status,
                 "timestamp": datetime.utcnow().isoformat(),
-                "fixes_applied": len(all_fixes)
+                "fixes_applied": results["total_fixes"]
             }
             results["cicd_runs"].append(cicd_run)
             
@@ -397,7 +1224,7 @@ def llm_healing_agent(repo_url: str, team_name: str, leader_name: str):
         
         # Step 5: Calculate final score
         execution_time = time.time() - start_time
-        commit_count = len(all_fixes)
+        commit_count = results["total_fixes"]
         
         base_score = 100
         speed_bonus = 10 if execution_time < 300 else 0
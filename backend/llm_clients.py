@@ -0,0 +1,95 @@
+"""
+LLM Clients — Process-wide registry of pooled LLM clients
+The LLM agent and the CrewAI crew share one keep-alive HTTP connection pool
+(HTTP/2 when the h2 package is installed) instead of each run opening its own.
+"""
+
+import os
+import threading
+import importlib.util
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+try:
+    from openai import OpenAI
+    HAS_OPENAI = True
+except ImportError:
+    HAS_OPENAI = False
+
+# httpx negotiates HTTP/2 itself when the h2 package is installed
+HAS_H2 = importlib.util.find_spec("h2") is not None
+
+_lock = threading.Lock()
+_http_client: Optional[httpx.Client] = None
+_openai_clients: Dict[Tuple[str, str], Any] = {}
+_chat_models: Dict[Tuple[str, float, str], Any] = {}
+
+def pool_settings() -> Dict[str, Any]:
+    return {
+        "max_connections": int(os.getenv("LLM_POOL_MAX_CONNECTIONS", 100)),
+        "max_keepalive_connections": int(os.getenv("LLM_POOL_MAX_KEEPALIVE", 20)),
+        "keepalive_expiry": float(os.getenv("LLM_POOL_KEEPALIVE_EXPIRY", 60)),
+        "timeout": float(os.getenv("LLM_TIMEOUT", 60)),
+        "http2": HAS_H2 and os.getenv("LLM_HTTP2", "true").lower() == "true",
+    }
+
+def shared_http_client() -> httpx.Client:
+    """The pooled httpx client used by every LLM client in this process"""
+    global _http_client
+    with _lock:
+        if _http_client is None or _http_client.is_closed:
+            settings = pool_settings()
+            _http_client = httpx.Client(
+                http2=settings["http2"],
+                timeout=httpx.Timeout(settings["timeout"], connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=settings["max_connections"],
+                    max_keepalive_connections=settings["max_keepalive_connections"],
+                    keepalive_expiry=settings["keepalive_expiry"],
+                ),
+            )
+        return _http_client
+
+def get_openai_client(api_key: str = None, base_url: str = None):
+    """
+    Shared OpenAI client for the given key and base URL (defaults come from
+    OPENAI_API_KEY / OPENAI_BASE_URL). Returns None without a key or the SDK.
+    """
+    api_key = api_key or os.getenv("OPENAI_API_KEY", "")
+    base_url = base_url or os.getenv("OPENAI_BASE_URL", "")
+    if not HAS_OPENAI or not api_key:
+        return None
+    http_client = shared_http_client()
+    key = (api_key, base_url)
+    with _lock:
+        client = _openai_clients.get(key)
+        if client is None:
+            # Retries are counted and performed by LLMCodeFixer, not the SDK
+            client = OpenAI(api_key=api_key, base_url=base_url or None, max_retries=0, http_client=http_client)
+            _openai_clients[key] = client
+        return client
+
+def get_chat_model(model: str, temperature: float = 0, api_key: str = None):
+    """Shared LangChain ChatOpenAI for the crew, on the same connection pool"""
+    from langchain_openai import ChatOpenAI
+
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    http_client = shared_http_client()
+    key = (model, temperature, api_key or "")
+    with _lock:
+        chat = _chat_models.get(key)
+        if chat is None:
+            chat = ChatOpenAI(model=model, temperature=temperature, api_key=api_key, http_client=http_client)
+            _chat_models[key] = chat
+        return chat
+
+def close_clients():
+    """Close the shared pool (called on application shutdown)"""
+    global _http_client
+    with _lock:
+        if _http_client is not None:
+            _http_client.close()
+        _http_client = None
+        _openai_clients.clear()
+        _chat_models.clear()
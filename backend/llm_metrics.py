@@ -0,0 +1,163 @@
+"""
+LLM Metrics — Token and latency accounting for every LLM call
+Per-run totals go into the run result; per-model rolling histograms are
+process-wide and exposed via the API.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+HISTOGRAM_WINDOW = int(os.getenv("LLM_METRICS_WINDOW", 500))
+
+# Upper bounds (seconds) of the latency buckets reported by the API
+LATENCY_BUCKETS = [0.25, 0.5, 1, 2, 4, 8, 16, 32, 64]
+
+def new_call_record(model: str, purpose: str = "") -> Dict[str, Any]:
+    """Start a call record; fill in the remaining fields as the call progresses"""
+    return {
+        "model": model,
+        "purpose": purpose,
+        "started_at": time.time(),
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "ttfb_seconds": None,
+        "latency_seconds": 0.0,
+        "cache_hit": False,
+        "retries": 0,
+        "hedged": False,
+        "hedge_won": False,
+        "error": None,
+    }
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of `values` (None when empty)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return round(ordered[rank], 3)
+
+class RunLLMStats:
+    """Aggregates call records for a single agent run"""
+
+    def __init__(self):
+        self.calls: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, record: Dict[str, Any]):
+        with self._lock:
+            self.calls.append(record)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = list(self.calls)
+        live = [c for c in calls if not c["cache_hit"]]
+        latencies = [c["latency_seconds"] for c in live if not c["error"]]
+        ttfbs = [c["ttfb_seconds"] for c in live if c["ttfb_seconds"] is not None]
+        by_model: Dict[str, int] = {}
+        for c in calls:
+            by_model[c["model"]] = by_model.get(c["model"], 0) + 1
+        return {
+            "calls": len(calls),
+            "api_calls": len(live),
+            "cache_hits": len(calls) - len(live),
+            "retries": sum(c["retries"] for c in calls),
+            "hedged": sum(1 for c in calls if c["hedged"]),
+            "hedge_wins": sum(1 for c in calls if c["hedge_won"]),
+            "errors": sum(1 for c in calls if c["error"]),
+            "prompt_tokens": sum(c["prompt_tokens"] for c in live),
+            "completion_tokens": sum(c["completion_tokens"] for c in live),
+            "total_latency_seconds": round(sum(c["latency_seconds"] for c in live), 3),
+            "p50_latency_seconds": percentile(latencies, 50),
+            "p90_latency_seconds": percentile(latencies, 90),
+            "p50_ttfb_seconds": percentile(ttfbs, 50),
+            "calls_by_model": by_model,
+        }
+
+class ModelHistogram:
+    """Rolling window of recent calls to one model"""
+
+    def __init__(self, model: str, window: int = HISTOGRAM_WINDOW):
+        self.model = model
+        self.samples = deque(maxlen=window)
+        self.total_calls = 0
+        self.total_prompt_tokens = 0
+        self.total_completion_tokens = 0
+        self.total_cache_hits = 0
+
+    def add(self, record: Dict[str, Any]):
+        self.total_calls += 1
+        if record["cache_hit"]:
+            self.total_cache_hits += 1
+            return
+        self.total_prompt_tokens += record["prompt_tokens"]
+        self.total_completion_tokens += record["completion_tokens"]
+        self.samples.append((
+            record["latency_seconds"],
+            record["ttfb_seconds"],
+            record["retries"],
+            bool(record["error"]),
+        ))
+
+    def latency_percentile(self, pct: float) -> Optional[float]:
+        return percentile([s[0] for s in self.samples if not s[3]], pct)
+
+    def ttfb_percentile(self, pct: float) -> Optional[float]:
+        return percentile([s[1] for s in self.samples if s[1] is not None], pct)
+
+    def error_rate(self) -> float:
+        if not self.samples:
+            return 0.0
+        return sum(1 for s in self.samples if s[3]) / len(self.samples)
+
+    def snapshot(self) -> Dict[str, Any]:
+        latencies = [s[0] for s in self.samples if not s[3]]
+        buckets = {}
+        for bound in LATENCY_BUCKETS:
+            buckets[f"le_{bound}"] = sum(1 for v in latencies if v <= bound)
+        buckets["le_inf"] = len(latencies)
+        return {
+            "model": self.model,
+            "window": len(self.samples),
+            "total_calls": self.total_calls,
+            "total_cache_hits": self.total_cache_hits,
+            "total_prompt_tokens": self.total_prompt_tokens,
+            "total_completion_tokens": self.total_completion_tokens,
+            "retries_in_window": sum(s[2] for s in self.samples),
+            "error_rate": round(self.error_rate(), 3),
+            "latency_seconds": {
+                "p50": self.latency_percentile(50),
+                "p90": self.latency_percentile(90),
+                "p99": self.latency_percentile(99),
+            },
+            "ttfb_seconds": {
+                "p50": self.ttfb_percentile(50),
+                "p90": self.ttfb_percentile(90),
+                "p99": self.ttfb_percentile(99),
+            },
+            "latency_buckets": buckets,
+        }
+
+_histograms: Dict[str, ModelHistogram] = {}
+_histograms_lock = threading.Lock()
+
+def record_call(record: Dict[str, Any], run_stats: RunLLMStats = None):
+    """Add a finished call record to the per-model histogram and the run's stats"""
+    with _histograms_lock:
+        hist = _histograms.get(record["model"])
+        if hist is None:
+            hist = _histograms[record["model"]] = ModelHistogram(record["model"])
+        hist.add(record)
+    if run_stats is not None:
+        run_stats.add(record)
+
+def get_histogram(model: str) -> Optional[ModelHistogram]:
+    return _histograms.get(model)
+
+def model_metrics() -> Dict[str, Any]:
+    """Snapshot of every model's rolling histogram, for the API"""
+    with _histograms_lock:
+        return {model: hist.snapshot() for model, hist in _histograms.items()}
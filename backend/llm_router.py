@@ -0,0 +1,93 @@
+"""
+LLM Router — Latency-aware model selection
+Picks a model per request from the configured models based on bug type, file
+size, retry attempt and the observed latency/error rates in llm_metrics, and
+fails over when a model degrades.
+"""
+
+import os
+import threading
+from typing import Any, Dict, Iterable, List
+
+from config import LLM_MODEL
+from llm_metrics import get_histogram
+
+# Bug types simple enough for the small, fast model
+FAST_BUG_TYPES = {"LINTING", "SYNTAX", "INDENTATION", "IMPORT"}
+
+# Bug types that need the larger model's reasoning
+STRONG_BUG_TYPES = {"LOGIC", "TYPE_ERROR"}
+
+class ModelRouter:
+    """Routes requests between the fast, default and strong models"""
+
+    def __init__(self):
+        self.default_model = LLM_MODEL
+        self.fast_model = os.getenv("LLM_FAST_MODEL", LLM_MODEL)
+        self.strong_model = os.getenv("LLM_STRONG_MODEL", "gpt-4o")
+        fallbacks = [m.strip() for m in os.getenv("LLM_FALLBACK_MODELS", "").split(",") if m.strip()]
+        self.models: List[str] = []
+        for model in [self.fast_model, self.default_model, self.strong_model] + fallbacks:
+            if model not in self.models:
+                self.models.append(model)
+        self.large_file_tokens = int(os.getenv("LLM_LARGE_FILE_TOKENS", 6000))
+        self.max_error_rate = float(os.getenv("LLM_MAX_ERROR_RATE", 0.5))
+        self.max_p90_latency = float(os.getenv("LLM_MAX_P90_LATENCY", 60))
+        self.min_samples = int(os.getenv("LLM_ROUTER_MIN_SAMPLES", 5))
+
+    def is_degraded(self, model: str) -> bool:
+        """A model is degraded when its recent error rate or p90 latency exceeds the limits"""
+        hist = get_histogram(model)
+        if hist is None or len(hist.samples) < self.min_samples:
+            return False
+        if hist.error_rate() > self.max_error_rate:
+            return True
+        p90 = hist.latency_percentile(90)
+        return p90 is not None and p90 > self.max_p90_latency
+
+    def preferred(self, bug_types: Iterable[str] = (), file_tokens: int = 0, attempt: int = 0) -> str:
+        """The model this request would use if every model were healthy"""
+        bug_types = set(bug_types)
+        if attempt > 0 or bug_types & STRONG_BUG_TYPES or file_tokens > self.large_file_tokens:
+            return self.strong_model
+        if bug_types and bug_types <= FAST_BUG_TYPES:
+            return self.fast_model
+        return self.default_model
+
+    def pick(self, bug_types: Iterable[str] = (), file_tokens: int = 0, attempt: int = 0,
+             exclude: Iterable[str] = ()) -> str:
+        """
+        Choose a model for a request. The preferred model is used unless it is
+        degraded or excluded (e.g. it just failed), in which case the next
+        healthy configured model takes over.
+        """
+        preferred = self.preferred(bug_types, file_tokens, attempt)
+        exclude = set(exclude)
+        candidates = [m for m in [preferred] + self.models if m not in exclude]
+        candidates = list(dict.fromkeys(candidates))
+        if not candidates:
+            return preferred
+        for model in candidates:
+            if not self.is_degraded(model):
+                return model
+        # Everything is degraded: take the least bad
+        return min(candidates, key=lambda m: get_histogram(m).error_rate() if get_histogram(m) else 0.0)
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "fast_model": self.fast_model,
+            "default_model": self.default_model,
+            "strong_model": self.strong_model,
+            "models": {model: {"degraded": self.is_degraded(model)} for model in self.models},
+        }
+
+_router = None
+_router_lock = threading.Lock()
+
+def get_router() -> ModelRouter:
+    """Process-wide router (settings are read once from the environment)"""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = ModelRouter()
+        return _router
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+RIFT 2026 - Offline OpenAI-compatible LLM stand-in
+Speaks the chat-completions protocol with deterministic, rule-derived (or
+canned) replies so the LLM stage can be exercised and benchmarked without an
+API key or network access.
+
+    python llm_standin.py serve --port 8089 --latency lognormal:-1.5,0.5 --rate-limit 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=standin python llm_agent.py
+
+    python llm_standin.py bench --files 40 --latency uniform:0.05,0.3
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from llm_agent import rule_based_analysis, find_llm_only_lines, estimate_tokens
+from tools.fix_engine import REMOVED_LINE
+
+CODE_SECTION = re.compile(
+    r'(?:File: (?P<path>[^\n]+)\n)?(?:(?!File: ).)*?```python\n(?P<code>.*?)\n```',
+    re.DOTALL,
+)
+
+class LatencyModel:
+    """
+    Seeded latency distribution, parsed from a spec string:
+    fixed:S, uniform:LO,HI, normal:MEAN,STD or lognormal:MU,SIGMA (seconds)
+    """
+
+    def __init__(self, spec: str = "fixed:0"):
+        kind, _, params = spec.partition(":")
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",") if p]
+        if kind not in {"fixed", "uniform", "normal", "lognormal"}:
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.params[0] if self.params else 0.0
+        if self.kind == "uniform":
+            return rng.uniform(self.params[0], self.params[1])
+        if self.kind == "normal":
+            return max(0.0, rng.gauss(self.params[0], self.params[1]))
+        return math.exp(rng.gauss(self.params[0], self.params[1]))
+
+class StandinConfig:
+    def __init__(self, latency: str = "fixed:0", chunk_delay: float = 0.0, rate_limit: float = 0.0,
+                 seed: int = 0, canned: Optional[List[Dict[str, str]]] = None, chunk_size: int = 24):
+        self.latency = LatencyModel(latency)
+        self.chunk_delay = chunk_delay
+        self.rate_limit = rate_limit
+        self.seed = seed
+        self.canned = canned or []
+        self.chunk_size = chunk_size
+        self.attempts: Dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "rate_limited": 0, "streamed": 0}
+
+    def rng_for(self, body: bytes) -> random.Random:
+        """Per-request RNG seeded by the body and how often it has been seen, so retries differ"""
+        digest = hashlib.sha256(body).hexdigest()
+        with self.lock:
+            attempt = self.attempts.get(digest, 0)
+            self.attempts[digest] = attempt + 1
+        return random.Random(f"{self.seed}:{digest}:{attempt}")
+
+def extract_sections(prompt: str) -> List[Tuple[str, str]]:
+    """(path, code) pairs for every fenced python block in a prompt"""
+    sections = []
+    for m in CODE_SECTION.finditer(prompt):
+        path = (m.group("path") or "file.py").strip()
+        sections.append((path, m.group("code")))
+    return sections
+
+def rule_issues(path: str, code: str) -> List[Dict[str, Any]]:
+    """Issues the stand-in 'finds': rule-based fixes plus the LOGIC/TYPE_ERROR heuristics"""
+    fixes, _ = rule_based_analysis(Path(path), Path("."), code)
+    lines = code.splitlines()
+    issues = [{
+        "line_number": f["line_number"],
+        "bug_type": f["bug_type"],
+        "description": f["description"],
+        "original_line": f["original_line"],
+        "suggested_fix": "" if f["fixed_line"] == REMOVED_LINE else f["fixed_line"],
+        "explanation": f["commit_message"],
+    } for f in fixes]
+    for line_number, bug_type in find_llm_only_lines(code):
+        original = lines[line_number - 1]
+        issues.append({
+            "line_number": line_number,
+            "bug_type": bug_type,
+            "description": f"{bug_type} error in {path} line {line_number}",
+            "original_line": original,
+            "suggested_fix": fix_line(original, bug_type),
+            "explanation": "Comparison uses '='" if bug_type == "LOGIC" else "String concatenated with a non-string",
+        })
+    return sorted(issues, key=lambda i: i["line_number"])
+
+def fix_line(line: str, bug_type: str) -> str:
+    if bug_type == "LOGIC":
+        return re.sub(r'^(\s*(?:if|elif|while)\s+[\w.\[\]]+)\s*=\s*(?!=)', r'\1 == ', line)
+    return re.sub(r'(\+\s*)([A-Za-z_]\w*)\b(?!\s*\()', r'\1str(\2)', line)
+
+def rule_fixed_code(path: str, code: str) -> str:
+    _, fixed = rule_based_analysis(Path(path), Path("."), code)
+    lines = fixed.splitlines()
+    for line_number, bug_type in find_llm_only_lines(fixed):
+        lines[line_number - 1] = fix_line(lines[line_number - 1], bug_type)
+    return "\n".join(lines)
+
+def build_reply(messages: List[Dict[str, str]], config: StandinConfig) -> str:
+    """Deterministic reply for a chat request: canned match first, otherwise rule-derived"""
+    prompt = messages[-1].get("content", "") if messages else ""
+    system = " ".join(m.get("content", "") for m in messages if m.get("role") == "system")
+    for entry in config.canned:
+        if entry.get("match", "") in prompt:
+            return entry["response"]
+
+    sections = extract_sections(prompt)
+    batched = '"files"' in prompt
+    if "fixer" in system:
+        if batched:
+            return json.dumps({"files": {path: rule_fixed_code(path, code) for path, code in sections}})
+        path, code = sections[-1] if sections else ("file.py", "")
+        return f"```python\n{rule_fixed_code(path, code)}\n```"
+    if batched:
+        return json.dumps({"files": {path: {"issues": rule_issues(path, code)} for path, code in sections}})
+    path, code = sections[0] if sections else ("file.py", "")
+    return json.dumps({"issues": rule_issues(path, code)})
+
+class StandinHandler(BaseHTTPRequestHandler):
+    server_version = "RIFTStandin/1.0"
+    config: StandinConfig = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Dict[str, str] = None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "standin", "object": "model", "owned_by": "rift"}]})
+        elif self.path.rstrip("/").endswith("/stats"):
+            self._send_json(200, self.config.stats)
+        else:
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+            return
+        raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            request = json.loads(raw)
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": {"message": "Invalid JSON body", "type": "invalid_request_error"}})
+            return
+
+        config = self.config
+        rng = config.rng_for(raw)
+        with config.lock:
+            config.stats["requests"] += 1
+        if config.rate_limit and rng.random() < config.rate_limit:
+            with config.lock:
+                config.stats["rate_limited"] += 1
+            self._send_json(429, {"error": {"message": "Rate limit reached (stand-in)", "type": "requests", "code": "rate_limit_exceeded"}},
+                            headers={"Retry-After": "0"})
+            return
+
+        time.sleep(config.latency.sample(rng))
+        reply = build_reply(request.get("messages", []), config)
+        model = request.get("model", "standin")
+        completion_id = "chatcmpl-standin-" + hashlib.sha256(raw).hexdigest()[:12]
+        prompt_tokens = estimate_tokens(json.dumps(request.get("messages", [])))
+        completion_tokens = estimate_tokens(reply)
+
+        if request.get("stream"):
+            with config.lock:
+                config.stats["streamed"] += 1
+            self._stream(reply, model, completion_id)
+            return
+
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        })
+
+    def _stream(self, reply: str, model: str, completion_id: str):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        def chunk(delta: Dict[str, str], finish: Optional[str] = None):
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+            }
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode())
+            self.wfile.flush()
+
+        try:
+            chunk({"role": "assistant", "content": ""})
+            size = self.config.chunk_size
+            for i in range(0, len(reply), size):
+                chunk({"content": reply[i:i + size]})
+                if self.config.chunk_delay:
+                    time.sleep(self.config.chunk_delay)
+            chunk({}, "stop")
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Client cancelled the stream (e.g. a hedged request lost the race)
+            pass
+
+def start_standin(host: str = "127.0.0.1", port: int = 0, **options) -> Tuple[ThreadingHTTPServer, str]:
+    """Start the stand-in on a background thread; returns the server and its /v1 base URL"""
+    config = StandinConfig(**options)
+    handler = type("ConfiguredStandinHandler", (StandinHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+def run_bench(args) -> Dict[str, Any]:
+    """Run the tiered LLM stage over synthetic files against the stand-in and report throughput"""
+    import os
+    server, base_url = start_standin(latency=args.latency, chunk_delay=args.chunk_delay,
+                                     rate_limit=args.rate_limit, seed=args.seed)
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["OPENAI_API_KEY"] = "standin"
+    from llm_agent import LLMCodeFixer, LLMBudget
+
+    files = []
+    for i in range(args.files):
+        code = (
+            f"import os\n\n"
+            f"def handler_{i}(value)\n"
+            f"    if value = {i}:\n"
+            f"        return \"value \" + value\n"
+            f"    return None\n"
+        )
+        files.append((f"pkg/module_{i}.py", code))
+
+    fixer = LLMCodeFixer(budget=LLMBudget(max_calls=10 ** 6, max_tokens=10 ** 9, max_seconds=10 ** 6))
+    started = time.time()
+    issues = fixer.analyze_files_batch(files)
+    fixed = fixer.fix_files_batch([(path, code, issues.get(path, [])) for path, code in files])
+    elapsed = time.time() - started
+    server.shutdown()
+
+    return {
+        "files": len(files),
+        "files_with_issues": sum(1 for v in issues.values() if v),
+        "files_fixed": len(fixed),
+        "elapsed_seconds": round(elapsed, 3),
+        "files_per_second": round(len(files) / elapsed, 2) if elapsed else None,
+        "server": server.RequestHandlerClass.config.stats,
+        "llm_stats": fixer.stats.summary(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline OpenAI-compatible stand-in for the RIFT LLM stage")
+    sub = parser.add_subparsers(dest="command")
+    for name in ("serve", "bench"):
+        p = sub.add_parser(name)
+        p.add_argument("--latency", default="fixed:0", help="fixed:S | uniform:LO,HI | normal:MEAN,STD | lognormal:MU,SIGMA")
+        p.add_argument("--chunk-delay", type=float, default=0.0, help="Seconds between streamed chunks")
+        p.add_argument("--rate-limit", type=float, default=0.0, help="Probability of answering 429")
+        p.add_argument("--seed", type=int, default=0)
+    serve = sub.choices["serve"]
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8089)
+    serve.add_argument("--responses", help="JSON file of canned replies: [{\"match\": str, \"response\": str}]")
+    sub.choices["bench"].add_argument("--files", type=int, default=40)
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        print(json.dumps(run_bench(args), indent=2))
+        return
+
+    if args.command != "serve":
+        parser.print_help()
+        return
+    canned = json.loads(Path(args.responses).read_text()) if args.responses else None
+    server, base_url = start_standin(args.host, args.port, latency=args.latency, chunk_delay=args.chunk_delay,
+                                     rate_limit=args.rate_limit, seed=args.seed, canned=canned)
+    print(f"🧪 LLM stand-in listening on {base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
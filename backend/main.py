@@ -14,6 +14,8 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from api.routes import router as agent_router
+from llm_clients import close_clients
+from tools.test_worker import close_workers
 
 app = FastAPI(
     title="RIFT 2026 — CI/CD Healing Agent API",
@@ -70,6 +72,14 @@ async def websocket_endpoint(websocket: WebSocket, run_id: str):
 
 app.state.ws_manager = manager
 
+@app.on_event("shutdown")
+def shutdown_llm_clients():
+    close_clients()
+
+@app.on_event("shutdown")
+def shutdown_test_workers():
+    close_workers()
+
 @app.get("/health")
 def health_check():
     return {
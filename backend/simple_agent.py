@@ -16,6 +16,8 @@ import ast
 import sys
 from typing import List, Dict, Any
 
+from tools.fix_engine import fix_source, agent_fix
+
 def analyze_python_file(file_path: Path, repo_path: Path) -> List[Dict[str, Any]]:
     """
     Analyze a Python file for bugs matching RIFT 2026 test cases exactly
@@ -25,157 +27,9 @@ def analyze_python_file(file_path: Path, repo_path: Path) -> List[Dict[str, Any]
     
     try:
         content = file_path.read_text(encoding='utf-8', errors='replace')
-        lines = content.splitlines()
         relative_path = str(file_path.relative_to(repo_path))
-        
-        # 1. LINTING: Check for unused imports (exact match with test cases)
-        import_lines = {}
-        import_usage = {}
-        
-        for i, line in enumerate(lines, 1):
-            line_stripped = line.strip()
-            
-            # Track import statements
-            if line_stripped.startswith("import "):
-                # Handle "import os", "import sys", etc.
-                import_match = re.match(r'import\s+([a-zA-Z_][a-zA-Z0-9_]*)', line_stripped)
-                if import_match:
-                    module_name = import_match.group(1)
-                    import_lines[module_name] = i
-                    import_usage[module_name] = False
-            
-            elif line_stripped.startswith("from "):
-                # Handle "from os import path", etc.
-                from_match = re.match(r'from\s+([a-zA-Z_][a-zA-Z0-9_]*)\s+import', line_stripped)
-                if from_match:
-                    module_name = from_match.group(1)
-                    import_lines[module_name] = i
-                    import_usage[module_name] = False
-        
-        # Check if imports are used in the code
-        for module_name in import_lines:
-            # Look for usage patterns: module.something, module(, module[, etc.
-            usage_patterns = [
-                f"{module_name}.",
-                f"{module_name}(",
-                f"{module_name}[",
-                f" {module_name} ",
-                f"({module_name})",
-                f"[{module_name}]",
-                f",{module_name},",
-                f",{module_name})",
-                f"({module_name},",
-            ]
-            
-            for pattern in usage_patterns:
-                if pattern in content:
-                    import_usage[module_name] = True
-                    break
-        
-        # Report unused imports in exact test case format
-        for module_name, is_used in import_usage.items():
-            if not is_used:
-                line_num = import_lines[module_name]
-                fixes.append({
-                    "file": relative_path,
-                    "line_number": line_num,
-                    "bug_type": "LINTING",
-                    "description": f"LINTING error in {relative_path} line {line_num} → Fix: remove the import statement",
-                    "commit_message": f"[AI-AGENT] Fix LINTING: Remove unused import '{module_name}' from {relative_path}:{line_num}",
-                    "status": "Fixed"
-                })
-        
-        # 2. SYNTAX: Check for missing colons (exact match with test cases)
-        for i, line in enumerate(lines, 1):
-            line_stripped = line.strip()
-            
-            # Check for statements that should end with colon
-            colon_required_patterns = [
-                r'^def\s+\w+.*[^:]$',
-                r'^class\s+\w+.*[^:]$',
-                r'^if\s+.*[^:]$',
-                r'^elif\s+.*[^:]$',
-                r'^else\s*[^:]$',
-                r'^for\s+.*[^:]$',
-                r'^while\s+.*[^:]$',
-                r'^try\s*[^:]$',
-                r'^except.*[^:]$',
-                r'^finally\s*[^:]$',
-                r'^with\s+.*[^:]$',
-            ]
-            
-            for pattern in colon_required_patterns:
-                if re.match(pattern, line_stripped) and not line_stripped.endswith('\\'):
-                    fixes.append({
-                        "file": relative_path,
-                        "line_number": i,
-                        "bug_type": "SYNTAX",
-                        "description": f"SYNTAX error in {relative_path} line {i} → Fix: add the colon at the correct position",
-                        "commit_message": f"[AI-AGENT] Fix SYNTAX: Add missing colon in {relative_path}:{i}",
-                        "status": "Fixed"
-                    })
-        
-        # 3. INDENTATION: Check for indentation issues
-        for i, line in enumerate(lines, 1):
-            if line.strip() and not line.startswith(' ') and not line.startswith('\t'):
-                continue
-            
-            # Check for mixed tabs and spaces
-            if '\t' in line and ' ' in line[:len(line) - len(line.lstrip())]:
-                fixes.append({
-                    "file": relative_path,
-                    "line_number": i,
-                    "bug_type": "INDENTATION",
-                    "description": f"INDENTATION error in {relative_path} line {i} → Fix: use consistent indentation",
-                    "commit_message": f"[AI-AGENT] Fix INDENTATION: Consistent indentation in {relative_path}:{i}",
-                    "status": "Fixed"
-                })
-        
-        # 4. TYPE_ERROR: Check for common type errors
-        for i, line in enumerate(lines, 1):
-            line_stripped = line.strip()
-            
-            # Check for string + int concatenation
-            if re.search(r'["\'][^"\']*["\']\s*\+\s*\d+', line_stripped) or \
-               re.search(r'\d+\s*\+\s*["\'][^"\']*["\']', line_stripped):
-                fixes.append({
-                    "file": relative_path,
-                    "line_number": i,
-                    "bug_type": "TYPE_ERROR",
-                    "description": f"TYPE_ERROR in {relative_path} line {i} → Fix: convert types before concatenation",
-                    "commit_message": f"[AI-AGENT] Fix TYPE_ERROR: Type conversion in {relative_path}:{i}",
-                    "status": "Fixed"
-                })
-        
-        # 5. IMPORT: Check for import errors
-        for i, line in enumerate(lines, 1):
-            line_stripped = line.strip()
-            
-            # Check for relative imports without proper package structure
-            if line_stripped.startswith("from .") or line_stripped.startswith("from .."):
-                fixes.append({
-                    "file": relative_path,
-                    "line_number": i,
-                    "bug_type": "IMPORT",
-                    "description": f"IMPORT error in {relative_path} line {i} → Fix: use absolute imports",
-                    "commit_message": f"[AI-AGENT] Fix IMPORT: Convert to absolute import in {relative_path}:{i}",
-                    "status": "Fixed"
-                })
-        
-        # 6. LOGIC: Check for common logic errors
-        for i, line in enumerate(lines, 1):
-            line_stripped = line.strip()
-            
-            # Check for assignment in if conditions (common mistake)
-            if re.match(r'if\s+\w+\s*=\s*', line_stripped):
-                fixes.append({
-                    "file": relative_path,
-                    "line_number": i,
-                    "bug_type": "LOGIC",
-                    "description": f"LOGIC error in {relative_path} line {i} → Fix: use == for comparison",
-                    "commit_message": f"[AI-AGENT] Fix LOGIC: Assignment vs comparison in {relative_path}:{i}",
-                    "status": "Fixed"
-                })
+        _, applied = fix_source(content, file_path)
+        fixes = [agent_fix(entry, relative_path) for entry in applied]
     
     except Exception as e:
         print(f"Error analyzing {file_path}: {e}")
@@ -0,0 +1,24 @@
+"""
+Test the deterministic fixers on files with more than one kind of error
+"""
+from tools.fix_engine import fix_source
+from tools.fixers import detect_issues
+
+MIXED = "def f(x)\n    return x\n\ndef total(items):\n\tcount = len(items)\n        return count\n"
+
+def test_reindent_with_other_syntax_error():
+    """A tab/space mix is only re-indented with a width that makes the blocks line up"""
+    issues = [i for i in detect_issues(MIXED) if i["bug_type"] == "INDENTATION"]
+    assert [i["line_number"] for i in issues] == [5]
+    assert "tab width 8" in issues[0]["description"]
+    fixed, _ = fix_source(MIXED)
+    compile(fixed, "<fixed>", "exec")
+
+def test_no_reindent_when_no_width_fits():
+    source = "def f(x)\n\tif x:\n  return x\n"
+    assert not [i for i in detect_issues(source) if i["bug_type"] == "INDENTATION"]
+
+if __name__ == "__main__":
+    test_reindent_with_other_syntax_error()
+    test_no_reindent_when_no_width_fits()
+    print("✅ fixer tests passed")
@@ -0,0 +1,37 @@
+"""
+Test that a healing run finds failing tests itself and localizes the LOGIC bug they hit
+"""
+import subprocess
+import pytest
+
+pytest.importorskip("crewai")
+
+from llm_agent import llm_healing_agent
+
+def make_repo(path):
+    (path / "calc.py").write_text("def add(a, b):\n    return a - b\n\ndef mul(a, b):\n    return a * b\n")
+    (path / "test_calc.py").write_text(
+        "from calc import add, mul\n\n"
+        "def test_add():\n    assert add(2, 2) == 4\n\n"
+        "def test_mul():\n    assert mul(2, 3) == 6\n"
+    )
+    for cmd in (["init", "-q"], ["add", "."], ["-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "init"]):
+        subprocess.run(["git", "-C", str(path)] + cmd, check=True)
+    return f"file://{path}"
+
+def test_run_tests_localizes_logic_failure(tmp_path, monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.setenv("PYTEST_WARM_WORKER", "false")
+    monkeypatch.setenv("TEST_HISTORY_DB", str(tmp_path / "history.db"))
+    monkeypatch.setenv("COLLECTION_CACHE_DIR", str(tmp_path / "collection"))
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    events = []
+    result = llm_healing_agent(make_repo(repo), "Team", "Leader", lambda event, data: events.append(event), run_tests=True)
+    assert result["baseline_tests"] == {"total": 2, "passed": 1, "failed": 1}
+    regions = result["fault_localization"]["regions"]
+    assert regions and regions[0]["file"] == "calc.py" and regions[0]["start"] == 2
+    assert "TEST_ETA" in events
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-q"])
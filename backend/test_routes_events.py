@@ -0,0 +1,34 @@
+"""
+Test that live agent events reach the run status the dashboard polls
+"""
+import asyncio
+import pytest
+
+pytest.importorskip("fastapi")
+
+from api import routes
+
+class FakeWS:
+    def __init__(self):
+        self.sent = []
+
+    async def send_update(self, run_id, data):
+        self.sent.append(data)
+
+def test_test_eta_reaches_run_status(monkeypatch, tmp_path):
+    def fake_agent(repo_url, team_name, leader_name, progress_callback, run_tests):
+        assert run_tests
+        progress_callback("STATUS", {"status": "TESTING"})
+        progress_callback("TEST_ETA", {"test_eta": {"tests": 3, "processes": 1, "predicted_seconds": 1.5}})
+        return {"status": "COMPLETED", "fixes": []}
+
+    monkeypatch.setattr(routes, "llm_healing_agent", fake_agent)
+    monkeypatch.chdir(tmp_path)
+    routes.runs["r1"] = {"run_id": "r1"}
+    ws = FakeWS()
+    asyncio.run(routes.execute_agent_run("r1", "https://github.com/a/b", "T", "L", "T_L_AI_Fix", ws))
+    assert routes.runs["r1"]["test_eta"]["tests"] == 3
+    assert any(m["event"] == "TEST_ETA" for m in ws.sent)
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-q"])
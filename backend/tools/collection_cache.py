@@ -0,0 +1,106 @@
+"""
+Collection Cache — Collected pytest node IDs per test-file hash
+Each test file's node IDs (and their markers) are stored under a key hashing
+the file, every repo module it transitively imports (parametrization may be
+driven by source code) and the test configuration. Later collections, in this
+run or a fresh clone of the same repo, only ask pytest about files whose key
+changed; a conftest or config change changes every key.
+"""
+
+import os, re, json, hashlib, tempfile
+from pathlib import Path
+
+from tools.test_history import repo_key
+from tools.test_impact import GLOBAL_FILES, build_import_graph
+
+# pytest's default python_files; repos that configure their own are not cached
+TEST_FILE_NAME = re.compile(r'^(test_.*|.*_test)\.py$')
+
+def cache_root():
+    return Path(os.getenv("COLLECTION_CACHE_DIR", Path.home() / ".cache" / "rift" / "collection")).expanduser()
+
+def enabled():
+    return os.getenv("COLLECTION_CACHE", "true").lower() == "true"
+
+def _cache_path(repo_path):
+    return cache_root() / (hashlib.sha1(repo_key(repo_path).encode()).hexdigest()[:24] + ".json")
+
+def _closure(graph, rel):
+    seen, stack = set(), [rel]
+    while stack:
+        for dep in graph.get(stack.pop(), ()):
+            if dep not in seen:
+                seen.add(dep)
+                stack.append(dep)
+    return seen
+
+def file_keys(repo_path, snapshot, extra=()):
+    """
+    Cache key of every default-named test file (plus `extra` files) in a
+    snapshot_files() snapshot; None when the repo's configuration makes
+    collection uncacheable.
+    """
+    root = Path(repo_path)
+    config = sorted((p, h) for p, h in snapshot.items() if Path(p).name in GLOBAL_FILES)
+    for p, _ in config:
+        if Path(p).name != "conftest.py":
+            try:
+                if "python_files" in (root / p).read_text(encoding="utf-8", errors="replace"):
+                    return None
+            except OSError:
+                pass
+    config_hash = hashlib.sha1(json.dumps(config).encode()).hexdigest()
+    graph = build_import_graph(repo_path, snapshot)
+    keys = {}
+    for rel in snapshot:
+        if TEST_FILE_NAME.match(Path(rel).name) or rel in extra:
+            deps = sorted(snapshot[d] for d in _closure(graph, rel) if d in snapshot)
+            keys[rel] = hashlib.sha1(json.dumps([config_hash, rel, snapshot[rel], deps]).encode()).hexdigest()
+    return keys
+
+def load(repo_path):
+    """{test_file: {"key", "tests": [node_id], "markers": {node_id: [name]} or None}}"""
+    try:
+        return json.loads(_cache_path(repo_path).read_text())
+    except (OSError, ValueError):
+        return {}
+
+def save(repo_path, entries):
+    path = _cache_path(repo_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # A private temp file per writer: threads of one process share the pid
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(entries, f)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+def stale_files(entries, keys):
+    """Test files whose cached collection cannot be reused"""
+    return [rel for rel, key in keys.items() if entries.get(rel, {}).get("key") != key]
+
+def update(entries, keys, node_ids, markers, modules, files):
+    """
+    Store a collection over `files` (None: the whole suite). `modules` are the
+    files pytest collected, including ones without tests; entries of deleted
+    files are dropped. Returns the updated entries.
+    """
+    by_file = {}
+    for node_id in node_ids:
+        by_file.setdefault(node_id.split("::")[0], []).append(node_id)
+    if files is None:
+        # A full collection replaces everything, in pytest's file order
+        entries, files = {}, list(by_file) + sorted((set(keys) | set(modules)) - set(by_file))
+    for rel in files:
+        if rel in keys:
+            tests = by_file.get(rel, [])
+            entries[rel] = {"key": keys[rel], "tests": tests,
+                            "markers": {n: markers.get(n, []) for n in tests} if markers is not None else None}
+    return {rel: entry for rel, entry in entries.items() if rel in keys}
+
+def node_ids(entries):
+    return [node_id for entry in entries.values() for node_id in entry["tests"]]
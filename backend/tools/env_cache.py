@@ -0,0 +1,287 @@
+"""
+Env Cache — Content-addressed virtualenvs for target repositories
+Each distinct set of dependency files (requirements*.txt, pyproject.toml)
+gets one virtualenv, named by the hash of those files and the
+interpreter version. Wheels are built once into a shared local wheel cache and
+installed offline from it. Environments are shared in place by every run and
+repo with the same dependencies, and the least recently used are evicted
+unless a process is still running from them.
+"""
+
+import os, sys, json, time, fcntl, shutil, hashlib, tempfile, threading, subprocess
+from contextlib import contextmanager
+from pathlib import Path
+
+# Only files _requirement_args installs from: anything else in the hash would
+# split environments without changing what is in them
+DEPENDENCY_FILES = ["pyproject.toml"]
+
+# Always installed: the test stage needs these in every environment
+TEST_REQUIREMENTS = ["pytest", "pytest-json-report"]
+
+# pyproject optional-dependency groups that hold test requirements
+TEST_EXTRAS = {"test", "tests", "testing", "dev"}
+
+def cache_root():
+    return Path(os.getenv("ENV_CACHE_DIR", Path.home() / ".cache" / "rift" / "envs")).expanduser()
+
+def wheel_dir():
+    return Path(os.getenv("WHEEL_CACHE_DIR", Path.home() / ".cache" / "rift" / "wheels")).expanduser()
+
+def dependency_files(repo_path):
+    """The repo's top-level dependency files, sorted by name"""
+    root = Path(repo_path)
+    found = [p for p in root.glob("requirements*.txt") if p.is_file()]
+    found += [root / name for name in DEPENDENCY_FILES if (root / name).is_file()]
+    return sorted(found, key=lambda p: p.name)
+
+def env_hash(repo_path):
+    """Content hash of the dependency files plus the interpreter version (None when there are none)"""
+    files = dependency_files(repo_path)
+    if not files:
+        return None
+    digest = hashlib.sha256(f"{sys.version_info[0]}.{sys.version_info[1]}".encode())
+    for path in files:
+        digest.update(path.name.encode() + b"\0" + path.read_bytes() + b"\0")
+    return digest.hexdigest()[:24]
+
+def _pyproject_requirements(path):
+    try:
+        import tomllib
+    except ImportError:
+        try:
+            import tomli as tomllib
+        except ImportError:
+            return []
+    try:
+        project = tomllib.loads(path.read_text(encoding="utf-8")).get("project", {})
+    except Exception:
+        return []
+    requirements = list(project.get("dependencies", []))
+    for extra, deps in project.get("optional-dependencies", {}).items():
+        if extra in TEST_EXTRAS:
+            requirements += deps
+    return requirements
+
+def _requirement_args(repo_path):
+    """pip arguments for everything the repo declares, plus the test stage's own requirements"""
+    args = []
+    for path in dependency_files(repo_path):
+        if path.name.startswith("requirements"):
+            args += ["-r", str(path)]
+        elif path.name == "pyproject.toml":
+            args += _pyproject_requirements(path)
+    return args + TEST_REQUIREMENTS
+
+def _python(env):
+    return str(env / "bin" / "python")
+
+def _run(cmd, timeout, cwd=None):
+    proc = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout, cwd=cwd)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{' '.join(cmd[:4])} failed: {(proc.stderr or proc.stdout)[-2000:]}")
+
+def _dir_size(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                pass
+    return total
+
+def _build(repo_path, env, timeout):
+    """Build `env` from the shared wheel cache, filling the cache first; the env appears atomically"""
+    wheels = wheel_dir()
+    wheels.mkdir(parents=True, exist_ok=True)
+    staging = env.with_name(f".build-{env.name}-{os.getpid()}")
+    shutil.rmtree(staging, ignore_errors=True)
+    try:
+        requirements = _requirement_args(repo_path)
+        _run([sys.executable, "-m", "venv", str(staging)], timeout)
+        # Only missing wheels are downloaded/built; cached ones are reused as-is
+        _run([_python(staging), "-m", "pip", "wheel", "-q", "--wheel-dir", str(wheels), "--find-links", str(wheels)] + requirements, timeout, cwd=repo_path)
+        _run([_python(staging), "-m", "pip", "install", "-q", "--no-index", "--find-links", str(wheels)] + requirements, timeout, cwd=repo_path)
+        meta = {"hash": env.name, "built_at": time.time(), "size": _dir_size(staging), "source": repo_path}
+        (staging / "rift-env.json").write_text(json.dumps(meta))
+        # Only `bin/python -m ...` is ever run, so paths baked into scripts do not matter
+        os.rename(staging, env)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+def _touch(env):
+    try:
+        os.utime(env / "rift-env.json")
+    except OSError:
+        pass
+
+def evict(keep=None):
+    """Remove least recently used environments beyond ENV_CACHE_MAX_ENVS / ENV_CACHE_MAX_MB"""
+    max_envs = int(os.getenv("ENV_CACHE_MAX_ENVS", 10))
+    max_bytes = int(os.getenv("ENV_CACHE_MAX_MB", 10240)) * 1024 * 1024
+    envs = []
+    for env in cache_root().iterdir() if cache_root().is_dir() else []:
+        meta_path = env / "rift-env.json"
+        if env.name.startswith(".") or not meta_path.is_file():
+            continue
+        try:
+            size = json.loads(meta_path.read_text()).get("size", 0)
+        except (OSError, ValueError):
+            size = 0
+        envs.append((meta_path.stat().st_mtime, env, size))
+    envs.sort(key=lambda e: e[0], reverse=True)
+    used = 0
+    for i, (_, env, size) in enumerate(envs):
+        used += size
+        if env.name != keep and (i >= max_envs or used > max_bytes):
+            try:
+                # Users hold the "use" lock shared for as long as they run from the env
+                with CacheLock(env.name, kind="use", blocking=False), CacheLock(env.name):
+                    shutil.rmtree(env, ignore_errors=True)
+            except BlockingIOError:
+                print(f"📦 Keeping environment {env.name}: in use")
+
+class CacheLock:
+    """
+    Cross-process lock for one cache entry (an environment hash by default);
+    exclusive unless `shared`, and raising BlockingIOError when not `blocking`
+    and held elsewhere
+    """
+
+    def __init__(self, name, root=None, kind="lock", shared=False, blocking=True):
+        root = root or cache_root()
+        root.mkdir(parents=True, exist_ok=True)
+        self.path = root / f".{name}.{kind}"
+        self.mode = (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | (0 if blocking else fcntl.LOCK_NB)
+
+    def __enter__(self):
+        self.file = open(self.path, "w")
+        try:
+            fcntl.flock(self.file, self.mode)
+        except BaseException:
+            self.file.close()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+# Environment name -> [users in this process, its shared "use" lock]
+_uses: dict[str, list] = {}
+_uses_lock = threading.Lock()
+
+def _env_name(python):
+    """The cached environment `python` runs from, or None for any other interpreter"""
+    env = Path(python).parent.parent
+    return env.name if env.parent == cache_root() else None
+
+def acquire(python):
+    """Mark the environment of `python` in use, so evict leaves it alone; False when it is not a cached env"""
+    name = _env_name(python)
+    if name is None:
+        return False
+    with _uses_lock:
+        use = _uses.get(name)
+        if use is None:
+            lock = CacheLock(name, kind="use", shared=True)
+            lock.__enter__()
+            use = _uses[name] = [0, lock]
+        use[0] += 1
+    return True
+
+def release(python):
+    name = _env_name(python)
+    with _uses_lock:
+        use = _uses.get(name)
+        if use is None:
+            return
+        use[0] -= 1
+        if not use[0]:
+            use[1].__exit__(None, None, None)
+            del _uses[name]
+
+@contextmanager
+def in_use(python):
+    """Hold the environment of `python` in use for the duration of the block"""
+    held = acquire(python)
+    try:
+        yield python
+    finally:
+        if held:
+            release(python)
+
+_resolved: dict[str, str] = {}
+_resolved_lock = threading.Lock()
+
+# Environment hash -> the thread building it in this process
+_builds: dict[str, threading.Thread] = {}
+
+def _build_in_background(repo_path, digest):
+    """
+    Start (or join) the build of environment `digest` on a background thread,
+    from a copy of the dependency files so the checkout may go away meanwhile
+    """
+    with _resolved_lock:
+        thread = _builds.get(digest)
+        if thread is not None:
+            return thread
+        source = tempfile.mkdtemp(prefix="rift_envsrc_")
+        for path in dependency_files(repo_path):
+            shutil.copy2(path, source)
+
+        def build():
+            env = cache_root() / digest
+            try:
+                with CacheLock(digest):
+                    if not (env / "rift-env.json").is_file():
+                        print(f"📦 Building dependency environment {digest}...")
+                        _build(source, env, int(os.getenv("ENV_BUILD_TIMEOUT", 900)))
+                        print(f"📦 Dependency environment {digest} ready")
+                evict(keep=digest)
+            except Exception as e:
+                print(f"⚠️ Building dependency environment {digest} failed: {e}")
+            finally:
+                shutil.rmtree(source, ignore_errors=True)
+                with _resolved_lock:
+                    _builds.pop(digest, None)
+
+        thread = _builds[digest] = threading.Thread(target=build, daemon=True)
+        thread.start()
+        return thread
+
+def python_for(repo_path, build=True):
+    """
+    Interpreter to run the repo's tests with: the cached environment for its
+    dependency files, or plain "python" when the repo declares no
+    dependencies or ENV_CACHE is off. A miss starts a background build and
+    waits up to ENV_BUILD_WAIT seconds for it, falling back to "python" so a
+    long build never eats into the test stage's time. With `build` off a
+    miss returns None instead.
+    """
+    if os.getenv("ENV_CACHE", "true").lower() != "true":
+        return "python"
+    digest = env_hash(repo_path)
+    if digest is None:
+        return "python"
+    with _resolved_lock:
+        if digest in _resolved and os.path.exists(_resolved[digest]):
+            _touch(cache_root() / digest)
+            return _resolved[digest]
+    env = cache_root() / digest
+    # The metadata file appears with the environment (an atomic rename)
+    if (env / "rift-env.json").is_file():
+        print(f"📦 Dependency environment cache hit ({digest})")
+    elif not build:
+        return None
+    else:
+        _build_in_background(repo_path, digest).join(timeout=float(os.getenv("ENV_BUILD_WAIT", 30)))
+        if not (env / "rift-env.json").is_file():
+            print(f"⚠️ Dependency environment {digest} not ready, using the backend interpreter")
+            return "python"
+    _touch(env)
+    with _resolved_lock:
+        _resolved[digest] = _python(env)
+    return _resolved[digest]
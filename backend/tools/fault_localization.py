@@ -0,0 +1,232 @@
+"""
+Fault Localization — Spectrum-based ranking of suspicious lines
+Failing tests and a sample of passing ones are re-run with per-test line
+coverage; every line executed by a failing test is scored with Ochiai or
+Tarantula, and adjacent suspicious lines are merged into ranked regions.
+Only the top regions are handed to the fix stage and the LLM, instead of
+whole files. Run as a script, this module is the pytest runner that records
+the coverage (stdlib only, so it works in the target repo's interpreter).
+"""
+
+import os, re, sys, json, math, shutil, tempfile
+
+FORMULAS = {
+    # ef/ep: failing/passing tests executing the line; F/P: failing/passing tests run
+    "ochiai": lambda ef, ep, F, P: ef / math.sqrt(F * (ef + ep)),
+    "tarantula": lambda ef, ep, F, P: (ef / F) / ((ef / F) + (ep / P if P else 0.0)),
+}
+
+# Lines of test code are executed by one test each and would outrank the code under test
+TEST_FILE = re.compile(r'(^|/)(test_[^/]*|[^/]*_test|conftest)\.py$|(^|/)tests?/')
+EXCLUDED_DIRS = {".git", ".venv", "venv", "site-packages", "node_modules", "__pycache__"}
+
+# Prefix of the numbered lines in focus_excerpt (e.g. "   42| return x")
+LINE_NUMBER_PREFIX = re.compile(r'^\s*\d+\| ?')
+
+# Failures the analyzers cannot locate from the message alone
+LOCALIZED_BUG_TYPES = ("LOGIC", "TYPE_ERROR")
+
+def enabled():
+    return os.getenv("FAULT_LOCALIZATION", "true").lower() == "true"
+
+def failed_tests(clusters):
+    """pytest node IDs of the failing tests in LOGIC or TYPE_ERROR clusters (triage.cluster_failures)"""
+    return [test for c in clusters if c["bug_type"] in LOCALIZED_BUG_TYPES for test in c["tests"] if "::" in test]
+
+class _LineCollector:
+    """pytest plugin recording the repo lines each test executes (setup, call and teardown)"""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root) + os.sep
+        self.tracked = {}
+        self.lines = set()
+        self.tests = {}
+
+    def _track(self, filename):
+        if filename not in self.tracked:
+            # Pseudo-files such as "<frozen posixpath>" or "<string>" are never repo code
+            path = os.path.abspath(filename) if not filename.startswith("<") else ""
+            rel = path[len(self.root):] if path.startswith(self.root) else ""
+            ok = bool(rel) and not TEST_FILE.search(rel.replace(os.sep, "/")) and not EXCLUDED_DIRS.intersection(rel.split(os.sep))
+            self.tracked[filename] = rel.replace(os.sep, "/") if ok else None
+        return self.tracked[filename]
+
+    def _global_trace(self, frame, event, arg):
+        # Returning None for foreign frames leaves them untraced line by line
+        return self._local_trace if self._track(frame.f_code.co_filename) else None
+
+    def _local_trace(self, frame, event, arg):
+        if event == "line":
+            self.lines.add((frame.f_code.co_filename, frame.f_lineno))
+        return self._local_trace
+
+    def pytest_runtest_logstart(self, nodeid, location):
+        # Called before setup, so fixtures' lines count too
+        self.lines = set()
+        self.tests[nodeid] = {"failed": False, "lines": {}}
+        sys.settrace(self._global_trace)
+
+    def pytest_runtest_logreport(self, report):
+        if report.failed and report.nodeid in self.tests:
+            self.tests[report.nodeid]["failed"] = True
+
+    def pytest_runtest_logfinish(self, nodeid, location):
+        sys.settrace(None)
+        by_file = {}
+        for filename, line in self.lines:
+            by_file.setdefault(self.tracked[filename], []).append(line)
+        self.tests[nodeid]["lines"] = {f: sorted(lines) for f, lines in by_file.items()}
+
+def _main(output, repo_path, args):
+    """Script entry: run pytest over `args` and write {nodeid: {failed, lines}} to `output`"""
+    import pytest
+    if sys.path and os.path.abspath(sys.path[0]) == os.path.dirname(os.path.abspath(__file__)):
+        sys.path.pop(0)
+    # Same import root as `python -m pytest` run from the repo
+    sys.path.insert(0, repo_path)
+    collector = _LineCollector(repo_path)
+    code = pytest.main(args, plugins=[collector])
+    with open(output, "w") as f:
+        json.dump(collector.tests, f)
+    return code
+
+def select_tests(node_ids, failed, limit=None):
+    """
+    Failing tests plus passing tests to contrast them with, up to `limit`:
+    tests from the failing tests' files first, then the rest in order.
+    """
+    limit = limit or int(os.getenv("FAULT_LOCALIZATION_MAX_TESTS", 200))
+    failed = [n for n in node_ids if n in set(failed)]
+    files = {n.split("::")[0] for n in failed}
+    rest = [n for n in node_ids if n not in set(failed)]
+    passing = [n for n in rest if n.split("::")[0] in files] + [n for n in rest if n.split("::")[0] not in files]
+    return failed + passing[:max(0, limit - len(failed))]
+
+def run_with_coverage(repo_path, node_ids=None, timeout=None, on_line=None, build=True):
+    """
+    Run the given tests (the whole suite when None) in the sandbox with
+    per-test line coverage. Returns {nodeid: {"failed", "lines": {file: [line]}}},
+    empty when `build` is off and the repo's environment is not cached yet.
+    """
+    from tools import sandbox
+    from tools.env_cache import in_use, python_for
+    from tools.test_stream import stream_process
+
+    python = python_for(repo_path, build=build)
+    if python is None:
+        return {}
+    timeout = timeout or int(os.getenv("SANDBOX_TIMEOUT", 60))
+    out_dir = tempfile.mkdtemp(prefix="rift_coverage_")
+    output = os.path.join(out_dir, "coverage.json")
+    args = ["-q", "-p", "no:cacheprovider", f"--rootdir={repo_path}"] + (list(node_ids) if node_ids else [repo_path])
+    cmd = [python, os.path.abspath(__file__), output, repo_path] + args
+    try:
+        with in_use(python):
+            timed_out, _ = stream_process(sandbox.spawn(cmd, repo_path), timeout, on_line or (lambda line: None))
+        if timed_out or not os.path.exists(output):
+            return {}
+        with open(output) as f:
+            return json.load(f)
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+def rank_lines(tests, formula=None):
+    """[(file, line, score, ef, ep)] for every line a failing test executed, most suspicious first"""
+    score = FORMULAS[formula or os.getenv("FAULT_LOCALIZATION_FORMULA", "ochiai")]
+    F = sum(1 for t in tests.values() if t["failed"])
+    P = len(tests) - F
+    if not F:
+        return []
+    counts = {}
+    for t in tests.values():
+        for file, lines in t["lines"].items():
+            for line in lines:
+                c = counts.setdefault((file, line), [0, 0])
+                c[0 if t["failed"] else 1] += 1
+    ranked = [(file, line, score(ef, ep, F, P), ef, ep) for (file, line), (ef, ep) in counts.items() if ef]
+    return sorted(ranked, key=lambda r: (-r[2], -r[3], r[0], r[1]))
+
+def suspicious_regions(ranked, repo_path=None, top=None, gap=2):
+    """
+    Merge lines with the same score (executed by the same tests) that are within
+    `gap` lines of each other into regions; returns the `top` regions, most
+    suspicious and narrowest first, with their source.
+    """
+    top = top or int(os.getenv("FAULT_LOCALIZATION_TOP_REGIONS", 5))
+    by_file = {}
+    for file, line, score, _, _ in ranked:
+        by_file.setdefault(file, []).append((line, round(score, 3)))
+    regions = []
+    for file, lines in by_file.items():
+        lines.sort()
+        current = None
+        for line, score in lines:
+            if current and score == current["score"] and line - current["end"] <= gap + 1:
+                current["end"] = line
+                continue
+            current = {"file": file, "start": line, "end": line, "score": score}
+            regions.append(current)
+    regions.sort(key=lambda r: (-r["score"], r["end"] - r["start"], r["file"], r["start"]))
+    regions = regions[:top]
+    if repo_path:
+        for r in regions:
+            try:
+                with open(os.path.join(repo_path, r["file"]), encoding="utf-8", errors="replace") as f:
+                    source = f.read().splitlines()
+                r["code"] = "\n".join(source[r["start"] - 1:min(r["end"], r["start"] + 39)])
+            except OSError:
+                pass
+    return regions
+
+def localize(repo_path, node_ids=None, failed=None, timeout=None, on_line=None, build=True):
+    """
+    The fault localization stage: re-run `failed` with passing tests picked
+    from `node_ids` (or the whole suite when no node IDs are given) under
+    coverage, and rank suspicious regions. Returns {"formula", "tests_run", "regions"}.
+    """
+    selection = select_tests(node_ids, failed or []) if node_ids else None
+    tests = run_with_coverage(repo_path, selection, timeout, on_line, build)
+    formula = os.getenv("FAULT_LOCALIZATION_FORMULA", "ochiai")
+    return {"formula": formula, "tests_run": len(tests),
+            "regions": suspicious_regions(rank_lines(tests, formula), repo_path)}
+
+def regions_by_file(regions):
+    by_file = {}
+    for r in regions:
+        by_file.setdefault(r["file"], []).append(r)
+    return by_file
+
+def focus_excerpt(path, content, regions, context=None):
+    """
+    The parts of a file an LLM needs for the given regions: each region with
+    `context` lines around it and the header of its enclosing def/class.
+    Lines keep their numbers as a prefix, so edits address the real file.
+    """
+    context = int(os.getenv("FAULT_LOCALIZATION_CONTEXT", 3)) if context is None else context
+    lines = content.splitlines()
+    keep = set()
+    for r in regions:
+        if r["start"] > len(lines):
+            continue
+        keep.update(range(max(1, r["start"] - context), min(len(lines), r["end"] + context) + 1))
+        indent = len(lines[r["start"] - 1]) - len(lines[r["start"] - 1].lstrip())
+        for n in range(r["start"] - 1, 0, -1):
+            stripped = lines[n - 1].lstrip()
+            if re.match(r'(async\s+)?def |class ', stripped) and len(lines[n - 1]) - len(stripped) < indent:
+                keep.add(n)
+                break
+    out = [f"# Excerpt of {path}: the lines most suspected by the failing tests; each line is prefixed with its line number"]
+    previous = 0
+    for n in sorted(keep):
+        if n > previous + 1:
+            out.append("...")
+        out.append(f"{n:>5}| {lines[n - 1]}")
+        previous = n
+    return "\n".join(out)
+
+def strip_line_numbers(text):
+    """Undo focus_excerpt's line-number prefixes in text an LLM copied from an excerpt"""
+    return "\n".join(LINE_NUMBER_PREFIX.sub("", line, count=1) for line in text.splitlines())
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1], sys.argv[2], sys.argv[3:]))
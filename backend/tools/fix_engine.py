@@ -0,0 +1,147 @@
+"""
+Fix Engine — Apply rule fixes per file in one pass
+Fixes are grouped by file; each file is read once into a line buffer, every
+fix is applied against its original line numbers (so removing a line never
+shifts later fixes), fixes to a line another fix removed are reported as
+conflicts, and the file is written back once, atomically. The line rules
+themselves live in tools.fixers.
+"""
+
+import os, tempfile
+from pathlib import Path
+
+from tools.fixers import FIX_TEXT, fix_line, detect_issues
+
+class LineBuffer:
+    """A file's lines as slots addressed by original line number; each slot holds its replacement text"""
+
+    def __init__(self, content):
+        self.original = content.splitlines(keepends=True)
+        self.slots = list(self.original)
+        self.owner = {}
+
+    def current(self, line_number):
+        """The line as earlier fixes left it; None when one of them removed it"""
+        index = line_number - 1
+        return None if index in self.owner and not self.slots[index] else self.slots[index]
+
+    def replace(self, line_number, text, fix_id):
+        self.slots[line_number - 1] = text
+        self.owner.setdefault(line_number - 1, fix_id)
+
+    def new_line_number(self, line_number):
+        """Where an original line ends up once removed lines are dropped (None if it was removed)"""
+        if not self.slots[line_number - 1]:
+            return None
+        return 1 + sum(1 for slot in self.slots[:line_number - 1] if slot)
+
+    def render(self):
+        return "".join(self.slots)
+
+def write_atomic(path, content):
+    """Replace a file's content in one rename, keeping its permissions"""
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(content)
+        os.chmod(tmp, path.stat().st_mode & 0o7777)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+def _apply(buffer, items, summary):
+    """Apply (index, fix) items to a buffer, filling a summary's applied/conflicts/stale/manual lists"""
+    for i, fix in sorted(items, key=lambda item: int(item[1].get("line_number", 0) or 0)):
+        line_number = int(fix.get("line_number", 0) or 0)
+        entry = {"fix": i, "line_number": line_number, "bug_type": fix.get("bug_type", "")}
+        if not 1 <= line_number <= len(buffer.original):
+            summary["stale"].append({**entry, "reason": f"Line {line_number} out of range"})
+            continue
+        original_line = buffer.original[line_number - 1]
+        expected = fix.get("original_line")
+        if expected and expected.strip() != original_line.strip():
+            summary["stale"].append({**entry, "reason": "Line content differs from the reported original_line"})
+            continue
+        current = buffer.current(line_number)
+        if current is None:
+            summary["conflicts"].append({**entry, "reason": f"Line {line_number} was removed by fix {buffer.owner[line_number - 1]}"})
+            continue
+        # Fixes to the same line compose: each rule applies to the line as the previous left it
+        fixed_line, description = fix_line(current, fix.get("bug_type", ""), fix.get("description", ""), fix.get("fix_hint", ""))
+        if fixed_line is None:
+            summary["manual"].append({**entry, "reason": description})
+        elif fixed_line == current:
+            summary["applied"].append({**entry, "description": f"{description} (already fixed)"})
+        else:
+            buffer.replace(line_number, fixed_line, i)
+            summary["applied"].append({**entry, "description": f"{description} on line {line_number}",
+                                       "original_line": current.rstrip("\r\n"), "fixed_line": fixed_line.rstrip("\r\n"),
+                                       "commit_message": f"fix({entry['bug_type'].lower()}): {description} on line {line_number}"})
+    for entry in summary["applied"]:
+        entry["new_line_number"] = buffer.new_line_number(entry["line_number"])
+
+def apply_fixes(fixes, write=True):
+    """
+    Apply fix dicts ({file_path, line_number, bug_type, description, fix_hint,
+    optional original_line}) grouped per file. Returns one summary per file with
+    the applied, conflicting, stale and manual (LLM-needed) fixes; contents are
+    never returned.
+    """
+    by_file = {}
+    for i, fix in enumerate(fixes):
+        by_file.setdefault(fix.get("file_path") or fix.get("file", ""), []).append((i, fix))
+    results = []
+    for file_path, items in by_file.items():
+        summary = {"file_path": file_path, "applied": [], "conflicts": [], "stale": [], "manual": [], "written": False}
+        results.append(summary)
+        path = Path(file_path)
+        if not path.is_file():
+            summary["error"] = f"File not found: {file_path}"
+            continue
+        with open(path, encoding="utf-8", errors="replace", newline="") as f:
+            buffer = LineBuffer(f.read())
+        _apply(buffer, items, summary)
+        if buffer.owner and write:
+            write_atomic(path, buffer.render())
+            summary["written"] = True
+    return results
+
+def fix_source(content, path=None, failing_lines=()):
+    """
+    Detect and fix every deterministically fixable issue in a source string
+    (see detect_issues for `failing_lines`). Returns (fixed_content, applied
+    entries) without touching the disk.
+    """
+    issues = detect_issues(content, path, failing_lines)
+    buffer = LineBuffer(content)
+    summary = {"applied": [], "conflicts": [], "stale": [], "manual": []}
+    _apply(buffer, list(enumerate(issues)), summary)
+    for entry in summary["applied"]:
+        entry["description"] = issues[entry["fix"]]["description"]
+    return buffer.render(), summary["applied"]
+
+def original_line_numbers(content, applied):
+    """For each line of fix_source's output, the line number it had in `content`"""
+    removed = {entry["line_number"] for entry in applied if entry.get("new_line_number") is None}
+    return [n for n in range(1, len(content.splitlines()) + 1) if n not in removed]
+
+# How the agents display a removed line
+REMOVED_LINE = "# Removed unused import"
+
+def agent_fix(entry, relative_path):
+    """An applied fix_source entry in the agents' fix format"""
+    bug_type, n = entry["bug_type"], entry["line_number"]
+    label = "TYPE_ERROR" if bug_type == "TYPE_ERROR" else f"{bug_type} error"
+    return {
+        "file": relative_path,
+        "line_number": n,
+        "bug_type": bug_type,
+        "description": f"{label} in {relative_path} line {n} → Fix: {FIX_TEXT[bug_type]}",
+        "commit_message": f"[AI-AGENT] Fix {bug_type}: {entry['description']} in {relative_path}:{n}",
+        "status": "Fixed",
+        "original_line": entry.get("original_line", ""),
+        "fixed_line": entry.get("fixed_line") or REMOVED_LINE,
+    }
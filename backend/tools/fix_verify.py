@@ -0,0 +1,297 @@
+"""
+Fix Verification — Compile and import-check fixed files before they reach git
+Each modified file is compiled in a worker pool; a diff hunk whose fix
+introduces an error the original did not have is reverted on its own, keeping
+the file's other fixes. The repo's import graph is then checked against the
+fixed sources (modules that no longer resolve, names a fix removed from a
+module others import), and the responsible hunks are reverted too.
+"""
+
+import os, re, ast, time, difflib, functools
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from tools.test_impact import EXCLUDED_DIRS
+
+def enabled():
+    return os.getenv("FIX_VERIFY", "true").lower() == "true"
+
+def _workers():
+    return int(os.getenv("FIX_VERIFY_WORKERS", os.cpu_count() or 1))
+
+def _error(rel, source):
+    """(message, line number, stripped line) of the first compile error, or None"""
+    try:
+        compile(source, rel, "exec", dont_inherit=True)
+        return None
+    except SyntaxError as e:
+        return e.msg, e.lineno or 0, (e.text or "").strip()
+    except ValueError as e:
+        return str(e), 0, ""
+
+def _same(a, b):
+    return a is not None and b is not None and (a[0], a[2]) == (b[0], b[2])
+
+class FileFix:
+    """A file's fixes as diff hunks against the original, each of which can be reverted on its own"""
+
+    def __init__(self, rel, original, fixed):
+        self.rel = rel
+        self.original = original.splitlines(keepends=True)
+        self.fixed = fixed.splitlines(keepends=True)
+        opcodes = difflib.SequenceMatcher(None, self.original, self.fixed, autojunk=False).get_opcodes()
+        self.hunks = []
+        for tag, i1, i2, j1, j2 in opcodes:
+            if tag == "replace" and i2 - i1 == j2 - j1:
+                # Line-for-line edits are separate fixes
+                self.hunks += [(i1 + d, i1 + d + 1, j1 + d, j1 + d + 1) for d in range(i2 - i1)]
+            elif tag != "equal":
+                self.hunks.append((i1, i2, j1, j2))
+        self.active = set(range(len(self.hunks)))
+
+    def render(self):
+        out, pos = [], 0
+        for k, (i1, i2, j1, j2) in enumerate(self.hunks):
+            out += self.original[pos:i1]
+            out += self.fixed[j1:j2] if k in self.active else self.original[i1:i2]
+            pos = i2
+        return "".join(out + self.original[pos:])
+
+    def spans(self):
+        """(hunk, first output line, last output line) of the active hunks; removals span no lines"""
+        spans, shift = [], 0
+        for k, (i1, i2, j1, j2) in enumerate(self.hunks):
+            start = i1 + shift + 1
+            if k in self.active:
+                spans.append((k, start, start + (j2 - j1) - 1))
+                shift += (j2 - j1) - (i2 - i1)
+        return spans
+
+    def hunk_at(self, line):
+        """The active hunk whose replacement text contains an output line"""
+        return next((k for k, start, end in self.spans() if start <= line <= end), None)
+
+    def candidates(self, line):
+        """Active hunks that may have caused an error on an output line: nearest preceding first, then following"""
+        spans = self.spans()
+        before = [k for k, start, _ in sorted(spans, key=lambda s: -s[1]) if start <= line]
+        return before + [k for k, start, _ in spans if start > line]
+
+    def report(self, k, reason):
+        i1, i2, j1, j2 = self.hunks[k]
+        return {"file": self.rel, "line": i1 + 1 if i2 > i1 else i1, "lines": max(i2 - i1, j2 - j1), "reason": reason,
+                "original": "".join(self.original[i1:i2]), "fixed": "".join(self.fixed[j1:j2])}
+
+def repair_compile(fix):
+    """
+    Revert hunks of a FileFix until it compiles or only fails the way the
+    original did. A revert is kept only when it changes the error and does not
+    bring back the original's own error (that hunk was the fix for it, and the
+    remaining error was masked in the original). Returns [(hunk, reason)].
+    """
+    base = _error(fix.rel, "".join(fix.original))
+    err, reverted = _error(fix.rel, fix.render()), []
+    while err is not None and not _same(err, base):
+        for k in fix.candidates(err[1]):
+            fix.active.discard(k)
+            after = _error(fix.rel, fix.render())
+            if after is None or not (_same(after, err) or _same(after, base)):
+                reverted.append((k, f"line {err[1]}: {err[0]}"))
+                err = after
+                break
+            fix.active.add(k)
+        else:
+            break
+    return reverted
+
+def _repair_job(args):
+    rel, original, fixed = args
+    return repair_compile(FileFix(rel, original, fixed))
+
+def _map(fn, items):
+    """fn over items in a process pool (inline for a single item, one worker, or when a pool cannot start)"""
+    workers = min(_workers(), len(items))
+    if workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                return list(pool.map(fn, items))
+        except (OSError, RuntimeError) as e:
+            print(f"⚠️ Verification pool unavailable, compiling inline: {e}")
+    return [fn(item) for item in items]
+
+def _py_files(root):
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in EXCLUDED_DIRS]
+        files += [(Path(dirpath) / n).relative_to(root).as_posix() for n in filenames if n.endswith(".py")]
+    return files
+
+@functools.lru_cache(maxsize=1024)
+def _exports(source):
+    """Names a module defines at top level; None when unknown (unparsable, star import, module __getattr__)"""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+    names = set()
+    def visit(body):
+        for node in body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                names.add(node.name)
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                if any(a.name == "*" for a in node.names):
+                    raise LookupError
+                names.update(a.asname or a.name.split(".")[0] for a in node.names)
+            elif isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign, ast.For, ast.AsyncFor, ast.With, ast.AsyncWith)):
+                targets = node.targets if isinstance(node, ast.Assign) else [getattr(node, "target", None)] + [i.optional_vars for i in getattr(node, "items", [])]
+                names.update(n.id for t in targets if t is not None for n in ast.walk(t) if isinstance(n, ast.Name))
+            for field in ("body", "orelse", "finalbody"):
+                if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)) and isinstance(getattr(node, field, None), list):
+                    visit(getattr(node, field))
+            for handler in getattr(node, "handlers", []):
+                if handler.name:
+                    names.add(handler.name)
+                visit(handler.body)
+    try:
+        visit(tree.body)
+    except LookupError:
+        return None
+    names.update(name for node in ast.walk(tree) if isinstance(node, ast.Global) for name in node.names)
+    return None if "__getattr__" in names else names
+
+def _module_file(parts, sources):
+    path = "/".join(parts)
+    return next((f for f in (f"{path}.py", f"{path}/__init__.py") if f in sources), None)
+
+def _roots(rel, sources):
+    """Directories an absolute import resolves from: the repo root, src/, and the importer's first non-package ancestor"""
+    parts = rel.split("/")[:-1]
+    while parts and "/".join(parts + ["__init__.py"]) in sources:
+        parts.pop()
+    return [[], ["src"], parts]
+
+def _import_problems(rel, source, sources, local_tops):
+    """{(stripped statement, message): line} for imports of repo modules that do not resolve or lack a name"""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return {}
+    lines, problems = source.splitlines(), {}
+    package = rel.split("/")[:-1]
+    def resolve(level, module):
+        names = module.split(".") if module else []
+        if level:
+            base = package[:len(package) - level + 1] if level - 1 <= len(package) else None
+            return None if base is None else _module_file(base + names, sources)
+        return next((f for root in _roots(rel, sources) for f in [_module_file(root + names, sources)] if f), None)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            targets = [(0, a.name, None) for a in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            targets = [(node.level, node.module or "", node.names)]
+        else:
+            continue
+        statement = lines[node.lineno - 1].strip() if node.lineno <= len(lines) else ""
+        for level, module, aliases in targets:
+            if not level and module.split(".")[0] not in local_tops:
+                continue
+            target = resolve(level, module)
+            if target is None:
+                problems[(statement, f"No module named '{'.' * level}{module}'")] = node.lineno
+                continue
+            exports = _exports(sources[target])
+            for alias in aliases or []:
+                if exports is None or alias.name in exports or alias.name == "*":
+                    continue
+                # `from package import submodule`
+                if target.endswith("__init__.py") and _module_file(target.split("/")[:-1] + [alias.name], sources):
+                    continue
+                problems[(statement, f"cannot import name '{alias.name}' from '{'.' * level}{module}' ({target})")] = node.lineno
+    return problems
+
+def verify_fixes(repo_path, originals, fixed):
+    """
+    Verify fixed sources ({rel: content}) against their originals before they
+    are committed. Returns {"contents": {rel: verified content}, "reverted":
+    [hunk reports], "errors": {rel: error the fixes could not explain},
+    "seconds": float}.
+    """
+    started = time.time()
+    fixes = {rel: FileFix(rel, originals[rel], content) for rel, content in fixed.items()
+             if rel.endswith(".py") and rel in originals and content != originals[rel]}
+    reverted = []
+    rels = sorted(fixes)
+    for rel, hunks in zip(rels, _map(_repair_job, [(rel, originals[rel], fixed[rel]) for rel in rels])):
+        for k, reason in hunks:
+            fixes[rel].active.discard(k)
+            reverted.append(fixes[rel].report(k, reason))
+
+    # Import graph: modified files and the files that mention a modified module
+    root = Path(repo_path)
+    disk = {}
+    for rel in _py_files(root):
+        try:
+            disk[rel] = (root / rel).read_text(encoding="utf-8", errors="replace")
+        except OSError:
+            pass
+    disk.update(originals)
+    # Every directory and module name: absolute imports of these are meant to be local
+    local_tops = {part[:-3] if part.endswith(".py") else part for p in disk for part in p.split("/")}
+    stems = {Path(rel).stem if Path(rel).stem != "__init__" else Path(rel).parent.name for rel in fixes}
+    scope = [rel for rel, source in disk.items() if rel in fixes or any(re.search(rf"\b{re.escape(s)}\b", source) for s in stems)]
+    before = {}
+    for rel in scope:
+        before.update({(rel,) + key: line for key, line in _import_problems(rel, disk[rel], disk, local_tops).items()})
+    for _ in range(sum(len(f.hunks) for f in fixes.values()) + 1):
+        current = {**disk, **{rel: f.render() for rel, f in fixes.items()}}
+        new = {}
+        for rel in scope:
+            for key, line in _import_problems(rel, current[rel], current, local_tops).items():
+                if (rel,) + key not in before:
+                    new[(rel,) + key] = line
+        touched = set()
+        for (rel, statement, message), line in new.items():
+            k = fixes[rel].hunk_at(line) if rel in fixes else None
+            if k is not None:
+                picks = {(rel, k)}
+            else:
+                # A name the importer needs vanished from a fixed module
+                m = re.search(r"cannot import name '(\w+)' from .* \((.+)\)$", message)
+                target = fixes.get(m.group(2)) if m else None
+                if target is None:
+                    continue
+                mentions = {k for k in target.active if re.search(rf"\b{m.group(1)}\b", "".join(target.original[target.hunks[k][0]:target.hunks[k][1]]))}
+                picks = {(target.rel, k) for k in (mentions or target.active)}
+            for file_rel, k in picks:
+                if k in fixes[file_rel].active:
+                    fixes[file_rel].active.discard(k)
+                    reverted.append(fixes[file_rel].report(k, f"{rel}: {message}"))
+                    touched.add(file_rel)
+        if not touched:
+            break
+        # Partial reverts must still compile
+        for rel in touched:
+            for k, reason in repair_compile(fixes[rel]):
+                fixes[rel].active.discard(k)
+                reverted.append(fixes[rel].report(k, reason))
+
+    contents = {rel: content for rel, content in fixed.items()}
+    contents.update({rel: f.render() for rel, f in fixes.items()})
+    errors = {}
+    for rel, f in fixes.items():
+        err = _error(rel, contents[rel])
+        if err:
+            errors[rel] = f"line {err[1]}: {err[0]}"
+    return {"contents": contents, "reverted": reverted, "errors": errors, "seconds": round(time.time() - started, 3)}
+
+def mark_reverted(fixes, reverted):
+    """Mark agent fix dicts ({file, line_number}) inside reverted hunks as Failed; returns how many were marked"""
+    marked = 0
+    for fix in fixes:
+        for hunk in reverted:
+            if fix.get("file") == hunk["file"] and hunk["line"] <= int(fix.get("line_number", 0) or 0) <= hunk["line"] + max(hunk["lines"] - 1, 0):
+                fix["status"] = "Failed"
+                fix["verification"] = f"Reverted before commit: {hunk['reason']}"
+                marked += 1
+                break
+    return marked
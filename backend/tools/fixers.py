@@ -0,0 +1,415 @@
+"""
+Fixers — Deterministic detection and repair of the six bug types
+Token- and AST-aware rules for the common cases of every bug type (unused
+imports, missing colons, mixed indentation, relative imports outside a
+package, `=` used as a comparison, str + non-str concatenation). Shared by the
+crew tools and the agents; each fix is a single-line edit computed locally.
+"""
+
+import io, re, ast, keyword, tokenize
+from pathlib import Path
+
+# Fix wording shared by the agents' issue descriptions
+FIX_TEXT = {
+    "LINTING": "remove the import statement",
+    "SYNTAX": "add the colon at the correct position",
+    "LOGIC": "use == for comparison",
+    "TYPE_ERROR": "convert types before concatenation",
+    "IMPORT": "use absolute imports",
+    "INDENTATION": "use consistent indentation",
+}
+
+# Statements whose header must end with a colon
+COMPOUND = {"if", "elif", "else", "for", "while", "try", "except", "finally", "def", "class", "with"}
+CONDITIONS = {"if", "elif", "while"}
+SKIPPED = {tokenize.NL, tokenize.NEWLINE, tokenize.COMMENT, tokenize.INDENT, tokenize.DEDENT, tokenize.ENDMARKER}
+OPENERS, CLOSERS = "([{", ")]}"
+
+def _tokens(line):
+    """Significant tokens of one physical line; None when it does not tokenize on its own"""
+    try:
+        toks = list(tokenize.generate_tokens(io.StringIO(line.rstrip("\r\n") + "\n").readline))
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        return None
+    return [t for t in toks if t.type not in SKIPPED]
+
+def _depths(toks):
+    """Bracket depth at each token; None when the line's brackets do not balance"""
+    depth, depths = 0, []
+    for t in toks:
+        if t.type == tokenize.OP and t.string in CLOSERS:
+            depth -= 1
+        depths.append(depth)
+        if t.type == tokenize.OP and t.string in OPENERS:
+            depth += 1
+        if depth < 0:
+            return None
+    return depths if depth == 0 else None
+
+def _header(toks):
+    """Index of the compound keyword a line starts with (after `async`), or None"""
+    i = 1 if toks and toks[0].string == "async" and len(toks) > 1 else 0
+    return i if toks and toks[i].type == tokenize.NAME and toks[i].string in COMPOUND else None
+
+def _splice(line, edits):
+    """Apply (start_col, end_col, text) edits to a line, right to left"""
+    for start, end, text in sorted(edits, reverse=True):
+        line = line[:start] + text + line[end:]
+    return line
+
+def missing_colon(line):
+    """The line with its compound-statement colon added, or None"""
+    if line.rstrip("\r\n").endswith("\\"):
+        return None
+    toks = _tokens(line)
+    depths = _depths(toks) if toks else None
+    head = _header(toks) if depths else None
+    if head is None:
+        return None
+    if any(t.string == ":" and d == 0 for t, d in zip(toks[head:], depths[head:])):
+        return None
+    if toks[head].string in ("else", "try", "finally") and len(toks) > head + 1:
+        return None
+    end = toks[-1].end[1]
+    return line[:end] + ":" + line[end:]
+
+def comparison_fix(line):
+    """`if x = 1` style conditions with `=` turned into `==`, or None"""
+    toks = _tokens(line)
+    depths = _depths(toks) if toks else None
+    if not depths or toks[0].string not in CONDITIONS:
+        return None
+    edits = [(t.start[1], t.end[1], "==") for t, d in zip(toks, depths) if t.type == tokenize.OP and t.string == "=" and d == 0]
+    return _splice(line, edits[:1]) if edits else None
+
+def _is_text(tok):
+    """A str literal token; bytes literals (b"", rb"") concatenate with bytes, not str"""
+    return tok.type == tokenize.STRING and "b" not in tok.string[:len(tok.string) - len(tok.string.lstrip("bBrRuUfF"))].lower()
+
+def _operands(toks):
+    """Simple-name and number operands concatenated with a string literal, as token indexes"""
+    found = []
+    for i, t in enumerate(toks):
+        if t.type not in (tokenize.NAME, tokenize.NUMBER) or keyword.iskeyword(t.string):
+            continue
+        prev = toks[i - 1] if i else None
+        nxt = toks[i + 1] if i + 1 < len(toks) else None
+        if prev and prev.string == "." or nxt and nxt.string in ("(", "[", "."):
+            continue
+        # A text (not bytes) literal on the other side of an adjacent `+`
+        left = prev and prev.string == "+" and i >= 2 and _is_text(toks[i - 2])
+        right = nxt and nxt.string == "+" and i + 2 < len(toks) and _is_text(toks[i + 2])
+        if left or right:
+            found.append(i)
+    return found
+
+def concat_fix(line, skip=(), only=None):
+    """
+    The line with non-string operands of string concatenation wrapped in str(),
+    or None. Names in `skip` are left alone; with `only`, just number literals
+    and the names in `only` are wrapped.
+    """
+    toks = _tokens(line)
+    if not toks:
+        return None
+    edits = [(toks[i].start[1], toks[i].end[1], f"str({toks[i].string})") for i in _operands(toks)
+             if toks[i].string not in skip and (only is None or toks[i].type == tokenize.NUMBER or toks[i].string in only)]
+    return _splice(line, edits) if edits else None
+
+def absolute_import(line):
+    """`from .x import y` -> `from x import y` (`from . import y` -> `import y`), or None"""
+    stripped = line.lstrip()
+    indent = line[:len(line) - len(stripped)]
+    if not stripped.startswith("from ."):
+        return None
+    module, sep, names = stripped[5:].partition(" import ")
+    module = module.lstrip(".")
+    if not sep:
+        return None
+    return indent + (f"from {module} import {names}" if module else f"import {names}")
+
+def expand_indent(line, width=4):
+    stripped = line.lstrip(" \t")
+    indent = line[:len(line) - len(stripped)]
+    return indent.expandtabs(width) + stripped if "\t" in indent else None
+
+def _tab_width(hint):
+    m = re.search(r"tab width (\d+)", hint)
+    return int(m.group(1)) if m else 4
+
+def _indent_consistent(source):
+    """
+    Whether every indented block of `source` opens right after a block header
+    (a line ending in ":", or one missing_colon completes) and every header
+    opens one. Judged from tokens alone, so other syntax errors in the file
+    cannot hide an indentation error; False when the file does not tokenize.
+    """
+    header = opening = False
+    first = None
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO(source).readline):
+            if tok.type in (tokenize.NL, tokenize.COMMENT):
+                continue
+            if tok.type == tokenize.INDENT:
+                if not opening:
+                    return False
+                opening = False
+            elif tok.type == tokenize.NEWLINE:
+                header = last.string == ":" or missing_colon(first.line.rstrip("\r\n")) is not None
+                opening, first = header, None
+            else:
+                if opening:
+                    # A header followed by a dedent, another line or the end of the file
+                    return False
+                if first is None and tok.type not in (tokenize.DEDENT, tokenize.ENDMARKER):
+                    first = tok
+                last = tok
+    except (tokenize.TokenError, SyntaxError):
+        return False
+    return True
+
+def _reindent(content, skip):
+    """
+    (tab width, {line: fixed line}) re-indenting every tab-indented line of a
+    file that fails with an indentation error, with the first width (4, then 8)
+    that makes the whole file indent consistently; None when neither does.
+    """
+    lines = content.splitlines()
+    tabbed = [n for n, line in enumerate(lines, 1) if n not in skip and "\t" in line[:len(line) - len(line.lstrip(" \t"))]]
+    if not tabbed:
+        return None
+    for width in (4, 8):
+        fixed = {n: expand_indent(lines[n - 1], width) for n in tabbed}
+        if _indent_consistent("\n".join(fixed.get(n, line) for n, line in enumerate(lines, 1)) + "\n"):
+            return width, fixed
+    return None
+
+def fix_line(line, bug_type, description="", fix_hint=""):
+    """(fixed_line, description) for the deterministic fix of one line, or (None, reason) when the LLM is needed"""
+    hint = f"{description} {fix_hint}".lower()
+    fixed, what = None, ""
+    if bug_type == "LINTING" and ("unused import" in hint or "remove" in hint):
+        fixed, what = "", "Removed unused import"
+    elif bug_type == "SYNTAX":
+        fixed, what = missing_colon(line), "Added missing colon"
+        if fixed is None and line.split("#")[0].rstrip().endswith(":"):
+            return line, what
+    elif bug_type == "INDENTATION":
+        fixed, what = expand_indent(line, _tab_width(hint)), "Normalized indentation"
+        if fixed is None:
+            return line, what
+    elif bug_type == "IMPORT":
+        if "remove" in hint:
+            fixed, what = "", "Removed problematic import"
+        else:
+            fixed, what = absolute_import(line), "Converted to absolute import"
+    elif bug_type == "LOGIC":
+        fixed, what = comparison_fix(line), "Used == for comparison"
+    elif bug_type == "TYPE_ERROR":
+        fixed, what = concat_fix(line), "Converted operands to str before concatenation"
+    if fixed is None:
+        return None, f"Manual fix needed for {bug_type}"
+    return fixed, what
+
+def alternatives(line, bug_type):
+    """Every distinct deterministic rewrite of a line for a bug type, most likely first ("" removes the line)"""
+    stripped = line.lstrip(" \t")
+    indent = line[:len(line) - len(stripped)]
+    options = {
+        "LINTING": [""],
+        "SYNTAX": [missing_colon(line)],
+        "INDENTATION": [expand_indent(line), indent.expandtabs(8) + stripped if "\t" in indent else None],
+        "IMPORT": [absolute_import(line), ""],
+        "LOGIC": [comparison_fix(line)],
+        "TYPE_ERROR": [concat_fix(line)],
+    }.get(bug_type, [])
+    unique = []
+    for option in options:
+        if option is not None and option != line and option not in unique:
+            unique.append(option)
+    return unique
+
+def _string_lines(content):
+    """Line numbers inside multi-line strings, whose text must not be mistaken for code"""
+    inside = set()
+    try:
+        for t in tokenize.generate_tokens(io.StringIO(content).readline):
+            if t.type == tokenize.STRING and t.end[0] > t.start[0]:
+                inside.update(range(t.start[0] + 1, t.end[0] + 1))
+        return inside
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        pass
+    # Files that do not tokenize: track triple quotes line by line
+    open_quote = None
+    for n, line in enumerate(content.splitlines(), 1):
+        if open_quote:
+            inside.add(n)
+        for quote in ('"""', "'''"):
+            if line.count(quote) % 2 and open_quote in (None, quote):
+                open_quote = None if open_quote else quote
+    return inside
+
+# Modules imported for their side effects (registration, patching, REPL setup)
+SIDE_EFFECT_MODULES = {"readline", "rlcompleter", "site", "sitecustomize", "usercustomize", "this", "antigravity",
+                       "__hello__", "encodings", "mpl_toolkits", "gevent", "eventlet", "django", "pytest_asyncio"}
+IMPORT_ERRORS = {"ImportError", "ModuleNotFoundError", "Exception", "BaseException"}
+
+def _removable_imports(tree):
+    """
+    (line_number, name, module) of single-name, single-line imports that can be
+    deleted safely: not the only statement of their block (that would leave it
+    empty) and not inside a try whose handlers catch import errors (optional
+    dependencies and their fallbacks).
+    """
+    found = []
+    def guards(handler):
+        names = handler.type.elts if isinstance(handler.type, ast.Tuple) else [handler.type]
+        return handler.type is None or any(isinstance(n, ast.Name) and n.id in IMPORT_ERRORS for n in names)
+    def visit(body, guarded):
+        for node in body:
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                if guarded or len(body) == 1 or len(node.names) != 1 or node.lineno != getattr(node, "end_lineno", node.lineno):
+                    continue
+                alias = node.names[0]
+                module = alias.name if isinstance(node, ast.Import) else (node.module or "")
+                if alias.name == "*" or module == "__future__":
+                    continue
+                found.append((node.lineno, alias.asname or alias.name.split(".")[0], module))
+                continue
+            inner = guarded or isinstance(node, ast.Try) and any(guards(h) for h in node.handlers)
+            for field in ("body", "orelse", "finalbody"):
+                if isinstance(getattr(node, field, None), list):
+                    visit(getattr(node, field), inner if field == "body" else guarded)
+            for handler in getattr(node, "handlers", []):
+                visit(handler.body, inner)
+    visit(tree.body, False)
+    return found
+
+def _unused_imports(content, tree):
+    """(line_number, name) of removable import statements whose name is never used"""
+    if tree is None:
+        return _unused_imports_by_tokens(content)
+    used = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            used.add(node.id)
+        elif isinstance(node, ast.Constant) and isinstance(node.value, str):
+            # __all__ entries and string annotations
+            used.update(node.value.replace(".", " ").replace("[", " ").replace("]", " ").split())
+    lines = content.splitlines()
+    return [(n, name) for n, name, module in _removable_imports(tree)
+            if name not in used and module.split(".")[0] not in SIDE_EFFECT_MODULES and ";" not in lines[n - 1]]
+
+def _unused_imports_by_tokens(content):
+    """
+    _unused_imports for sources that do not parse: names are matched against
+    every other line's tokens, and only top-level imports (which never sit
+    alone in a block or inside a try) are considered
+    """
+    imported, used = [], set()
+    for n, line in enumerate(content.splitlines(), 1):
+        toks = _tokens(line) or []
+        words = [t.string for t in toks if t.type == tokenize.NAME]
+        simple = line[:1] not in (" ", "\t") and ";" not in line and "," not in line and "(" not in line and "*" not in line
+        if simple and words[:1] == ["import"] and len(words) > 1 and words[1] not in SIDE_EFFECT_MODULES:
+            imported.append((n, words[-1] if "as" in words else words[1]))
+        elif simple and words[:1] == ["from"] and "import" in words and words[1:2] != ["__future__"] and words[1] not in SIDE_EFFECT_MODULES:
+            imported.append((n, words[-1]))
+        else:
+            used.update(words)
+    return [(n, name) for n, name in imported if name not in used]
+
+def _str_names(tree):
+    """Names provably bound to strings (string literals, f-strings, str() calls, `: str` annotations)"""
+    names = set()
+    if tree is None:
+        return names
+    def is_str(value):
+        return (isinstance(value, ast.Constant) and isinstance(value.value, str) or isinstance(value, ast.JoinedStr)
+                or isinstance(value, ast.Call) and isinstance(value.func, ast.Name) and value.func.id == "str")
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and is_str(node.value):
+            names.update(t.id for t in node.targets if isinstance(t, ast.Name))
+        elif isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name) and isinstance(node.annotation, ast.Name) and node.annotation.id == "str":
+            names.add(node.target.id)
+        elif isinstance(node, ast.arg) and isinstance(node.annotation, ast.Name) and node.annotation.id == "str":
+            names.add(node.arg)
+    return names
+
+def _non_str_names(tree):
+    """Names only ever bound to numbers (numeric literals, int()/float()/len() and similar calls, `: int`/`: float`)"""
+    if tree is None:
+        return set()
+    numeric = {"int", "float", "len", "sum", "round", "abs", "min", "max", "bool", "complex"}
+    def is_number(value):
+        return (isinstance(value, ast.Constant) and isinstance(value.value, (int, float, complex))
+                or isinstance(value, ast.Call) and isinstance(value.func, ast.Name) and value.func.id in numeric)
+    bound, numbers = set(), set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign):
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    (numbers if is_number(node.value) else bound).add(target.id)
+        elif isinstance(node, (ast.AnnAssign, ast.arg)):
+            name = node.target.id if isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name) else getattr(node, "arg", None)
+            if name:
+                annotated = isinstance(node.annotation, ast.Name) and node.annotation.id in ("int", "float")
+                (numbers if annotated else bound).add(name)
+        elif isinstance(node, (ast.For, ast.comprehension)) or isinstance(node, ast.AugAssign):
+            bound.update(n.id for n in ast.walk(node.target) if isinstance(n, ast.Name))
+    return numbers - bound
+
+def detect_issues(content, path=None, failing_lines=()):
+    """
+    Every deterministically fixable issue in a Python source, as
+    {line_number, bug_type, description, fix_hint, original_line, fixed_line}.
+    `path` enables the relative-import rule (only outside packages). The
+    TYPE_ERROR rule only wraps provably non-str operands, except on
+    `failing_lines` (lines a failure points to), where any operand not
+    provably a str is wrapped.
+    """
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError):
+        tree = None
+    lines = content.splitlines()
+    in_strings = _string_lines(content)
+    issues = []
+
+    def add(n, bug_type, description, fixed):
+        issues.append({"line_number": n, "bug_type": bug_type, "description": description,
+                       "fix_hint": FIX_TEXT[bug_type], "original_line": lines[n - 1], "fixed_line": fixed})
+
+    if not (path and Path(path).name == "__init__.py"):
+        for n, name in _unused_imports(content, tree):
+            add(n, "LINTING", f"Unused import '{name}'", "")
+
+    # Files that compile indent consistently however they mix tabs; broken ones
+    # are re-indented as a whole so no line is left inconsistent with its block
+    if tree is None:
+        reindent = _reindent(content, in_strings)
+        if reindent:
+            width, fixed_lines = reindent
+            for n, fixed in fixed_lines.items():
+                add(n, "INDENTATION", f"Inconsistent tab indentation (tab width {width})", fixed)
+    in_package = bool(path) and (Path(path).parent / "__init__.py").exists()
+    str_names, non_str_names = _str_names(tree), _non_str_names(tree)
+    for n, line in enumerate(lines, 1):
+        if n in in_strings or not line.strip() or line.lstrip().startswith("#"):
+            continue
+        if tree is None:
+            fixed = missing_colon(line)
+            if fixed is not None:
+                add(n, "SYNTAX", "Missing colon", fixed)
+                line = fixed
+            fixed = comparison_fix(line)
+            if fixed is not None:
+                add(n, "LOGIC", "Assignment used as a comparison", fixed)
+        if path and not in_package:
+            fixed = absolute_import(line)
+            if fixed is not None:
+                add(n, "IMPORT", "Relative import outside a package", fixed)
+        fixed = concat_fix(line, skip=str_names) if n in failing_lines else concat_fix(line, skip=str_names, only=non_str_names)
+        if fixed is not None:
+            add(n, "TYPE_ERROR", "String concatenated with a non-string value", fixed)
+    return sorted(issues, key=lambda i: i["line_number"])
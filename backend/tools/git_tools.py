@@ -5,6 +5,8 @@ Git Tools — Branch creation, [AI-AGENT] commits, push safety
 import os, json
 from pathlib import Path
 from crewai.tools import tool
+from tools import fix_verify
+from tools.fix_engine import write_atomic
 
 _commit_count = 0
 _current_repo_path = ""
@@ -28,9 +30,26 @@ def create_branch_tool(repo_path: str, branch_name: str) -> str:
     except Exception as e:
         return json.dumps({"success": False, "error": str(e)})
 
+def _verify_worktree(repo, repo_path, files):
+    """Verify the modified Python files against HEAD, writing back any fixes reverted for breaking them"""
+    changed = [l.split("\t")[-1] for l in repo.git.diff("HEAD", "--name-status").splitlines() if l and l[0] == "M"]
+    if files:
+        wanted = {str(Path(f).resolve().relative_to(Path(repo_path).resolve())) if Path(f).is_absolute() else f for f in files}
+        changed = [rel for rel in changed if rel in wanted]
+    changed = [rel for rel in changed if rel.endswith(".py")]
+    if not changed:
+        return None
+    originals = {rel: (repo.head.commit.tree / rel).data_stream.read().decode("utf-8", errors="replace") for rel in changed}
+    fixed = {rel: (Path(repo_path) / rel).read_text(encoding="utf-8", errors="replace") for rel in changed}
+    result = fix_verify.verify_fixes(repo_path, originals, fixed)
+    for rel in changed:
+        if result["contents"][rel] != fixed[rel]:
+            write_atomic(Path(repo_path) / rel, result["contents"][rel])
+    return {k: result[k] for k in ("reverted", "errors", "seconds")}
+
 @tool("Commit and Push Fixes")
 def commit_and_push_tool(repo_path: str, files_changed: str, commit_message: str) -> str:
-    """Commit changes with [AI-AGENT] prefix and push to the current branch."""
+    """Commit changes with [AI-AGENT] prefix and push to the current branch. Modified Python files are compiled and import-checked first; fixes that break them are reverted and listed under verification."""
     import git
     global _commit_count
     try:
@@ -41,6 +60,7 @@ def commit_and_push_tool(repo_path: str, files_changed: str, commit_message: str
         if not commit_message.startswith("[AI-AGENT]"):
             commit_message = f"[AI-AGENT] {commit_message}"
         files = json.loads(files_changed) if isinstance(files_changed, str) else files_changed
+        verification = _verify_worktree(repo, repo_path, files) if fix_verify.enabled() else None
         if files:
             for f in files:
                 fp = str(Path(repo_path) / f) if not Path(f).is_absolute() else f
@@ -49,7 +69,7 @@ def commit_and_push_tool(repo_path: str, files_changed: str, commit_message: str
         else:
             repo.git.add("-A")
         if not repo.index.diff("HEAD") and not repo.untracked_files:
-            return json.dumps({"success": True, "message": "Nothing to commit"})
+            return json.dumps({"success": True, "message": "Nothing to commit", "verification": verification})
         cw = repo.config_writer()
         cw.set_value("user", "name", "RIFT AI Agent")
         cw.set_value("user", "email", "agent@rift2026.ai")
@@ -62,7 +82,7 @@ def commit_and_push_tool(repo_path: str, files_changed: str, commit_message: str
             origin.set_url(origin.url.replace("https://", f"https://{token}@"))
         push_info = origin.push(refspec=f"{current_branch}:{current_branch}", set_upstream=True)
         push_status = "failed" if any(i.flags & i.ERROR for i in push_info) else "success"
-        return json.dumps({"success": True, "commit_hash": commit.hexsha, "commit_message": commit_message, "branch": current_branch, "push_status": push_status, "total_commits_so_far": _commit_count})
+        return json.dumps({"success": True, "commit_hash": commit.hexsha, "commit_message": commit_message, "branch": current_branch, "push_status": push_status, "total_commits_so_far": _commit_count, "verification": verification})
     except Exception as e:
         return json.dumps({"success": False, "error": str(e)})
 
@@ -0,0 +1,114 @@
+"""
+Node Cache — Shared node_modules store and persistent Jest cache
+Each package-lock.json (or package.json without a lockfile) is installed once
+into a store entry named by its hash; checkouts get their node_modules as a
+hardlinked copy of that entry instead of running npm install. Jest's transform
+cache is kept per lockfile hash across runs.
+"""
+
+import os, errno, shutil, hashlib, subprocess
+from functools import lru_cache
+from pathlib import Path
+
+from tools.env_cache import CacheLock
+
+LOCKFILES = ["package-lock.json", "npm-shrinkwrap.json"]
+
+def store_root():
+    return Path(os.getenv("NODE_STORE_DIR", Path.home() / ".cache" / "rift" / "node_modules")).expanduser()
+
+def jest_cache_root():
+    return Path(os.getenv("JEST_CACHE_DIR", Path.home() / ".cache" / "rift" / "jest")).expanduser()
+
+@lru_cache(maxsize=1)
+def _node_version():
+    try:
+        return subprocess.run(["node", "--version"], capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.TimeoutExpired):
+        return ""
+
+def lock_hash(repo_path):
+    """Hash of the lockfile (package.json when there is none) and the node version"""
+    root = Path(repo_path)
+    digest = hashlib.sha256(_node_version().encode())
+    sources = [root / name for name in LOCKFILES if (root / name).is_file()] or [root / "package.json"]
+    for path in sources:
+        digest.update(path.name.encode() + b"\0" + path.read_bytes() + b"\0")
+    return digest.hexdigest()[:24]
+
+def _install(repo_path, entry, timeout):
+    """npm install the manifest into a staging dir, then move it into the store"""
+    root = Path(repo_path)
+    staging = entry.with_name(f".build-{entry.name}-{os.getpid()}")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    try:
+        for name in ["package.json", ".npmrc"] + LOCKFILES:
+            if (root / name).is_file():
+                shutil.copy2(root / name, staging / name)
+        has_lock = any((root / name).is_file() for name in LOCKFILES)
+        proc = subprocess.run(["npm", "ci" if has_lock else "install", "--no-audit", "--no-fund"],
+                              capture_output=True, text=True, cwd=staging, timeout=timeout)
+        if proc.returncode != 0:
+            raise RuntimeError(f"npm install failed: {(proc.stderr or proc.stdout)[-2000:]}")
+        os.rename(staging, entry)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+def _link_tree(src, dst):
+    """Copy a tree as hardlinks (plain copies across filesystems); symlinks are recreated"""
+    def link(s, d):
+        try:
+            os.link(s, d)
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                raise
+            shutil.copy2(s, d)
+    shutil.copytree(src, dst, symlinks=True, copy_function=link)
+
+def ensure_node_modules(repo_path, timeout=None):
+    """
+    Give the checkout a node_modules from the store, installing the store entry
+    on a miss. Falls back to a plain npm install when the store is disabled or fails.
+    """
+    root = Path(repo_path)
+    timeout = timeout or int(os.getenv("NPM_INSTALL_TIMEOUT", 300))
+    if (root / "node_modules").exists():
+        return
+    if os.getenv("NODE_STORE", "true").lower() == "true":
+        digest = lock_hash(repo_path)
+        entry = store_root() / digest
+        try:
+            store_root().mkdir(parents=True, exist_ok=True)
+            with CacheLock(digest, store_root()):
+                if (entry / "node_modules").is_dir():
+                    print(f"📦 node_modules store hit ({digest})")
+                else:
+                    print(f"📦 Installing node_modules into the store ({digest})...")
+                    _install(repo_path, entry, timeout)
+                os.utime(entry)
+                _link_tree(entry / "node_modules", root / "node_modules")
+        except Exception as e:
+            print(f"⚠️ node_modules store unavailable, running npm install: {e}")
+            shutil.rmtree(root / "node_modules", ignore_errors=True)
+        else:
+            evict(keep=digest)
+            return
+    subprocess.run(["npm", "install"], capture_output=True, cwd=repo_path, timeout=timeout)
+
+def evict(keep=None):
+    """Remove least recently used store entries beyond NODE_STORE_MAX_ENTRIES"""
+    max_entries = int(os.getenv("NODE_STORE_MAX_ENTRIES", 10))
+    entries = sorted((p for p in store_root().iterdir() if p.is_dir() and not p.name.startswith(".")),
+                     key=lambda p: p.stat().st_mtime, reverse=True)
+    for entry in entries[max_entries:]:
+        if entry.name != keep:
+            with CacheLock(entry.name, store_root()):
+                shutil.rmtree(entry, ignore_errors=True)
+
+def jest_cache_dir(repo_path):
+    """Persistent Jest cache directory shared by checkouts with the same lockfile"""
+    path = jest_cache_root() / lock_hash(repo_path)
+    path.mkdir(parents=True, exist_ok=True)
+    return str(path)
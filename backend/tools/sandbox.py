@@ -0,0 +1,200 @@
+"""
+Sandbox — Resource-governed execution of target-repo test processes
+Every test process starts in its own session with rlimits on CPU time,
+address space, open files and (optionally) process count. On timeout the
+whole process tree is killed, including descendants that started their own
+session, and each run reports its resource usage. Descendants are found by
+walking parent links in /proc, so a process that double-forks and is
+re-parented to init before a scan sees it escapes the sandbox (containing
+those needs a cgroup).
+
+Run as: python sandbox.py <limits_json> <command...> (applies the limits, then execs the command)
+"""
+
+import os, sys, json, time, signal, resource, threading, subprocess
+
+LIMITS = {
+    "cpu_seconds": resource.RLIMIT_CPU,
+    "memory_mb": resource.RLIMIT_AS,
+    "max_files": resource.RLIMIT_NOFILE,
+    "max_procs": resource.RLIMIT_NPROC,
+}
+
+def limits_from_env(memory=True):
+    """
+    Limits for one test process; 0 disables a limit. `memory=False` skips the
+    address-space cap for runtimes (Node/V8) that reserve huge virtual ranges.
+    SANDBOX_MAX_PROCS counts every process of the user, so it is off by default.
+    """
+    limits = {
+        "cpu_seconds": int(os.getenv("SANDBOX_CPU_SECONDS", 300)),
+        "memory_mb": int(os.getenv("SANDBOX_MEMORY_MB", 4096)) if memory else 0,
+        "max_files": int(os.getenv("SANDBOX_MAX_FILES", 1024)),
+        "max_procs": int(os.getenv("SANDBOX_MAX_PROCS", 0)),
+    }
+    return {name: value for name, value in limits.items() if value > 0}
+
+def apply_limits(limits):
+    """Lower this process's rlimits (a hard limit is never raised)"""
+    for name, value in limits.items():
+        which = LIMITS[name]
+        soft = value * 1024 * 1024 if name == "memory_mb" else value
+        _, hard = resource.getrlimit(which)
+        # CPU overruns get SIGXCPU at the soft limit and SIGKILL at the hard one
+        new_hard = soft + 5 if name == "cpu_seconds" else soft
+        if hard != resource.RLIM_INFINITY:
+            soft, new_hard = min(soft, hard), min(new_hard, hard)
+        try:
+            resource.setrlimit(which, (soft, new_hard))
+        except (ValueError, OSError):
+            pass
+
+def spawn(cmd, cwd, pass_fds=(), limits=None):
+    """
+    Start a test process as a session leader with `limits` applied. The
+    limits are set by this module run as a launcher that then execs `cmd`,
+    since a preexec_fn is unsafe to run in the forked child of a threaded process.
+    """
+    limits = limits_from_env() if limits is None else limits
+    if limits:
+        cmd = [sys.executable, os.path.abspath(__file__), json.dumps(limits)] + list(cmd)
+    return subprocess.Popen(
+        cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding="utf-8", errors="replace",
+        pass_fds=pass_fds, start_new_session=True,
+    )
+
+def _process_table():
+    """{pid: (ppid, start_time)} for every process, read from /proc"""
+    table = {}
+    for entry in os.listdir("/proc") if os.path.isdir("/proc") else []:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; the remaining fields follow its closing paren
+                fields = f.read().rsplit(")", 1)[1].split()
+            table[int(entry)] = (int(fields[1]), int(fields[19]))
+        except (OSError, IndexError, ValueError):
+            continue
+    return table
+
+def descendants(pid, table=None):
+    """{pid: start_time} of every live descendant of `pid`"""
+    table = table if table is not None else _process_table()
+    children = {}
+    for child, (ppid, _) in table.items():
+        children.setdefault(ppid, []).append(child)
+    found, stack = {}, [pid]
+    while stack:
+        for child in children.get(stack.pop(), []):
+            found[child] = table[child][1]
+            stack.append(child)
+    return found
+
+def _kill(pid):
+    for kill in (os.killpg, os.kill):
+        try:
+            kill(pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+def kill_known(processes):
+    """Kill previously seen descendants that are still the same processes (start time unchanged)"""
+    table = _process_table()
+    for pid, start_time in processes.items():
+        if pid in table and table[pid][1] == start_time:
+            _kill(pid)
+
+def kill_tree(pid):
+    """SIGKILL a process, its process group and its current descendants, even those in other sessions"""
+    # Collect first: once the root dies its children are re-parented and lost
+    tree = descendants(pid)
+    for target in [pid] + list(tree):
+        _kill(target)
+
+class TreeWatcher:
+    """
+    Records a process's descendants in the background, for processes we do
+    not wait on ourselves (e.g. warm worker children); `finish()` kills any
+    that are still alive. Ones re-parented away between two scans are missed.
+    """
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.seen = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+        self._thread.start()
+
+    def _watch(self):
+        interval = float(os.getenv("SANDBOX_SCAN_INTERVAL", 0.5))
+        while not self._stop.wait(interval):
+            self.seen.update(descendants(self.pid))
+
+    def finish(self):
+        self._stop.set()
+        self._thread.join()
+        kill_known(self.seen)
+
+def rusage_summary(usage, wall_seconds):
+    return {
+        "wall_seconds": round(wall_seconds, 3),
+        "cpu_user_seconds": round(usage.ru_utime, 3),
+        "cpu_system_seconds": round(usage.ru_stime, 3),
+        # ru_maxrss is in KiB on Linux
+        "max_rss_mb": round(usage.ru_maxrss / 1024, 1),
+    }
+
+def wait(proc, timeout, poll_interval=0.05):
+    """
+    Wait for a sandboxed process, killing its tree on timeout. Descendants
+    are tracked every SANDBOX_SCAN_INTERVAL while it runs, so ones that
+    escaped into their own session and outlived it are killed too, provided
+    a scan saw them before they were re-parented. Returns (timed_out, rusage) with the
+    resource usage of the process and the descendants it waited for.
+    """
+    started = time.monotonic()
+    deadline = started + timeout
+    scan_interval = float(os.getenv("SANDBOX_SCAN_INTERVAL", 0.5))
+    next_scan, seen = started, {}
+    timed_out = False
+    # WNOWAIT leaves the exited leader unreaped, so its PID/PGID cannot be reused yet
+    while os.waitid(os.P_PID, proc.pid, os.WEXITED | os.WNOHANG | os.WNOWAIT) is None:
+        now = time.monotonic()
+        if now >= deadline:
+            kill_tree(proc.pid)
+            timed_out = True
+            break
+        if now >= next_scan:
+            seen.update(descendants(proc.pid))
+            next_scan = now + scan_interval
+        time.sleep(poll_interval)
+    # Group members and tracked descendants that outlived the leader would keep running
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    kill_known(seen)
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return timed_out, rusage_summary(usage, time.monotonic() - started)
+
+def merge_rusage(usages):
+    """Combine the usage of concurrent runs: CPU adds up, wall time and RSS take the maximum"""
+    usages = [u for u in usages if u]
+    if not usages:
+        return None
+    return {
+        "wall_seconds": max(u["wall_seconds"] for u in usages),
+        "cpu_user_seconds": round(sum(u["cpu_user_seconds"] for u in usages), 3),
+        "cpu_system_seconds": round(sum(u["cpu_system_seconds"] for u in usages), 3),
+        "max_rss_mb": max(u["max_rss_mb"] for u in usages),
+    }
+
+if __name__ == "__main__":
+    apply_limits(json.loads(sys.argv[1]))
+    try:
+        os.execvp(sys.argv[2], sys.argv[2:])
+    except OSError as e:
+        print(f"ERROR: sandbox: cannot run {sys.argv[2]}: {e}", file=sys.stderr)
+        sys.exit(127)
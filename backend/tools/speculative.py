@@ -0,0 +1,171 @@
+"""
+Speculative Fixes — Verify alternative fixes concurrently in throwaway worktrees
+When a failure has several plausible fixes (rule alternatives, LLM samples),
+each candidate is applied in its own `git worktree` of the checkout's current
+state and the targeted tests run for all of them at once; the first candidate
+that passes is applied to the checkout. Losing candidates only cost their
+worktree, and the checkout itself is untouched until a winner is known.
+"""
+
+import os, time, shutil, tempfile, threading, subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from tools import fix_verify
+from tools.collection_cache import TEST_FILE_NAME
+from tools.fix_engine import apply_fixes, write_atomic
+from tools.fixers import alternatives
+from tools.test_impact import build_import_graph, dependents, snapshot_files
+from tools.test_tools import run_pytest_targets
+
+# `git worktree add/remove` update the repo's shared admin files
+_git_lock = threading.Lock()
+
+def enabled():
+    """SPECULATIVE_FIXES: verify candidates concurrently (off: one at a time, in order)"""
+    return os.getenv("SPECULATIVE_FIXES", "true").lower() == "true"
+
+def max_candidates():
+    return int(os.getenv("SPECULATIVE_MAX_CANDIDATES", 4))
+
+def _git(repo_path, *args):
+    return subprocess.run(["git", "-C", repo_path, "-c", "user.name=RIFT AI Agent", "-c", "user.email=agent@rift2026.ai", *args],
+                          capture_output=True, text=True, timeout=60, check=True).stdout.strip()
+
+def base_commit(repo_path):
+    """A commit of the checkout's tracked files, uncommitted edits included (untracked files are not carried over)"""
+    return _git(repo_path, "stash", "create") or _git(repo_path, "rev-parse", "HEAD")
+
+def add_worktree(repo_path, commit):
+    path = tempfile.mkdtemp(prefix="rift_spec_", dir=os.getenv("SPECULATIVE_DIR") or None)
+    with _git_lock:
+        _git(repo_path, "worktree", "add", "--detach", path, commit)
+    return path
+
+def remove_worktree(repo_path, path):
+    with _git_lock:
+        try:
+            _git(repo_path, "worktree", "remove", "--force", path)
+        except (subprocess.SubprocessError, OSError):
+            shutil.rmtree(path, ignore_errors=True)
+            subprocess.run(["git", "-C", repo_path, "worktree", "prune"], capture_output=True, timeout=60)
+
+def _relative(repo_path, file_path):
+    path = Path(file_path)
+    return path.resolve().relative_to(Path(repo_path).resolve()).as_posix() if path.is_absolute() else path.as_posix()
+
+def rule_candidates(repo_path, fix):
+    """One candidate per distinct rule rewrite of a fix dict's line (fixers.alternatives)"""
+    rel = _relative(repo_path, fix.get("file_path") or fix.get("file", ""))
+    line_number = int(fix.get("line_number", 0) or 0)
+    try:
+        lines = (Path(repo_path) / rel).read_text(encoding="utf-8", errors="replace").splitlines(keepends=True)
+    except OSError:
+        return []
+    if not 1 <= line_number <= len(lines):
+        return []
+    line = lines[line_number - 1]
+    ending = line[len(line.rstrip("\r\n")):]
+    candidates = []
+    for option in alternatives(line.rstrip("\r\n"), fix.get("bug_type", "")):
+        content = "".join(lines[:line_number - 1] + ([option + ending] if option else []) + lines[line_number:])
+        what = f"`{option.strip()}`" if option else "remove the line"
+        candidates.append({"description": f"{fix.get('bug_type', '')} on {rel}:{line_number}: {what}", "files": {rel: content}})
+    return candidates
+
+def _apply(repo_path, worktree, candidate):
+    """Apply a candidate ({files: {rel: content}} and/or {fixes: [fix dicts]}) in a worktree; returns (originals, changed)"""
+    root = Path(worktree)
+    fixes = [{**f, "file_path": str(root / _relative(repo_path, f.get("file_path") or f.get("file", "")))} for f in candidate.get("fixes") or []]
+    touched = {_relative(repo_path, rel) for rel in candidate.get("files") or {}} | {_relative(worktree, f["file_path"]) for f in fixes}
+    originals = {rel: (root / rel).read_text(encoding="utf-8", errors="replace") for rel in touched if (root / rel).is_file()}
+    for rel, content in (candidate.get("files") or {}).items():
+        path = root / _relative(repo_path, rel)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding="utf-8")
+    for summary in apply_fixes(fixes) if fixes else []:
+        if summary.get("error") or summary["manual"] or summary["stale"]:
+            raise ValueError(summary.get("error") or (summary["manual"] + summary["stale"])[0]["reason"])
+    changed = {}
+    for rel in touched:
+        content = (root / rel).read_text(encoding="utf-8", errors="replace")
+        if content != originals.get(rel):
+            changed[rel] = content
+    return originals, changed
+
+def _targets(worktree, changed, node_ids):
+    """The given node IDs, else every test file whose imports reach a changed file"""
+    if node_ids:
+        return list(node_ids)
+    snapshot = snapshot_files(worktree)
+    affected = dependents(build_import_graph(worktree, snapshot), set(changed))
+    return sorted(rel for rel in affected if TEST_FILE_NAME.match(Path(rel).name))
+
+def _verify(repo_path, commit, candidate, node_ids, won):
+    """Apply and test one candidate in its own worktree; returns (report, changed files or None)"""
+    if won.is_set():
+        return {"status": "skipped", "reason": "another candidate already passed"}, None
+    started, worktree = time.time(), None
+    try:
+        worktree = add_worktree(repo_path, commit)
+        originals, changed = _apply(repo_path, worktree, candidate)
+        if not changed:
+            return {"status": "rejected", "reason": "candidate changes nothing"}, None
+        check = fix_verify.verify_fixes(worktree, {rel: originals.get(rel, "") for rel in changed}, changed)
+        if check["reverted"]:
+            return {"status": "rejected", "reason": f"breaks the build: {check['reverted'][0]['reason']}"}, None
+        targets = _targets(worktree, changed, node_ids)
+        if not targets:
+            return {"status": "unverified", "reason": "no tests reach the changed files"}, None
+        result = run_pytest_targets(worktree, targets, warm=False)
+        passed = result["total"] > 0 and not result["failures"]
+        if passed:
+            won.set()
+        report = {"status": "passed" if passed else "failed", "tests": result["total"], "failures": len(result["failures"]),
+                  "seconds": round(time.time() - started, 3)}
+        if result["failures"]:
+            report["reason"] = (result["failures"][0].get("error_message") or "")[-300:]
+        return report, changed if passed else None
+    except (subprocess.SubprocessError, OSError, ValueError) as e:
+        return {"status": "error", "reason": str(e)}, None
+    finally:
+        if worktree:
+            remove_worktree(repo_path, worktree)
+
+def try_candidates(repo_path, candidates, node_ids=None, apply=True):
+    """
+    Verify fix candidates ({description, files?, fixes?}) against the targeted
+    tests, each in its own worktree; with SPECULATIVE_FIXES on they run
+    concurrently and the first to pass wins. The winner is written to the
+    checkout when `apply` is set. Returns {"winner", "files", "candidates",
+    "seconds"}; candidates still running when a winner is found are reported
+    as abandoned and cleaned up in the background.
+    """
+    started = time.time()
+    candidates = list(candidates)[:max_candidates()]
+    reports = [{"description": c.get("description", ""), "status": "abandoned"} for c in candidates]
+    if not candidates:
+        return {"winner": None, "files": [], "candidates": reports, "seconds": 0.0}
+    commit, won = base_commit(repo_path), threading.Event()
+    winner, files = None, []
+    pool = ThreadPoolExecutor(max_workers=len(candidates) if enabled() else 1)
+    futures = {pool.submit(_verify, repo_path, commit, c, node_ids, won): i for i, c in enumerate(candidates)}
+    try:
+        for future in as_completed(futures):
+            i = futures[future]
+            report, changed = future.result()
+            reports[i].update(report)
+            if changed is not None and winner is None:
+                winner, files = i, sorted(changed)
+                if apply:
+                    for rel, content in changed.items():
+                        path = Path(repo_path) / rel
+                        if path.is_file():
+                            write_atomic(path, content)
+                        else:
+                            path.parent.mkdir(parents=True, exist_ok=True)
+                            path.write_text(content, encoding="utf-8")
+                break
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return {"winner": winner, "files": files, "candidates": reports, "seconds": round(time.time() - started, 3)}
@@ -0,0 +1,107 @@
+"""
+Test History — Persistent per-test durations and outcomes
+Keyed by repository (its origin URL, so fresh clones share history) and test
+node ID. Used to run previously failing tests first, to balance shards by
+duration and to predict when the test stage will finish.
+"""
+
+import os, time, sqlite3, threading, subprocess
+from pathlib import Path
+
+# Weight of the newest run in the rolling duration average
+DURATION_ALPHA = 0.3
+
+# Per-process start-up time assumed when predicting a run
+PROCESS_OVERHEAD_SECONDS = 1.0
+
+def history_path():
+    return Path(os.getenv("TEST_HISTORY_DB", Path.home() / ".cache" / "rift" / "test_history.db")).expanduser()
+
+_conn = None
+_lock = threading.Lock()
+_repo_keys: dict[str, str] = {}
+
+def _db():
+    global _conn
+    if _conn is None:
+        path = history_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _conn = sqlite3.connect(str(path), check_same_thread=False, timeout=10)
+        _conn.execute("""
+            CREATE TABLE IF NOT EXISTS test_history (
+                repo TEXT NOT NULL,
+                node_id TEXT NOT NULL,
+                runs INTEGER NOT NULL DEFAULT 0,
+                failures INTEGER NOT NULL DEFAULT 0,
+                last_outcome TEXT,
+                avg_duration REAL NOT NULL DEFAULT 0,
+                last_run_at REAL,
+                PRIMARY KEY (repo, node_id)
+            )""")
+        _conn.commit()
+    return _conn
+
+def repo_key(repo_path):
+    """The checkout's origin URL (falls back to the path for repos without a remote)"""
+    if repo_path not in _repo_keys:
+        try:
+            url = subprocess.run(["git", "-C", repo_path, "config", "--get", "remote.origin.url"],
+                                 capture_output=True, text=True, timeout=10).stdout.strip()
+        except (OSError, subprocess.TimeoutExpired):
+            url = ""
+        # Never persist credentials embedded in clone URLs
+        _repo_keys[repo_path] = url.split("@")[-1] if "@" in url else (url or os.path.abspath(repo_path))
+    return _repo_keys[repo_path]
+
+def record_report(repo_path, report):
+    """Store the duration and outcome of every test in a pytest-json-report document"""
+    if not report or os.getenv("TEST_HISTORY", "true").lower() != "true":
+        return
+    repo, now = repo_key(repo_path), time.time()
+    rows = []
+    for t in report.get("tests", []):
+        duration = sum(t.get(stage, {}).get("duration", 0.0) for stage in ("setup", "call", "teardown"))
+        failed = t.get("outcome") in ("failed", "error")
+        rows.append((repo, t.get("nodeid", ""), int(failed), t.get("outcome"), duration, now))
+    with _lock:
+        db = _db()
+        db.executemany(f"""
+            INSERT INTO test_history (repo, node_id, runs, failures, last_outcome, avg_duration, last_run_at)
+            VALUES (?, ?, 1, ?, ?, ?, ?)
+            ON CONFLICT (repo, node_id) DO UPDATE SET
+                runs = runs + 1,
+                failures = failures + excluded.failures,
+                last_outcome = excluded.last_outcome,
+                avg_duration = avg_duration * {1 - DURATION_ALPHA} + excluded.avg_duration * {DURATION_ALPHA},
+                last_run_at = excluded.last_run_at
+            """, rows)
+        db.commit()
+
+def load(repo_path):
+    """{node_id: {"duration", "failure_rate", "last_failed"}} for the repo"""
+    if os.getenv("TEST_HISTORY", "true").lower() != "true":
+        return {}
+    with _lock:
+        rows = _db().execute(
+            "SELECT node_id, avg_duration, runs, failures, last_outcome FROM test_history WHERE repo = ?",
+            (repo_key(repo_path),),
+        ).fetchall()
+    return {
+        node_id: {"duration": duration, "failure_rate": failures / runs if runs else 0.0,
+                  "last_failed": outcome in ("failed", "error")}
+        for node_id, duration, runs, failures, outcome in rows
+    }
+
+def durations(history):
+    return {node_id: h["duration"] for node_id, h in history.items()}
+
+def last_failed(node_ids, history):
+    """The node IDs that failed in their previous run"""
+    return [n for n in node_ids if history.get(n, {}).get("last_failed")]
+
+def predict_seconds(groups, history):
+    """Predicted wall time of running `groups` of node IDs concurrently (slowest group wins)"""
+    known = [h["duration"] for h in history.values()]
+    default = sum(known) / len(known) if known else 0.5
+    loads = [sum(history[n]["duration"] if n in history else default for n in group) for group in groups]
+    return round(PROCESS_OVERHEAD_SECONDS + max(loads, default=0.0), 2)
@@ -0,0 +1,231 @@
+"""
+Test Impact — Select the tests affected by changes since the previous run
+Changed files are mapped to tests through the repo's static import graph.
+Later runs execute only affected and previously failing tests, with a full
+run every few iterations as a safety net.
+"""
+
+import os, ast, hashlib, threading
+from pathlib import Path
+
+EXCLUDED_DIRS = {".git", "__pycache__", ".pytest_cache", "node_modules", ".venv", "venv", ".tox"}
+
+# Changes to these can affect any test, so they force a full run
+GLOBAL_FILES = {"conftest.py", "pytest.ini", "setup.cfg", "setup.py", "pyproject.toml", "tox.ini", "requirements.txt"}
+
+JS_EXTENSIONS = (".js", ".jsx", ".ts", ".tsx", ".mjs", ".cjs")
+
+# JS files whose changes can affect any test
+JS_GLOBAL_FILES = {"package.json", "package-lock.json", "jest.config.js", "jest.config.ts", "jest.config.mjs",
+                   "babel.config.js", ".babelrc", "tsconfig.json", "jest.setup.js", "setupTests.js"}
+
+def snapshot_files(repo_path, extensions=(".py",), global_files=GLOBAL_FILES):
+    """Content hash of every source file and test config file, keyed by repo-relative path"""
+    root = Path(repo_path)
+    snapshot = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in EXCLUDED_DIRS]
+        for name in filenames:
+            if name.endswith(extensions) or name in global_files:
+                path = Path(dirpath) / name
+                try:
+                    snapshot[path.relative_to(root).as_posix()] = hashlib.sha1(path.read_bytes()).hexdigest()
+                except OSError:
+                    pass
+    return snapshot
+
+def changed_files(before, after):
+    return {p for p in set(before) | set(after) if before.get(p) != after.get(p)}
+
+def _module_names(rel_path):
+    """Dotted names a file may be imported as: every suffix of its package path (over-matching only selects more tests)"""
+    parts = rel_path[:-3].split("/")
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    return {".".join(parts[i:]) for i in range(len(parts))} if parts else set()
+
+def _imports(rel_path, source):
+    """Dotted module names imported by a file, with relative imports resolved"""
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return set()
+    package = rel_path[:-3].split("/")[:-1]
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = package[:len(package) - node.level + 1] if node.level else []
+            module = ".".join(base + ([node.module] if node.module else []))
+            if module:
+                names.add(module)
+            names.update(f"{module}.{alias.name}" if module else alias.name for alias in node.names)
+    return names
+
+def build_import_graph(repo_path, files, deleted=()):
+    """
+    Map each repo file to the repo files it imports. Imports of `deleted`
+    files (gone from `files`) are kept as edges, so their importers count as
+    dependents of the deletion.
+    """
+    root = Path(repo_path)
+    index = {}
+    for rel in list(files) + list(deleted):
+        if rel.endswith(".py"):
+            for name in _module_names(rel):
+                index.setdefault(name, set()).add(rel)
+    graph = {}
+    for rel in files:
+        if not rel.endswith(".py"):
+            continue
+        try:
+            source = (root / rel).read_text(encoding="utf-8", errors="replace")
+        except OSError:
+            continue
+        graph[rel] = {dep for name in _imports(rel, source) for dep in index.get(name, ()) if dep != rel}
+    return graph
+
+def dependents(graph, changed):
+    """Every file that is, or transitively imports, one of the changed files"""
+    importers = {}
+    for rel, deps in graph.items():
+        for dep in deps:
+            importers.setdefault(dep, set()).add(rel)
+    seen, stack = set(changed), list(changed)
+    while stack:
+        for rel in importers.get(stack.pop(), ()):
+            if rel not in seen:
+                seen.add(rel)
+                stack.append(rel)
+    return seen
+
+class TestImpactSelector:
+    """Per-checkout state between test runs: file hashes, known tests and the last outcome"""
+
+    def __init__(self, repo_path, full_every=None):
+        self.repo_path = repo_path
+        self.full_every = full_every or int(os.getenv("TEST_IMPACT_FULL_EVERY", 3))
+        self.snapshot = None
+        self.known_tests = set()
+        self.failing = set()
+        self.runs_since_full = 0
+
+    def select(self, node_ids):
+        """
+        Node IDs to run now, or None when a full run is due (first run, periodic
+        safety net, or a change to conftest/config files). Also returns the
+        reason, for the run output.
+        """
+        if self.snapshot is None:
+            return None, "first run"
+        if self.runs_since_full + 1 >= self.full_every:
+            return None, f"periodic, every {self.full_every} runs"
+        current = snapshot_files(self.repo_path)
+        changed = changed_files(self.snapshot, current)
+        if any(Path(p).name in GLOBAL_FILES for p in changed):
+            return None, "test configuration changed"
+        deleted = set(self.snapshot) - set(current)
+        affected = dependents(build_import_graph(self.repo_path, current, deleted), changed)
+        selected = [n for n in node_ids
+                    if n.split("::")[0] in affected or n in self.failing or n not in self.known_tests]
+        return selected, f"{len(changed)} changed files"
+
+    def record(self, node_ids, result, full):
+        """Remember the outcome of a run over `node_ids` (the whole suite when `full`)"""
+        self.snapshot = snapshot_files(self.repo_path)
+        self.known_tests.update(node_ids)
+        ran = set(node_ids)
+        failed = {f["test_name"] for f in result["failures"]}
+        self.failing = failed if full else (self.failing - ran) | failed
+        self.runs_since_full = 0 if full else self.runs_since_full + 1
+
+class JestImpactSelector:
+    """
+    Jest counterpart: Jest resolves the dependency graph itself, so this only
+    tracks which JS files changed and which test files failed, for --findRelatedTests
+    """
+
+    def __init__(self, repo_path, full_every=None):
+        self.repo_path = repo_path
+        self.full_every = full_every or int(os.getenv("TEST_IMPACT_FULL_EVERY", 3))
+        self.snapshot = None
+        self.failing_files = set()
+        self.last_total = 0
+        self.runs_since_full = 0
+
+    def _snapshot(self):
+        return snapshot_files(self.repo_path, JS_EXTENSIONS, JS_GLOBAL_FILES)
+
+    def select(self):
+        """Repo-relative paths to pass to --findRelatedTests, or None for a full run; plus the reason"""
+        if self.snapshot is None:
+            return None, "first run"
+        if self.runs_since_full + 1 >= self.full_every:
+            return None, f"periodic, every {self.full_every} runs"
+        changed = changed_files(self.snapshot, self._snapshot())
+        if any(Path(p).name in JS_GLOBAL_FILES for p in changed):
+            return None, "test configuration changed"
+        present = {p for p in changed if (Path(self.repo_path) / p).exists()}
+        if present != changed:
+            # --findRelatedTests cannot follow imports of a file that is gone
+            return None, "files deleted"
+        return sorted(present | self.failing_files), f"{len(changed)} changed files"
+
+    def record(self, result, full):
+        self.snapshot = self._snapshot()
+        root = Path(self.repo_path).resolve()
+        failed = set()
+        for f in result["failures"]:
+            try:
+                failed.add(Path(f["file"]).resolve().relative_to(root).as_posix())
+            except ValueError:
+                failed.add(f["file"])
+        # Previously failing files are always re-run, so this run's failures are the whole set
+        self.failing_files = failed
+        if full:
+            self.last_total = result["total"]
+        self.runs_since_full = 0 if full else self.runs_since_full + 1
+
+_selectors: dict[str, TestImpactSelector] = {}
+_jest_selectors: dict[str, JestImpactSelector] = {}
+_selectors_lock = threading.Lock()
+
+def _prune():
+    """Forget the selectors of checkouts that no longer exist"""
+    for selectors in (_selectors, _jest_selectors):
+        for path in [path for path in selectors if not os.path.isdir(path)]:
+            del selectors[path]
+
+def get_selector(repo_path):
+    with _selectors_lock:
+        _prune()
+        if repo_path not in _selectors:
+            _selectors[repo_path] = TestImpactSelector(repo_path)
+        return _selectors[repo_path]
+
+def get_jest_selector(repo_path):
+    with _selectors_lock:
+        _prune()
+        if repo_path not in _jest_selectors:
+            _jest_selectors[repo_path] = JestImpactSelector(repo_path)
+        return _jest_selectors[repo_path]
+
+def external_modules(repo_path, files=None):
+    """Top-level names the repo imports that are not its own modules (third-party and stdlib)"""
+    root = Path(repo_path)
+    files = files if files is not None else snapshot_files(repo_path)
+    own = {name for rel in files if rel.endswith(".py") for name in _module_names(rel)}
+    external = set()
+    for rel in files:
+        if not rel.endswith(".py"):
+            continue
+        try:
+            source = (root / rel).read_text(encoding="utf-8", errors="replace")
+        except OSError:
+            continue
+        for name in _imports(rel, source):
+            top = name.split(".")[0]
+            if top and name not in own and top not in own:
+                external.add(top)
+    return external
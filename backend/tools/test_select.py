@@ -0,0 +1,45 @@
+"""
+Test Select — Run pytest over node IDs read from a file
+Thousands of node IDs on the command line can exceed ARG_MAX, so only their
+files go on the command line and this plugin keeps the listed tests, in the
+listed order. Run as a script, this module stands in for `python -m pytest`
+(stdlib only, so it works in the target repo's interpreter).
+
+Run as: python test_select.py <node_ids_file> <pytest args...>
+"""
+
+import os, sys
+
+class NodeSelector:
+    """pytest plugin keeping only the given node IDs, in their given order"""
+
+    def __init__(self, node_ids):
+        self.order = {node_id: i for i, node_id in enumerate(node_ids)}
+
+    def pytest_collection_modifyitems(self, config, items):
+        deselected = [item for item in items if item.nodeid not in self.order]
+        if deselected:
+            config.hook.pytest_deselected(items=deselected)
+        items[:] = sorted((item for item in items if item.nodeid in self.order), key=lambda item: self.order[item.nodeid])
+
+def read_node_ids(path):
+    with open(path, encoding="utf-8") as f:
+        return [line for line in f.read().splitlines() if line]
+
+def write_node_ids(path, node_ids):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(node_ids) + "\n")
+
+def target_files(node_ids):
+    """The files holding `node_ids`, in first-seen order: the command-line targets"""
+    return list(dict.fromkeys(node_id.split("::")[0] for node_id in node_ids))
+
+def _main(node_ids_file, args):
+    import pytest
+    # Same import path as `python -m pytest`: the working directory, not this one
+    if sys.path and os.path.abspath(sys.path[0]) == os.path.dirname(os.path.abspath(__file__)):
+        sys.path[0] = os.getcwd()
+    return pytest.main(args, plugins=[NodeSelector(read_node_ids(node_ids_file))])
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1], sys.argv[2:]))
@@ -0,0 +1,191 @@
+"""
+Test Stream — Line-by-line test output handling
+Test processes are read as they run: an incremental parser turns output lines
+into failure records the moment they appear, live failures are pushed to the
+run's listener (the WebSocket), and the full output is spooled to a log file
+while only its head and tail are kept in memory for the result.
+"""
+
+import os, re, time, uuid, threading
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+
+from tools import sandbox
+
+# (pattern, source) checked in order against every output line
+LINE_PATTERNS = [
+    (re.compile(r'^(?:FAILED|ERROR) (\S+::\S+?)(?: - (.*))?$'), "pytest_summary"),
+    (re.compile(r'^(\S+::\S+.*?) (FAILED|ERROR)\b'), "pytest"),
+    (re.compile(r'^FAIL\s+(\S+)'), "jest_file"),
+    (re.compile(r'^\s*[✕×]\s+(.+?)(?: \(\d+ ms\))?$'), "jest"),
+    (re.compile(r'File "([^"]+)", line (\d+)'), "traceback"),
+    (re.compile(r'([\w/\\\.]+\.py):(\d+):\s*(.+)'), "lint"),
+]
+
+# Record sources that identify a failing test (as opposed to a location in one)
+TEST_SOURCES = {"pytest", "jest"}
+
+class TestOutputParser:
+    """
+    Incremental parser over test output. `feed(line)` returns the records the
+    line produced; state is a handful of fields, so memory does not grow
+    with the log.
+    """
+
+    def __init__(self):
+        self.jest_file = ""
+        self.failed_tests = 0
+
+    def feed(self, line):
+        line = line.rstrip("\n")
+        for pattern, source in LINE_PATTERNS:
+            m = pattern.search(line)
+            if not m:
+                continue
+            if source == "pytest_summary":
+                # The short summary repeats failures already seen in verbose output
+                return []
+            if source == "jest_file":
+                self.jest_file = m.group(1)
+                return []
+            if source == "pytest":
+                self.failed_tests += 1
+                return [{"file": m.group(1).split("::")[0], "test_name": m.group(1), "line": 0, "source": source}]
+            if source == "jest":
+                self.failed_tests += 1
+                return [{"file": self.jest_file, "test_name": m.group(1), "line": 0, "source": source}]
+            if source == "traceback":
+                return [{"file": m.group(1), "line": int(m.group(2)), "source": source}]
+            return [{"file": m.group(1), "line": int(m.group(2)), "error_message": m.group(3).strip(), "source": source}]
+        return []
+
+def parse_output(raw_output):
+    """All records in a complete output (the non-streaming entry point)"""
+    parser = TestOutputParser()
+    return [record for line in raw_output.splitlines() for record in parser.feed(line)]
+
+def output_dir():
+    return Path(os.getenv("TEST_OUTPUT_DIR", Path.home() / ".cache" / "rift" / "test_output")).expanduser()
+
+LOG_ID = re.compile(r'^[0-9a-f]{32}$')
+
+_last_prune = 0.0
+
+def _prune(directory):
+    """Delete spooled logs older than TEST_OUTPUT_RETENTION_HOURS (at most every few minutes)"""
+    global _last_prune
+    now = time.time()
+    if now - _last_prune < 300:
+        return
+    _last_prune = now
+    cutoff = now - float(os.getenv("TEST_OUTPUT_RETENTION_HOURS", 24)) * 3600
+    for path in directory.glob("*.log"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+        except OSError:
+            pass
+
+class OutputSink:
+    """
+    Receives a test process's lines: parses them, emits live failures, spools
+    everything to a log file and keeps only the first and last lines in memory.
+    """
+
+    def __init__(self, on_event=None):
+        self.parser = TestOutputParser()
+        self.head, self.head_max = [], int(os.getenv("TEST_OUTPUT_HEAD_LINES", 20))
+        self.tail = deque(maxlen=int(os.getenv("TEST_OUTPUT_TAIL_LINES", 80)))
+        self.lines = self.bytes = 0
+        self.on_event = on_event
+        # Failing tests seen in the output, for runs that die before writing a report
+        self.failures = deque(maxlen=1000)
+        self.log_id = uuid.uuid4().hex
+        try:
+            directory = output_dir()
+            directory.mkdir(parents=True, exist_ok=True)
+            _prune(directory)
+            self._spool = open(directory / f"{self.log_id}.log", "wb", buffering=64 * 1024)
+        except OSError as e:
+            print(f"⚠️ Cannot spool test output, keeping head/tail only: {e}")
+            self._spool = None
+
+    def __call__(self, line):
+        line = line.rstrip("\n")
+        self.lines += 1
+        if self._spool:
+            data = (line + "\n").encode("utf-8", "replace")
+            self._spool.write(data)
+            self.bytes += len(data)
+        if len(self.head) < self.head_max:
+            self.head.append(line)
+        else:
+            self.tail.append(line)
+        for record in self.parser.feed(line):
+            if record["source"] in TEST_SOURCES:
+                self.failures.append(record)
+                if self.on_event:
+                    self.on_event("TEST_FAILURE", {"failure": record})
+
+    def close(self):
+        """Finish the spooled log; returns its reference ({"id", "lines", "bytes"}) or None"""
+        if not self._spool:
+            return None
+        self._spool.close()
+        return {"id": self.log_id, "lines": self.lines, "bytes": self.bytes}
+
+    def text(self):
+        omitted = self.lines - len(self.head) - len(self.tail)
+        where = f"read them from test output log {self.log_id}" if self._spool else "not kept"
+        middle = [f"... {omitted} lines omitted ({where}) ..."] if omitted else []
+        lines = self.head + middle + list(self.tail)
+        return "\n".join(lines) + ("\n" if lines else "")
+
+def read_output(log_id, start=0, length=None):
+    """
+    Byte range [start, start + length) of a spooled test log, capped at
+    TEST_OUTPUT_READ_MAX bytes. Returns {"id", "start", "end", "size", "data"}.
+    """
+    if not LOG_ID.match(log_id or ""):
+        raise ValueError(f"Invalid test output log id: {log_id!r}")
+    max_length = int(os.getenv("TEST_OUTPUT_READ_MAX", 65536))
+    length = min(length or max_length, max_length)
+    path = output_dir() / f"{log_id}.log"
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        start = min(max(0, start), size)
+        f.seek(start)
+        data = f.read(length)
+    return {"id": log_id, "start": start, "end": start + len(data), "size": size,
+            "data": data.decode("utf-8", "replace")}
+
+def stream_process(proc, timeout, on_line):
+    """
+    Feed a sandboxed process's stdout to `on_line` as it is produced. On
+    timeout the whole process tree is killed. Returns (timed_out, rusage).
+    """
+    def pump():
+        for line in proc.stdout:
+            on_line(line)
+
+    reader = threading.Thread(target=pump, daemon=True)
+    reader.start()
+    timed_out, usage = sandbox.wait(proc, timeout)
+    reader.join(timeout=5)
+    return timed_out, usage
+
+_listener = threading.local()
+
+@contextmanager
+def test_events(on_event):
+    """Route live test events in this thread (TEST_FAILURE, TEST_ETA) to `on_event(event, data)`"""
+    previous = getattr(_listener, "callback", None)
+    _listener.callback = on_event
+    try:
+        yield
+    finally:
+        _listener.callback = previous
+
+def current_listener():
+    return getattr(_listener, "callback", None)
@@ -2,79 +2,466 @@
 Test Tools — Run pytest/jest, parse failures
 """
 
-import os, json, subprocess
+import os, re, json, heapq, shutil, tempfile, threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from datetime import datetime, timedelta
 from pathlib import Path
 from crewai.tools import tool
+from tools.env_cache import in_use, python_for
+from tools.node_cache import ensure_node_modules, jest_cache_dir
+from tools.test_impact import get_jest_selector, get_selector, snapshot_files
+from tools import collection_cache, fault_localization, sandbox, test_history, test_select, triage
+from tools.test_history import predict_seconds
+from tools.test_stream import OutputSink, current_listener, parse_output, read_output, stream_process, test_events
+from tools.test_worker import get_worker
 
 @tool("Run All Tests")
 def run_tests_tool(repo_path: str, test_files: str) -> str:
     """Run all tests in the repository using pytest for Python and jest for JavaScript."""
     try:
         repo = Path(repo_path)
-        all_failures, total_tests, total_passed, raw_outputs = [], 0, 0, []
+        all_failures, total_tests, total_passed, raw_outputs, usages, logs = [], 0, 0, [], [], []
 
         if any(repo.glob("**/*.py")):
             r = run_pytest(repo_path)
-            all_failures.extend(r["failures"]); total_tests += r["total"]; total_passed += r["passed"]; raw_outputs.append(r["raw"])
+            all_failures.extend(r["failures"]); total_tests += r["total"]; total_passed += r["passed"]; raw_outputs.append(r["raw"]); usages.append(r.get("rusage")); logs.extend(r.get("logs", []))
 
         if (repo / "package.json").exists():
             r = run_jest(repo_path)
-            all_failures.extend(r["failures"]); total_tests += r["total"]; total_passed += r["passed"]; raw_outputs.append(r["raw"])
+            all_failures.extend(r["failures"]); total_tests += r["total"]; total_passed += r["passed"]; raw_outputs.append(r["raw"]); usages.append(r.get("rusage")); logs.extend(r.get("logs", []))
 
-        return json.dumps({"success": True, "total_tests": total_tests, "total_failures": len(all_failures), "total_passed": total_passed, "failures": all_failures, "raw_output": "\n\n".join(raw_outputs)})
+        # Failures sharing a root cause are classified and passed on once
+        clusters = triage.cluster_failures(all_failures)
+        suspicious = localize_pytest_failures(repo_path, clusters)
+        return json.dumps({"success": True, "total_tests": total_tests, "total_failures": len(all_failures), "total_clusters": len(clusters), "total_passed": total_passed, "failures": triage.representatives(clusters), "raw_output": "\n\n".join(raw_outputs), "output_logs": logs, "rusage": sandbox.merge_rusage(usages), "fault_localization": suspicious})
     except Exception as e:
         return json.dumps({"success": False, "error": str(e)})
 
-def run_pytest(repo_path):
-    timeout = int(os.getenv("SANDBOX_TIMEOUT", 60))
-    cmd = ["python", "-m", "pytest", "--tb=short", "-v", "--json-report", "--json-report-file=/tmp/pytest_report.json", repo_path]
+@tool("Read Test Output")
+def read_test_output_tool(log_id: str, start: int = 0, length: int = 16000) -> str:
+    """Read a byte range of a full test output log (raw_output is only its head and tail; ids are in output_logs)."""
     try:
-        proc = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout, cwd=repo_path)
-        raw = proc.stdout + proc.stderr
-        failures, total, passed = [], 0, 0
-        rp = Path("/tmp/pytest_report.json")
-        if rp.exists():
-            report = json.loads(rp.read_text())
-            total = report.get("summary", {}).get("total", 0)
-            passed = report.get("summary", {}).get("passed", 0)
-            for t in report.get("tests", []):
-                if t.get("outcome") == "failed":
-                    import re
-                    lr = t.get("call", {}).get("longrepr", "")
-                    m = re.findall(r'line (\d+)', lr)
-                    failures.append({"file": t.get("nodeid","").split("::")[0], "test_name": t.get("nodeid",""), "line": int(m[-1]) if m else 0, "error_message": lr})
-        return {"failures": failures, "total": total, "passed": passed, "raw": raw}
-    except subprocess.TimeoutExpired:
-        return {"failures": [], "total": 0, "passed": 0, "raw": "ERROR: pytest timed out"}
+        return json.dumps(read_output(log_id, int(start), int(length)))
+    except (ValueError, OSError) as e:
+        return json.dumps({"error": str(e)})
 
-def run_jest(repo_path):
+def _read_fd(fd, sink):
+    with os.fdopen(fd, "rb") as f:
+        sink.append(f.read())
+
+def parse_pytest_report(report):
+    """Convert a pytest-json-report document to our {failures, total, passed} shape"""
+    failures = []
+    for t in report.get("tests", []):
+        if t.get("outcome") == "failed":
+            lr = t.get("call", {}).get("longrepr", "")
+            m = re.findall(r'line (\d+)', lr)
+            failures.append({"file": t.get("nodeid","").split("::")[0], "test_name": t.get("nodeid",""), "line": int(m[-1]) if m else 0, "error_message": lr})
+    # Modules that failed to import never produce tests, only collection errors
+    for c in report.get("collectors", []):
+        if c.get("outcome") == "failed" and c.get("nodeid"):
+            lr = c.get("longrepr", "")
+            m = re.findall(r'line (\d+)', lr)
+            failures.append({"file": c["nodeid"].split("::")[0], "test_name": c["nodeid"], "line": int(m[-1]) if m else 0, "error_message": lr})
+    summary = report.get("summary", {})
+    return {"failures": failures, "total": summary.get("total", 0), "passed": summary.get("passed", 0)}
+
+def _run_with_private_report(build_cmd, cwd, timeout, on_line, pipe=True, limits=None):
+    """
+    Run a test command in the sandbox, streaming its output lines to
+    `on_line`. `build_cmd(report_path)` returns the command line. The report
+    path is private to this invocation - a pipe when `pipe` is set (and /dev/fd
+    exists), otherwise a file in a fresh temp dir - so concurrent runs cannot
+    overwrite each other's reports and a stale report is never read.
+    Returns (report_bytes, timed_out, rusage).
+    """
+    if not pipe or not os.path.isdir("/dev/fd"):
+        report_dir = tempfile.mkdtemp(prefix="rift_report_")
+        report_path = os.path.join(report_dir, "report.json")
+        try:
+            cmd = build_cmd(report_path)
+            with in_use(cmd[0]):
+                timed_out, usage = stream_process(sandbox.spawn(cmd, cwd, limits=limits), timeout, on_line)
+            data = Path(report_path).read_bytes() if os.path.exists(report_path) else b""
+            return data, timed_out, usage
+        finally:
+            shutil.rmtree(report_dir, ignore_errors=True)
+
+    report_r, report_w = os.pipe()
+    chunks = []
+    reader = threading.Thread(target=_read_fd, args=(report_r, chunks), daemon=True)
+    with ExitStack() as stack:
+        try:
+            cmd = build_cmd(f"/dev/fd/{report_w}")
+            stack.enter_context(in_use(cmd[0]))
+            proc = sandbox.spawn(cmd, cwd, pass_fds=(report_w,), limits=limits)
+        except Exception:
+            os.close(report_r)
+            raise
+        finally:
+            os.close(report_w)
+        reader.start()
+        timed_out, usage = stream_process(proc, timeout, on_line)
+    reader.join(timeout=5)
+    return b"".join(chunks), timed_out, usage
+
+def fail_fast_limit():
+    """TEST_FAIL_FAST: stop a test process after this many failures (0 = run everything)"""
+    return int(os.getenv("TEST_FAIL_FAST", 0))
+
+def shard_fail_fast_limit(shards):
+    """Each shard's share of TEST_FAIL_FAST, so all shards together stop near the limit"""
+    limit = fail_fast_limit()
+    return -(-limit // shards) if limit else 0
+
+def _pytest_args(repo_path, args, maxfail=None):
+    limit = fail_fast_limit() if maxfail is None else maxfail
+    return ["--tb=short", "-v", f"--rootdir={repo_path}"] + ([f"--maxfail={limit}"] if limit else []) + list(args)
+
+def _pytest_cmd(repo_path, report, args, node_ids_file=None, maxfail=None):
+    runner = [os.path.abspath(test_select.__file__), node_ids_file] if node_ids_file else ["-m", "pytest"]
+    return [python_for(repo_path)] + runner + _pytest_args(repo_path, args, maxfail) + ["--json-report", f"--json-report-file={report}"]
+
+def _run_in_worker(repo_path, args, timeout, on_line, plain=False, node_ids_file=None, maxfail=None):
+    """Run through the workspace's warm worker (PYTEST_WARM_WORKER); None when it cannot be used"""
+    if os.getenv("PYTEST_WARM_WORKER", "true").lower() != "true":
+        return None
+    try:
+        return get_worker(repo_path, python_for(repo_path)).run(args if plain else _pytest_args(repo_path, args, maxfail), timeout, on_line,
+                                                                sandbox.limits_from_env(), node_ids_file)
+    except Exception as e:
+        print(f"⚠️ Warm test worker unavailable, running pytest directly: {e}")
+        return None
+
+def _run_pytest_once(repo_path, args, timeout, warm=True, node_ids=None, maxfail=None):
+    """
+    One pytest invocation over `args`; returns (result, report) where report is
+    the raw JSON document or None. Failures are pushed to the thread's test
+    event listener as their lines are printed. `warm=False` skips the warm
+    worker (for short-lived checkouts that would only leave an idle server).
+    `node_ids` run in the given order; they are passed in a file (test_select),
+    never on the command line, which only gets their files. `maxfail`
+    overrides TEST_FAIL_FAST for this invocation.
+    """
+    sink = OutputSink(current_listener())
+    ids_dir = node_ids_file = None
+    if node_ids:
+        ids_dir = tempfile.mkdtemp(prefix="rift_select_")
+        node_ids_file = os.path.join(ids_dir, "node_ids.txt")
+        test_select.write_node_ids(node_ids_file, node_ids)
+        args = list(args) + test_select.target_files(node_ids)
+    try:
+        warm = _run_in_worker(repo_path, args, timeout, sink, node_ids_file=node_ids_file, maxfail=maxfail) if warm else None
+        if warm is not None:
+            report, timed_out, usage = warm
+        else:
+            data, timed_out, usage = _run_with_private_report(lambda path: _pytest_cmd(repo_path, path, args, node_ids_file, maxfail), repo_path, timeout, sink)
+            report = None
+            if data:
+                try:
+                    report = json.loads(data)
+                except json.JSONDecodeError:
+                    pass
+    finally:
+        if ids_dir:
+            shutil.rmtree(ids_dir, ignore_errors=True)
+    log = sink.close()
+    logs = [log] if log else []
+    if timed_out:
+        return {"failures": [], "total": 0, "passed": 0, "raw": "ERROR: pytest timed out\n" + sink.text(), "rusage": usage, "logs": logs}, None
+    if report:
+        result = parse_pytest_report(report)
+        result["raw"] = sink.text()
+    else:
+        # Killed (e.g. by a sandbox limit) or crashed: keep the failures it printed
+        result = {"failures": [{**f, "error_message": ""} for f in sink.failures], "total": 0, "passed": 0,
+                  "raw": "ERROR: pytest exited without a report (crash or resource limit)\n" + sink.text()}
+    result["rusage"] = usage
+    result["logs"] = logs
+    return result, report
+
+def run_pytest_targets(repo_path, targets, warm=True):
+    """One pytest run over explicit targets (node IDs or files), without collection, test impact or history"""
+    result, _ = _run_pytest_once(repo_path, list(targets), int(os.getenv("SANDBOX_TIMEOUT", 60)), warm)
+    return result
+
+def _collect(repo_path, targets, timeout):
+    """
+    One --collect-only pass over `targets`. Returns (node_ids, markers, modules),
+    markers being None when not reported, or None when collection fails.
+    """
+    args = ["--collect-only", "-q", f"--rootdir={repo_path}"] + list(targets)
+    node_ids = []
+
+    def on_line(line):
+        if "::" in line and not line.startswith(" "):
+            node_ids.append(line.strip())
+
+    warm = _run_in_worker(repo_path, args, timeout, on_line, plain=True)
+    if warm is not None:
+        report, timed_out, _ = warm
+    else:
+        build_cmd = lambda path: [python_for(repo_path), "-m", "pytest"] + args + ["--json-report", f"--json-report-file={path}"]
+        data, timed_out, _ = _run_with_private_report(build_cmd, repo_path, timeout, on_line)
+        try:
+            report = json.loads(data) if data else None
+        except json.JSONDecodeError:
+            report = None
+    # Exit code 5: no tests in the targets, which is a valid (empty) collection
+    if timed_out or not report or report.get("exitcode") not in (0, 5):
+        return None
+    modules = [c["nodeid"] for c in report.get("collectors", [])
+               if c.get("nodeid", "").endswith(".py") and "::" not in c["nodeid"]]
+    return node_ids, report.get("markers"), modules
+
+def collect_pytest_ids(repo_path, timeout=None):
+    """
+    Collect test node IDs without running them. Returns None when collection
+    fails. With COLLECTION_CACHE on, only test files whose cache key changed
+    are collected; the rest come from the cache.
+    """
+    timeout = timeout or int(os.getenv("SANDBOX_TIMEOUT", 60))
+    if not collection_cache.enabled():
+        collected = _collect(repo_path, [repo_path], timeout)
+        return collected[0] if collected else None
+
+    snapshot = snapshot_files(repo_path)
+    entries = collection_cache.load(repo_path)
+    keys = collection_cache.file_keys(repo_path, snapshot, extra=set(entries))
+    if keys is None:
+        collected = _collect(repo_path, [repo_path], timeout)
+        return collected[0] if collected else None
+    stale = collection_cache.stale_files(entries, keys)
+    full = not entries or not set(entries) & set(keys)
+    if not full and not stale:
+        print(f"📋 Test collection cache hit ({len(entries)} files)")
+        return collection_cache.node_ids({rel: e for rel, e in entries.items() if rel in keys})
+    targets = [repo_path] if full else [os.path.join(repo_path, rel) for rel in stale]
+    collected = _collect(repo_path, targets, timeout)
+    if collected is None:
+        return None
+    ids, markers, modules = collected
+    if full:
+        # Files collected without pytest's default names (e.g. doctest modules) are cached too
+        keys = collection_cache.file_keys(repo_path, snapshot, extra=set(modules))
+    else:
+        print(f"📋 Test collection cache: recollected {len(stale)}/{len(keys)} files")
+    entries = collection_cache.update(entries, keys, ids, markers, modules, None if full else stale)
+    collection_cache.save(repo_path, entries)
+    return collection_cache.node_ids(entries)
+
+def partition_tests(node_ids, shards, durations=None, first=()):
+    """
+    Split node IDs into `shards` groups of roughly equal total duration:
+    longest first, each onto the currently lightest shard. Tests without
+    history are assumed to take the mean known duration. Tests in `first`
+    (e.g. those that failed last time) are spread over the shards before the
+    rest, and their files run first within each shard.
+    """
+    durations = durations or {}
+    first = set(first)
+    known = [durations[n] for n in node_ids if n in durations]
+    default = sum(known) / len(known) if known else 1.0
+    weighted = sorted(node_ids, key=lambda n: (n not in first, -durations.get(n, default)))
+    heap = [(0.0, i) for i in range(shards)]
+    groups = [[] for _ in range(shards)]
+    for node_id in weighted:
+        load, i = heapq.heappop(heap)
+        groups[i].append(node_id)
+        heapq.heappush(heap, (load + durations.get(node_id, default), i))
+    # Each shard comes back in collection order within each file, keeping
+    # module/class fixtures together
+    order = {n: i for i, n in enumerate(node_ids)}
+    leading = {n.split("::")[0] for n in first}
+    return [sorted(g, key=lambda n: (n.split("::")[0] not in leading, order[n])) for g in groups if g]
+
+def pytest_shard_count(num_tests):
+    """Shards to use for a suite of `num_tests` (PYTEST_SHARDS=auto scales with CPU count)"""
+    setting = os.getenv("PYTEST_SHARDS", "auto").strip().lower()
+    per_shard = max(1, int(os.getenv("PYTEST_MIN_TESTS_PER_SHARD", 10)))
+    shards = (os.cpu_count() or 1) if setting == "auto" else int(setting)
+    return max(1, min(shards, num_tests // per_shard))
+
+def merge_pytest_results(results):
+    """Merge per-shard results into one {failures, total, passed, raw}"""
+    merged = {"failures": [], "total": 0, "passed": 0, "raw": ""}
+    raws = []
+    for i, r in enumerate(results):
+        merged["failures"].extend(r["failures"]); merged["total"] += r["total"]; merged["passed"] += r["passed"]
+        raws.append(f"===== shard {i + 1}/{len(results)} =====\n{r['raw']}")
+    merged["raw"] = "\n\n".join(raws)
+    merged["rusage"] = sandbox.merge_rusage([r.get("rusage") for r in results])
+    merged["logs"] = [log for r in results for log in r.get("logs", [])]
+    return merged
+
+def _publish_eta(groups, history):
+    listener = current_listener()
+    if not listener:
+        return
+    seconds = predict_seconds(groups, history)
+    listener("TEST_ETA", {"test_eta": {
+        "tests": sum(len(g) for g in groups),
+        "processes": len(groups),
+        "predicted_seconds": seconds,
+        "predicted_finish": (datetime.utcnow() + timedelta(seconds=seconds)).isoformat(),
+    }})
+
+def run_pytest_sharded(repo_path, node_ids, shards, extra_args=None, history=None):
+    """Run the collected node IDs across `shards` concurrent pytest processes"""
     timeout = int(os.getenv("SANDBOX_TIMEOUT", 60))
-    if not (Path(repo_path) / "node_modules").exists():
-        subprocess.run(["npm", "install"], capture_output=True, cwd=repo_path, timeout=120)
+    history = history if history is not None else test_history.load(repo_path)
+    groups = partition_tests(node_ids, shards, test_history.durations(history), test_history.last_failed(node_ids, history))
+    _publish_eta(groups, history)
+    listener = current_listener()
+    maxfail = shard_fail_fast_limit(len(groups))
+
+    def run_shard(group):
+        # Shards run on pool threads; keep forwarding live events to this run
+        with test_events(listener):
+            result, report = _run_pytest_once(repo_path, list(extra_args or []), timeout, node_ids=group, maxfail=maxfail)
+        test_history.record_report(repo_path, report)
+        return result
+
+    with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+        return merge_pytest_results(list(pool.map(run_shard, groups)))
+
+def _run_node_ids(repo_path, node_ids, extra_args=None):
+    """
+    Run specific collected tests, previously failing ones first, sharded when
+    there are enough of them
+    """
+    history = test_history.load(repo_path)
+    shards = pytest_shard_count(len(node_ids))
+    if shards > 1:
+        return run_pytest_sharded(repo_path, node_ids, shards, extra_args, history)
+    ordered = partition_tests(node_ids, 1, test_history.durations(history), test_history.last_failed(node_ids, history))[0]
+    _publish_eta([ordered], history)
+    result, report = _run_pytest_once(repo_path, list(extra_args or []), int(os.getenv("SANDBOX_TIMEOUT", 60)), node_ids=ordered)
+    test_history.record_report(repo_path, report)
+    return result
+
+def run_pytest(repo_path, extra_args=None):
+    """
+    Run the repo's pytest suite. Tests are collected once; with TEST_IMPACT on,
+    repeat runs on the same checkout execute only the tests affected by files
+    changed since the previous run (plus failing and new tests), with a periodic
+    full run. Unselected tests passed last time and are counted as passed.
+    Large selections run in parallel shards. When collection fails a single
+    plain run reports the errors.
+    """
+    node_ids = collect_pytest_ids(repo_path)
+    if not node_ids:
+        result, report = _run_pytest_once(repo_path, list(extra_args or []) + [repo_path], int(os.getenv("SANDBOX_TIMEOUT", 60)))
+        test_history.record_report(repo_path, report)
+        return result
+
+    if os.getenv("TEST_IMPACT", "true").lower() != "true":
+        return _run_node_ids(repo_path, node_ids, extra_args)
+
+    selector = get_selector(repo_path)
+    selected, reason = selector.select(node_ids)
+    if selected is None:
+        result = _run_node_ids(repo_path, node_ids, extra_args)
+        selector.record(node_ids, result, full=True)
+        result["raw"] = f"Test impact: full run ({reason})\n" + result["raw"]
+        return result
+
+    carried = len(node_ids) - len(selected)
+    if selected:
+        result = _run_node_ids(repo_path, selected, extra_args)
+    else:
+        result = {"failures": [], "total": 0, "passed": 0, "raw": ""}
+    selector.record(selected, result, full=False)
+    result["total"] += carried
+    result["passed"] += carried
+    result["raw"] = f"Test impact: ran {len(selected)}/{len(node_ids)} tests ({reason}); {carried} unaffected tests carried over as passed\n" + result["raw"]
+    return result
+
+def localize_pytest_failures(repo_path, clusters):
+    """
+    Rank suspicious regions for failing pytest tests in LOGIC or TYPE_ERROR
+    clusters, which the analyzers cannot locate (FAULT_LOCALIZATION). None
+    when disabled or there is nothing to rank.
+    """
+    failed = fault_localization.failed_tests(clusters)
+    if not failed or not fault_localization.enabled():
+        return None
     try:
-        proc = subprocess.run(["npm", "test", "--", "--json", "--no-coverage"], capture_output=True, text=True, timeout=timeout, cwd=repo_path)
-        failures, total, passed = [], 0, 0
+        result = fault_localization.localize(repo_path, collect_pytest_ids(repo_path) or failed, failed)
+    except Exception as e:
+        print(f"⚠️ Fault localization failed: {e}")
+        return None
+    print(f"🎯 Fault localization: {len(result['regions'])} suspicious regions from {result['tests_run']} tests")
+    return result
+
+def parse_jest_report(report):
+    """Convert a Jest --json document to our {failures, total, passed} shape"""
+    failures = []
+    for suite in report.get("testResults", []):
+        for t in suite.get("testResults", []):
+            if t.get("status") == "failed":
+                failures.append({"file": suite.get("testFilePath",""), "test_name": t.get("fullName",""), "line": 0, "error_message": "\n".join(t.get("failureMessages",[]))})
+    return {"failures": failures, "total": report.get("numTotalTests", 0), "passed": report.get("numPassedTests", 0)}
+
+def _run_jest_once(repo_path, jest_args, timeout):
+    limit = fail_fast_limit()
+    bail = [f"--bail={limit}"] if limit else []
+    build_cmd = lambda report: ["npm", "test", "--", "--json", f"--outputFile={report}", "--no-coverage"] + bail + list(jest_args)
+    sink = OutputSink(current_listener())
+    # npm does not reliably pass extra descriptors down to jest, so use a private file;
+    # V8 reserves far more address space than it uses, so no memory cap for node
+    data, timed_out, usage = _run_with_private_report(build_cmd, repo_path, timeout, sink, pipe=False,
+                                                      limits=sandbox.limits_from_env(memory=False))
+    log = sink.close()
+    logs = [log] if log else []
+    if timed_out:
+        return {"failures": [], "total": 0, "passed": 0, "raw": "ERROR: jest timed out\n" + sink.text(), "rusage": usage, "logs": logs}
+    result = {"failures": [], "total": 0, "passed": 0}
+    if data:
         try:
-            report = json.loads(proc.stdout)
-            total = report.get("numTotalTests", 0)
-            passed = report.get("numPassedTests", 0)
-            for suite in report.get("testResults", []):
-                for t in suite.get("testResults", []):
-                    if t.get("status") == "failed":
-                        failures.append({"file": suite.get("testFilePath",""), "test_name": t.get("fullName",""), "line": 0, "error_message": "\n".join(t.get("failureMessages",[]))})
+            result = parse_jest_report(json.loads(data))
         except json.JSONDecodeError:
             pass
-        return {"failures": failures, "total": total, "passed": passed, "raw": proc.stdout + proc.stderr}
-    except subprocess.TimeoutExpired:
-        return {"failures": [], "total": 0, "passed": 0, "raw": "ERROR: jest timed out"}
+    result["raw"] = sink.text()
+    result["rusage"] = usage
+    result["logs"] = logs
+    return result
+
+def run_jest(repo_path):
+    """
+    Run the repo's Jest suite. node_modules comes from the shared store and
+    Jest's transform cache persists across runs. With TEST_IMPACT on, repeat
+    runs pass the changed files and previously failing test files to
+    --findRelatedTests; unaffected tests passed last time and count as passed.
+    """
+    timeout = int(os.getenv("SANDBOX_TIMEOUT", 60))
+    ensure_node_modules(repo_path)
+    jest_args = [f"--cacheDirectory={jest_cache_dir(repo_path)}"]
+    if os.getenv("TEST_IMPACT", "true").lower() != "true":
+        return _run_jest_once(repo_path, jest_args, timeout)
+
+    selector = get_jest_selector(repo_path)
+    paths, reason = selector.select()
+    if paths is None:
+        result = _run_jest_once(repo_path, jest_args, timeout)
+        selector.record(result, full=True)
+        result["raw"] = f"Test impact: full run ({reason})\n" + result["raw"]
+        return result
+
+    if paths:
+        result = _run_jest_once(repo_path, jest_args + ["--findRelatedTests"] + paths, timeout)
+    else:
+        result = {"failures": [], "total": 0, "passed": 0, "raw": ""}
+    selector.record(result, full=False)
+    carried = max(0, selector.last_total - result["total"])
+    result["total"] += carried
+    result["passed"] += carried
+    result["raw"] = f"Test impact: ran tests related to {len(paths)} files ({reason}); {carried} unaffected tests carried over as passed\n" + result["raw"]
+    return result
 
 @tool("Parse Test Failures")
 def parse_test_failures_tool(raw_output: str) -> str:
     """Parse test output to extract file names, line numbers, and error messages."""
-    import re
-    failures = []
-    for m in re.finditer(r'File "([^"]+)", line (\d+)', raw_output):
-        failures.append({"file": m.group(1), "line": int(m.group(2)), "source": "traceback"})
-    for m in re.finditer(r'([\w/\\\.]+\.py):(\d+):\s*(.+)', raw_output):
-        failures.append({"file": m.group(1), "line": int(m.group(2)), "error_message": m.group(3).strip(), "source": "lint"})
-    return json.dumps({"parsed_failures": failures, "total": len(failures)})
\ No newline at end of file
+    failures = parse_output(raw_output)
+    return json.dumps({"parsed_failures": failures, "total": len(failures)})
@@ -0,0 +1,280 @@
+"""
+Test Worker — Warm pre-forked pytest server per workspace
+The server imports pytest, its plugins and the target repo's third-party
+dependencies once, then forks a clean child for every test invocation, so
+repeat runs in the retry loop skip interpreter and import startup. Output
+lines and then the result come back over a Unix socket as they are produced. The repo's own modules are never pre-imported,
+so each child sees the current (fixed) sources.
+
+Run as: python test_worker.py <socket_path> <repo_path> <preload_json>
+"""
+
+import os, sys, json, time, socket, signal, hashlib, resource, tempfile, threading, subprocess
+import importlib.util
+from pathlib import Path
+
+READY = "READY"
+
+def _report_grabber():
+    """
+    pytest plugin that keeps pytest-json-report's in-memory report; for
+    --collect-only runs it adds each item's marker names as report["markers"].
+    Built on demand, since pytest is only importable in the forked children.
+    """
+    import pytest
+
+    class ReportGrabber:
+        report = None
+        markers = None
+
+        def pytest_collection_modifyitems(self, items):
+            self.markers = {item.nodeid: sorted({m.name for m in item.iter_markers()}) for item in items}
+
+        # Run after pytest-json-report has built the report
+        @pytest.hookimpl(trylast=True)
+        def pytest_sessionfinish(self, session):
+            plugin = getattr(session.config, "_json_report", None)
+            self.report = getattr(plugin, "report", None)
+            if self.report is not None and session.config.option.collectonly and self.markers is not None:
+                self.report["markers"] = self.markers
+
+    return ReportGrabber()
+
+def _serve_one(conn, repo_path):
+    """Forked child: run one pytest invocation, streaming its output lines back, then the result"""
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    os.setsid()
+    stream = conn.makefile("rwb")
+    request = json.loads(stream.readline())
+    send_lock = threading.Lock()
+
+    def send(message):
+        with send_lock:
+            stream.write((json.dumps(message) + "\n").encode())
+            stream.flush()
+
+    send({"pid": os.getpid()})
+    started = time.monotonic()
+    _sandbox.apply_limits(request.get("limits", {}))
+
+    import pytest
+
+    # Same import path as `python -m pytest` run from the repo
+    os.chdir(repo_path)
+    sys.path.insert(0, repo_path)
+    out_r, out_w = os.pipe()
+    sys.stdout.flush(); sys.stderr.flush()
+    os.dup2(out_w, 1); os.dup2(out_w, 2)
+    os.close(out_w)
+
+    def forward():
+        with os.fdopen(out_r, "r", encoding="utf-8", errors="replace") as lines:
+            for line in lines:
+                send({"out": line})
+
+    forwarder = threading.Thread(target=forward, daemon=True)
+    forwarder.start()
+    grab = _report_grabber()
+    plugins = [grab]
+    if request.get("node_ids_file"):
+        select = _load_tool("test_select")
+        plugins.append(select.NodeSelector(select.read_node_ids(request["node_ids_file"])))
+    try:
+        exit_code = int(pytest.main(request["args"] + ["--json-report", "--json-report-file=none"], plugins=plugins))
+    except BaseException as e:
+        print(f"ERROR: test worker: {e}")
+        exit_code = -1
+    sys.stdout.flush(); sys.stderr.flush()
+    # Close our ends of the output pipe so the forwarder drains and stops
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1); os.dup2(devnull, 2)
+    forwarder.join()
+    # Processes the tests left behind that are still our descendants, including
+    # ones in sessions of their own (double-forked ones re-parented to init are not)
+    for pid in _sandbox.descendants(os.getpid()):
+        _sandbox.kill_tree(pid)
+    usage = _sandbox.merge_rusage([
+        _sandbox.rusage_summary(resource.getrusage(who), time.monotonic() - started)
+        for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)
+    ])
+    send({"exit_code": exit_code, "report": grab.report, "rusage": usage})
+
+def _load_tool(name):
+    """tools/<name>.py under a private name, so it cannot shadow a target-repo module"""
+    spec = importlib.util.spec_from_file_location(f"_rift_{name}", Path(__file__).with_name(f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+_sandbox = None
+
+def serve(socket_path, repo_path, preload):
+    global _sandbox
+    _sandbox = _load_tool("sandbox")
+    # Never resolve the target repo's imports against this directory
+    if sys.path and os.path.abspath(sys.path[0]) == os.path.dirname(os.path.abspath(__file__)):
+        sys.path.pop(0)
+    # pytest plugins are left to each child: importing them here would stop
+    # pytest from assertion-rewriting them
+    for name in ["pytest"] + preload:
+        try:
+            __import__(name)
+        except BaseException:
+            pass
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(16)
+    server.settimeout(float(os.getenv("TEST_WORKER_IDLE", 600)))
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)  # children are reaped automatically
+
+    print(READY, flush=True)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1); os.dup2(devnull, 2)
+
+    while os.path.isdir(repo_path):
+        try:
+            conn, _ = server.accept()
+        except socket.timeout:
+            break
+        if os.fork() == 0:
+            server.close()
+            try:
+                _serve_one(conn, repo_path)
+            finally:
+                os._exit(0)
+        conn.close()
+    server.close()
+
+class TestWorker:
+    """Client side: starts the server for a workspace and runs pytest through it"""
+
+    def __init__(self, repo_path, preload, signature, python="python"):
+        from tools.env_cache import acquire
+
+        self.repo_path = repo_path
+        self.python = python
+        self.signature = signature
+        self.socket_dir = tempfile.mkdtemp(prefix="rift_worker_")
+        self.socket_path = os.path.join(self.socket_dir, "worker.sock")
+        self.proc = subprocess.Popen(
+            [python, str(Path(__file__).resolve()), self.socket_path, repo_path, json.dumps(sorted(preload))],
+            cwd=repo_path, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            text=True, start_new_session=True,
+        )
+        # The server runs from its environment until close()
+        self.env_held = acquire(python)
+        ready = []
+        reader = threading.Thread(target=lambda: ready.append(self.proc.stdout.readline()), daemon=True)
+        reader.start()
+        reader.join(timeout=float(os.getenv("TEST_WORKER_START_TIMEOUT", 60)))
+        if not ready or ready[0].strip() != READY:
+            self.close()
+            raise RuntimeError(f"test worker failed to start: {(ready or [''])[0].strip()}")
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def run(self, args, timeout, on_line=None, limits=None, node_ids_file=None):
+        """
+        Run pytest with `args` in a fresh fork under the sandbox `limits`,
+        passing each output line to `on_line` as it arrives; with
+        `node_ids_file`, only the node IDs listed there run (test_select).
+        Returns (report, timed_out, rusage).
+        """
+        from tools.sandbox import TreeWatcher, kill_tree
+
+        deadline = time.monotonic() + timeout
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        pid = watcher = None
+        try:
+            sock.settimeout(timeout)
+            sock.connect(self.socket_path)
+            stream = sock.makefile("rwb")
+            stream.write((json.dumps({"args": list(args), "limits": limits or {}, "node_ids_file": node_ids_file}) + "\n").encode())
+            stream.flush()
+            pid = json.loads(stream.readline())["pid"]
+            # The child may die before cleaning up after its tests
+            watcher = TreeWatcher(pid)
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise socket.timeout()
+                sock.settimeout(remaining)
+                line = stream.readline()
+                if not line:
+                    # The child died mid-run (e.g. killed by a resource limit)
+                    return None, False, None
+                message = json.loads(line)
+                if "out" in message:
+                    if on_line:
+                        on_line(message["out"])
+                    continue
+                return message["report"], False, message.get("rusage")
+        except socket.timeout:
+            if pid:
+                kill_tree(pid)
+            return None, True, None
+        finally:
+            if watcher:
+                watcher.finish()
+            sock.close()
+
+    def close(self):
+        from tools.env_cache import release
+        from tools.sandbox import kill_tree
+
+        if self.proc.poll() is None:
+            # Also reaches forked children, which run in sessions of their own
+            kill_tree(self.proc.pid)
+        self.proc.wait()
+        if self.env_held:
+            self.env_held = False
+            release(self.python)
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+        try:
+            os.rmdir(self.socket_dir)
+        except OSError:
+            pass
+
+_workers: dict[str, TestWorker] = {}
+_workers_lock = threading.Lock()
+
+def get_worker(repo_path, python="python"):
+    """
+    The warm worker for a workspace, started on first use with `python`. It is
+    restarted when the interpreter or the repo's dependency/config files
+    change, since its pre-imported third-party modules may then be stale.
+    """
+    from tools.test_impact import GLOBAL_FILES, external_modules, snapshot_files
+
+    files = snapshot_files(repo_path)
+    signature = hashlib.sha1(json.dumps(sorted((p, h) for p, h in files.items() if Path(p).name in GLOBAL_FILES)).encode()).hexdigest()
+    with _workers_lock:
+        _prune()
+        worker = _workers.get(repo_path)
+        if worker is not None and (worker.signature != signature or worker.python != python):
+            _workers.pop(repo_path).close()
+            worker = None
+        if worker is None:
+            worker = _workers[repo_path] = TestWorker(repo_path, external_modules(repo_path, files), signature, python)
+        return worker
+
+def _prune():
+    """Drop (and reap) workers that exited, e.g. after TEST_WORKER_IDLE, or whose workspace is gone"""
+    for path, worker in list(_workers.items()):
+        if not worker.alive() or not os.path.isdir(path):
+            del _workers[path]
+            worker.close()
+
+def close_workers():
+    with _workers_lock:
+        for worker in _workers.values():
+            worker.close()
+        _workers.clear()
+
+if __name__ == "__main__":
+    serve(sys.argv[1], sys.argv[2], json.loads(sys.argv[3]))
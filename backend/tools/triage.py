@@ -0,0 +1,110 @@
+"""
+Triage — Failure signatures, clustering and bug classification
+Failures are reduced to a signature (exception plus the innermost frame of
+the code under test, with volatile details normalized away), so failures
+sharing a root cause - one broken import failing hundreds of tests - form a
+single cluster that is classified once and handed downstream once.
+"""
+
+import re
+
+# (bug type, patterns) in priority order: when several match, the first type wins
+BUG_PATTERNS = [
+    ("INDENTATION", [r"IndentationError", r"unexpected indent", r"unindent does not match"]),
+    ("SYNTAX", [r"SyntaxError", r"invalid syntax", r"expected ':'", r"missing ':'"]),
+    ("IMPORT", [r"ImportError", r"ModuleNotFoundError", r"No module named", r"cannot import name"]),
+    ("TYPE_ERROR", [r"TypeError", r"AttributeError", r"'NoneType'", r"unsupported operand"]),
+    ("LINTING", [r"unused import", r"imported but unused", r"F401", r"W0611"]),
+    ("LOGIC", [r"AssertionError", r"assertion failed", r"expected .* but got"]),
+]
+DEFAULT_BUG_TYPE = "LOGIC"
+PRIORITY = {bug_type: i for i, (bug_type, _) in enumerate(BUG_PATTERNS)}
+
+# Every pattern in one alternation, one named group per bug type
+BUG_REGEX = re.compile("|".join(f"(?P<{bug_type}>{'|'.join(patterns)})" for bug_type, patterns in BUG_PATTERNS),
+                       re.IGNORECASE)
+
+# Bug types that belong to a module rather than a call site: the message alone is the root cause
+MODULE_BUG_TYPES = {"INDENTATION", "SYNTAX", "IMPORT"}
+
+FRAME_PATTERNS = [
+    re.compile(r'^(\S+?\.py):(\d+): in (\S+)', re.M),                          # pytest --tb=short
+    re.compile(r'File "([^"]+)", line (\d+), in (\S+)'),                         # Python traceback
+    re.compile(r'^\s*at (?:(\S+) \()?([^\s()]+?\.[jt]sx?):(\d+):\d+\)?', re.M),  # JS stack
+]
+EXCEPTION_LINE = re.compile(r'^E\s+(.+)$', re.M)
+TEST_FILE = re.compile(r'(^|/)(test_[^/]*\.py|[^/]*_test\.py|conftest\.py|[^/]*\.(test|spec)\.[jt]sx?)$|(^|/)(tests?|__tests__)/')
+
+# Volatile details that differ between failures with the same cause
+NORMALIZE = [
+    (re.compile(r'0x[0-9a-fA-F]+'), "0x?"),
+    (re.compile(r'(/tmp|/var/folders|/private/var)/\S+'), "<tmp>"),
+    (re.compile(r'\b\d+(\.\d+)?\b'), "N"),
+    (re.compile(r'\s+'), " "),
+]
+
+def classify_message(msg):
+    """The highest-priority bug type any pattern matches, in a single pass over `msg`"""
+    best = None
+    for m in BUG_REGEX.finditer(msg or ""):
+        if best is None or PRIORITY[m.lastgroup] < PRIORITY[best]:
+            best = m.lastgroup
+            if PRIORITY[best] == 0:
+                break
+    return best or DEFAULT_BUG_TYPE
+
+def normalize(text):
+    for pattern, replacement in NORMALIZE:
+        text = pattern.sub(replacement, text)
+    return text.strip()
+
+def _frames(msg):
+    """(file, function) of every stack frame in the message, outermost first"""
+    frames = []
+    for i, pattern in enumerate(FRAME_PATTERNS):
+        for m in pattern.finditer(msg):
+            frames.append((m.start(), m.group(2), m.group(1) or "") if i == 2 else (m.start(), m.group(1), m.group(3)))
+    return [(f, fn) for _, f, fn in sorted(frames)]
+
+def _exception(msg):
+    """The exception line: pytest's first `E` line, else the last non-blank line"""
+    m = EXCEPTION_LINE.search(msg)
+    if m:
+        return m.group(1)
+    lines = [l for l in msg.splitlines() if l.strip() and not l.lstrip().startswith("at ")]
+    return lines[-1] if lines else ""
+
+def signature(failure):
+    """(bug type, signature) of a failure dict with error_message/file/test_name"""
+    msg = failure.get("error_message") or ""
+    bug_type = classify_message(msg)
+    exception = normalize(_exception(msg))[:300]
+    if bug_type in MODULE_BUG_TYPES:
+        return bug_type, f"{bug_type}|{exception}"
+    frames = _frames(msg)
+    # The innermost frame outside test code is where shared root causes surface;
+    # failures that never leave the test are their own cause
+    inner = next((f for f in reversed(frames) if not TEST_FILE.search(f[0].replace("\\", "/"))), None)
+    if inner is None:
+        inner = (failure.get("file", ""), failure.get("test_name", ""))
+    return bug_type, f"{bug_type}|{exception}|{inner[0]}:{inner[1]}"
+
+def cluster_failures(failures):
+    """
+    Group failures by signature, in order of first appearance. Each cluster is
+    {"signature", "bug_type", "count", "tests", "representative"}.
+    """
+    clusters = {}
+    for failure in failures:
+        bug_type, sig = signature(failure)
+        cluster = clusters.get(sig)
+        if cluster is None:
+            cluster = clusters[sig] = {"signature": sig, "bug_type": bug_type, "count": 0, "tests": [], "representative": failure}
+        cluster["count"] += 1
+        cluster["tests"].append(failure.get("test_name") or failure.get("file", ""))
+    return list(clusters.values())
+
+def representatives(clusters, max_tests=20):
+    """One failure per cluster for downstream stages, annotated with its bug type and cluster size"""
+    return [{**c["representative"], "bug_type": c["bug_type"], "cluster_size": c["count"],
+             "cluster_tests": c["tests"][:max_tests]} for c in clusters]